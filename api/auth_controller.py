@@ -1,3 +1,4 @@
+import logging
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
@@ -6,6 +7,9 @@ from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from .serializers import UserSerializer
 from .models import User
+from .authentication import USER_CLAIMS
+
+logger = logging.getLogger(__name__)
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
@@ -46,8 +50,8 @@ def create_user(request):
                 "errors": serializer.errors
             }, status=status.HTTP_400_BAD_REQUEST)
 
-    except Exception as e:
-        print(f"Error in create user: {e}")
+    except Exception:
+        logger.exception("Error in create user")
 
         return Response({
             "success": False,
@@ -78,6 +82,10 @@ def login(request):
 
         serializer = UserSerializer(user)
         access_token = AccessToken.for_user(user)
+
+        # Dùng khi bật AUTH_TRUST_TOKEN_CLAIMS
+        for claim in USER_CLAIMS:
+            access_token[claim] = getattr(user, claim)
         
         return Response({
             "success": True,
@@ -94,8 +102,8 @@ def login(request):
             "message": "User not found"
         }, status=status.HTTP_404_NOT_FOUND)
 
-    except Exception as e:
-        print(f"Error in login: {e}")
+    except Exception:
+        logger.exception("Error in login")
 
         return Response({
             "success": False,
@@ -118,8 +126,8 @@ def get_profile(request):
             "data": serializer.data
         })
 
-    except Exception as e:
-        print(f"Error in get user profile: {e}")
+    except Exception:
+        logger.exception("Error in get user profile")
         return Response({
             "success": False,
             "message": "Something wrong",
@@ -1,9 +1,15 @@
 import uuid
+from asgiref.sync import sync_to_async
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
 from rest_framework.permissions import AllowAny
+from django.conf import settings
 from .models import User
-from .serializers import UserSerializer
+from .user_cache import user_cache
+
+# Claim về user được ghi vào access token lúc login (xem auth_controller.login)
+USER_CLAIMS = ("username", "name")
 
 class UUIDJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
@@ -41,11 +47,58 @@ class UUIDJWTAuthentication(JWTAuthentication):
         if not user_id:
             return None
 
-        try:
-            user = User.objects.get(id=uuid.UUID(str(user_id)))
-            serializer = UserSerializer(user)
-            print("AUTHEN USER:", serializer.data)
+        # 🔹 AUTH_TRUST_TOKEN_CLAIMS: dựng user từ claim trong token, không query DB
+        if getattr(settings, "AUTH_TRUST_TOKEN_CLAIMS", False):
+            user = self.get_user_from_claims(validated_token, user_id)
+
+            if user is not None:
+                user_cache.record_claim_hit()
+                return user
+
+        # 🔹 Tìm trong cache trước, miss mới query DB
+        key = (str(user_id), validated_token.get(api_settings.JTI_CLAIM))
+        user = user_cache.get(key)
 
+        if user is not None:
             return user
+
+        try:
+            user = User.objects.get(id=uuid.UUID(str(user_id)))
         except User.DoesNotExist:
             return None
+
+        user_cache.set(key, user)
+
+        return user
+
+    # Token cũ không có đủ claim -> None để quay về query DB
+    def get_user_from_claims(self, validated_token, user_id):
+        if any(claim not in validated_token for claim in USER_CLAIMS):
+            return None
+
+        return User(
+            id=uuid.UUID(str(user_id)),
+            username=validated_token["username"],
+            name=validated_token["name"],
+            is_active=True
+        )
+
+# Xác thực cho async view (không qua DRF), trả về user hoặc None
+async def aauthenticate(request):
+    authenticator = UUIDJWTAuthentication()
+
+    header = authenticator.get_header(request)
+    if header is None:
+        return None
+
+    raw_token = authenticator.get_raw_token(header)
+    if raw_token is None:
+        return None
+
+    try:
+        validated_token = authenticator.get_validated_token(raw_token)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+    # get_user có thể query DB (cache miss) nên chạy trong thread
+    return await sync_to_async(authenticator.get_user)(validated_token)
@@ -0,0 +1,73 @@
+from contextlib import contextmanager
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from .models import Category, Product, CategoryProduct, User, PaymentMethod, Order, OrderItem
+from .category_products import link_rows
+
+# Dữ liệu mẫu cho các lệnh benchmark_*, insert bằng bulk_create
+# Dùng trong rolled_back() để DB không bị thay đổi sau khi benchmark chạy xong
+
+class Rollback(Exception):
+    pass
+
+@contextmanager
+def rolled_back(using=None):
+    try:
+        with transaction.atomic(using=using):
+            yield
+            raise Rollback()
+    except Rollback:
+        pass
+
+BENCH_PASSWORD = "bench"
+
+def seed_benchmark_data(num_products, num_orders, items_per_order=3, num_categories=5, num_users=1):
+    categories = Category.objects.bulk_create([
+        Category(name=f"Bench category {i}") for i in range(num_categories)
+    ])
+    products = Product.objects.bulk_create([
+        Product(name=f"Bench product {i}", price=1000 + i, description=f"Description {i}")
+        for i in range(num_products)
+    ])
+
+    # Mỗi product thuộc 1-3 category
+    Through = Product.categories.through
+    Through.objects.bulk_create([
+        Through(product_id=product.id, category_id=category.id)
+        for i, product in enumerate(products)
+        for category in categories[:1 + i % 3]
+    ])
+    CategoryProduct.objects.bulk_create([
+        link
+        for i, product in enumerate(products)
+        for link in link_rows(product, [category.id for category in categories[:1 + i % 3]])
+    ])
+
+    # Cùng 1 password (hash 1 lần) để /auth/login chạy được với mọi user
+    password = make_password(BENCH_PASSWORD)
+    users = User.objects.bulk_create([
+        User(username="bench_user" if i == 0 else f"bench_user_{i}", name=f"Bench {i}", password=password)
+        for i in range(num_users)
+    ])
+    payment_method = PaymentMethod.objects.create(key="bench_payment_method", name="Bench")
+
+    # 1/4 số order không có payment method
+    # item j: quantity 1 + j, giá 1000.50 -> total = 1000.50 * (1 + 2 + ... + items_per_order)
+    price = Decimal("1000.50")
+    total_amount = price * sum(range(1, items_per_order + 1))
+
+    orders = Order.objects.bulk_create([
+        Order(user=users[i % num_users], payment_method=payment_method if i % 4 else None, total_amount=total_amount)
+        for i in range(num_orders)
+    ])
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=products[(i + j) % num_products], quantity=1 + j, price=price)
+        for i, order in enumerate(orders)
+        for j in range(items_per_order)
+    ])
+
+    return {
+        "categories": categories, "products": products, "user": users[0], "users": users,
+        "payment_method": payment_method, "orders": orders
+    }
@@ -0,0 +1,309 @@
+import json
+import random
+import re
+import time
+from itertools import count, cycle
+from django.conf import settings
+from django.test import Client, override_settings
+from django.urls import get_resolver, resolve, Resolver404
+from rest_framework_simplejwt.tokens import AccessToken
+from .benchmark_data import seed_benchmark_data, BENCH_PASSWORD
+from .loadtest import percentile, parse_server_timing, run_http_mix
+from .order_stats import rebuild_order_stats
+from .product_sales import rebuild_product_sales
+
+# Replay 1 mix request (file JSONL hoặc DEFAULT_MIX) trên dữ liệu seed, kết quả JSON theo từng endpoint:
+# số request, status, req/s, p50 / p95 / p99 latency, số query + DB time / request (header Server-Timing)
+# Mỗi dòng của file mix là 1 request:
+#   {"method": "GET", "path": "/products?limit=20", "weight": 10}
+#   {"name": "checkout", "method": "POST", "path": "/orders/create", "body": {...}, "auth": true}
+# - weight: số lần request xuất hiện trong 1 round (mặc định 1), thứ tự trong round xáo theo seed
+# - auth: gửi token của bench user (mặc định true)
+# - name: tên để gộp kết quả (mặc định "<METHOD> /<route>", vd. "GET /products/detail/<path:id>")
+# - {product_id}, {category_id}, {order_id}, {user_id}, {payment_method_id}: lấy xoay vòng từ dữ liệu seed,
+#   {username}: username của 1 bench user, {seq}: số tăng dần (cho field unique như username / key)
+
+PLACEHOLDERS = ("product_id", "category_id", "order_id", "user_id", "username", "payment_method_id", "seq")
+PLACEHOLDER = re.compile(r"\{(" + "|".join(PLACEHOLDERS) + r")\}")
+
+# Route bỏ qua khi kiểm tra mix có gọi đủ route không
+SKIPPED_ROUTES = ("admin/",)
+
+DEFAULT_MIX = [
+    # Catalog
+    {"method": "GET", "path": "/products", "weight": 20},
+    {"method": "GET", "path": "/products?page=5&limit=20", "weight": 5},
+    {"method": "GET", "path": "/products?cursor=&limit=20", "weight": 5},
+    {"method": "GET", "path": "/products?q=bench", "weight": 5},
+    {"method": "GET", "path": "/products?category={category_id}&is_active=true", "weight": 5},
+    {"method": "GET", "path": "/products?sort=-units_sold", "weight": 2},
+    {"method": "GET", "path": "/products/best_sellers", "weight": 3},
+    {"method": "GET", "path": "/products/detail/{product_id}", "weight": 15},
+    {"method": "GET", "path": "/categories", "weight": 5},
+    {"method": "GET", "path": "/payment_methods", "weight": 3},
+    {"method": "GET", "path": "/async/products", "weight": 5},
+    {"method": "GET", "path": "/async/products/detail/{product_id}", "weight": 5},
+    {"method": "GET", "path": "/async/categories", "weight": 2},
+    {"method": "GET", "path": "/async/payment_methods", "weight": 1},
+    # Order
+    {"method": "GET", "path": "/orders", "weight": 8},
+    {"method": "GET", "path": "/orders?status=pending&cursor=", "weight": 2},
+    {"method": "GET", "path": "/orders/detail/{order_id}", "weight": 5},
+    {"method": "GET", "path": "/async/orders", "weight": 2},
+    {"method": "GET", "path": "/async/orders/detail/{order_id}", "weight": 2},
+    {"method": "GET", "path": "/orders/export?status=paid", "weight": 1},
+    {"method": "GET", "path": "/reports/orders?group_by=month,status", "weight": 1},
+    {"method": "POST", "path": "/orders/create", "weight": 4, "body": {
+        "user_id": "{user_id}", "payment_method": "{payment_method_id}", "note": "Bench",
+        "items": [{"product": "{product_id}", "quantity": 2}, {"product": "{product_id}", "quantity": 1}],
+    }},
+    {"method": "PATCH", "path": "/orders/update/{order_id}", "weight": 2, "body": {
+        "note": "Bench update", "items": [{"product": "{product_id}", "quantity": 3}],
+    }},
+    {"method": "POST", "path": "/orders/bulk_status", "weight": 1, "body": {
+        "ids": ["{order_id}", "{order_id}"], "status": "paid",
+    }},
+    # Catalog admin
+    {"method": "POST", "path": "/products/create", "weight": 1, "body": {
+        "name": "Bench new product {seq}", "price": 12000, "description": "Bench", "category_ids": ["{category_id}"],
+    }},
+    {"method": "PATCH", "path": "/products/update/{product_id}", "weight": 1, "body": {"price": 13000}},
+    {"method": "POST", "path": "/products/import", "weight": 1, "body": [
+        {"name": "Bench import {seq}", "price": 9000, "description": "Bench", "category_ids": ["{category_id}"]},
+    ]},
+    {"method": "POST", "path": "/categories/create", "weight": 1, "body": {"name": "Bench new category {seq}"}},
+    {"method": "PATCH", "path": "/categories/update/{category_id}", "weight": 1, "body": {"is_active": True}},
+    {"method": "POST", "path": "/payment_methods/create", "weight": 1, "body": {"key": "bench_{seq}", "name": "Bench"}},
+    # Auth
+    {"method": "POST", "path": "/auth/register", "weight": 1, "auth": False, "body": {
+        "username": "bench_new_{seq}", "password": BENCH_PASSWORD, "name": "Bench",
+    }},
+    {"method": "POST", "path": "/auth/login", "weight": 1, "auth": False, "body": {
+        "username": "{username}", "password": BENCH_PASSWORD,
+    }},
+    {"method": "GET", "path": "/auth/profile", "weight": 2},
+    {"method": "GET", "path": "/metrics", "weight": 1, "auth": False},
+]
+
+def load_mix(path):
+    mix = []
+
+    with open(path, encoding="utf-8") as file:
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+
+            entry = json.loads(line)
+
+            if not isinstance(entry, dict) or "path" not in entry:
+                raise ValueError(f"Line {number}: each request needs a 'path'")
+
+            mix.append(entry)
+
+    return mix
+
+def seed(num_products, num_orders, num_categories=5, num_users=10, items_per_order=3):
+    data = seed_benchmark_data(num_products, num_orders, items_per_order, num_categories, num_users)
+
+    # Rollup / counter cho /reports/orders, best sellers và ?sort=units_sold
+    rebuild_order_stats()
+    rebuild_product_sales()
+
+    return data
+
+def endpoint_name(method, path):
+    try:
+        return f"{method} /{resolve(path.split('?')[0]).route}"
+    except Resolver404:
+        return f"{method} {path.split('?')[0]}"
+
+def url_routes(patterns=None, prefix=""):
+    routes = []
+
+    for pattern in patterns if patterns is not None else get_resolver().url_patterns:
+        route = prefix + str(pattern.pattern)
+
+        if route.startswith(SKIPPED_ROUTES):
+            continue
+
+        if hasattr(pattern, "url_patterns"):
+            routes.extend(url_routes(pattern.url_patterns, route))
+        else:
+            routes.append(route)
+
+    return routes
+
+# Route trong urls.py mà mix không gọi tới
+def uncovered_routes(mix):
+    called = set()
+
+    for entry in mix:
+        try:
+            called.add(resolve(entry["path"].split("?")[0]).route)
+        except Resolver404:
+            pass
+
+    return [route for route in url_routes() if route not in called]
+
+# Thay placeholder bằng giá trị xoay vòng từ dữ liệu seed, path và body thay riêng
+# (không qua json.dumps của path để giữ nguyên ký tự của query string)
+class PlaceholderValues:
+    def __init__(self, data):
+        self.values = {
+            "product_id": cycle([str(product.id) for product in data["products"]]),
+            "category_id": cycle([str(category.id) for category in data["categories"]]),
+            "order_id": cycle([str(order.id) for order in data["orders"]]),
+            "user_id": cycle([str(user.id) for user in data["users"]]),
+            "username": cycle([user.username for user in data["users"]]),
+            "payment_method_id": cycle([str(data["payment_method"].id)]),
+            "seq": (str(i) for i in count(1)),
+        }
+
+    def replace(self, text):
+        return PLACEHOLDER.sub(lambda match: next(self.values[match.group(1)]), text)
+
+    def fill(self, entry):
+        body = entry.get("body")
+
+        return (
+            self.replace(entry["path"]),
+            json.loads(self.replace(json.dumps(body))) if body is not None else None,
+        )
+
+# Thứ tự request của cả lượt chạy: mỗi round mỗi request xuất hiện `weight` lần, xáo theo seed
+# -> list (name, method, path, body, auth)
+def build_schedule(mix, data, rounds=1, seed=0):
+    rng = random.Random(seed)
+    values = PlaceholderValues(data)
+    schedule = []
+
+    for _ in range(rounds):
+        entries = [entry for entry in mix for _ in range(entry.get("weight", 1))]
+        rng.shuffle(entries)
+
+        for entry in entries:
+            method = entry.get("method", "GET").upper()
+            path, body = values.fill(entry)
+            name = entry.get("name") or endpoint_name(method, path)
+            schedule.append((name, method, path, body, entry.get("auth", True)))
+
+    return schedule
+
+def auth_header(user):
+    return f"Bearer {AccessToken.for_user(user)}"
+
+# Chạy trong process bằng test client (qua toàn bộ middleware, không qua network)
+# -> list sample (name, latency giây, status, server timing)
+def run_in_process(schedule, user):
+    token = auth_header(user)
+    samples = []
+
+    # Test client gửi Host "testserver" (test runner tự thêm vào ALLOWED_HOSTS, command thì không)
+    with override_settings(
+        PROFILING_ENABLED=True, PROFILING_SERVER_TIMING=True, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+    ):
+        client = Client()
+
+        for name, method, path, body, auth in schedule:
+            extra = {"HTTP_AUTHORIZATION": token} if auth else {}
+            data = json.dumps(body) if body is not None else ""
+            start = time.perf_counter()
+            response = client.generic(method, path, data, content_type="application/json", **extra)
+
+            # Response stream (vd. /orders/export): tính cả thời gian đọc hết nội dung
+            if response.streaming:
+                b"".join(response.streaming_content)
+
+            samples.append((name, time.perf_counter() - start, response.status_code, response.get("Server-Timing")))
+
+    return samples
+
+def run_http(schedule, user, base_url, concurrency=20, timeout=30.0):
+    token = auth_header(user)
+    authorized = [(name, method, path, body) for name, method, path, body, auth in schedule if auth]
+    anonymous = [(name, method, path, body) for name, method, path, body, auth in schedule if not auth]
+
+    return run_http_mix(base_url, authorized, concurrency, {"Authorization": token}, timeout) \
+        + run_http_mix(base_url, anonymous, concurrency, timeout=timeout)
+
+def summarize_samples(samples, elapsed):
+    endpoints = {}
+
+    for name, latency, status, timing in samples:
+        endpoints.setdefault(name, []).append((latency, status, *parse_server_timing(timing)))
+
+    def stats(rows, seconds):
+        latencies = sorted(row[0] for row in rows)
+        queries = [row[2] for row in rows if row[2] is not None]
+        db_ms = [row[3] for row in rows if row[3] is not None]
+        statuses = {}
+
+        for row in rows:
+            statuses[str(row[1])] = statuses.get(str(row[1]), 0) + 1
+
+        return {
+            "requests": len(rows),
+            # 5xx hoặc không kết nối được (status 0)
+            "errors": sum(1 for row in rows if row[1] >= 500 or row[1] == 0),
+            "statuses": statuses,
+            "rps": round(len(rows) / seconds, 2) if seconds else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+            "max_queries": max(queries) if queries else None,
+            "db_ms_per_request": round(sum(db_ms) / len(db_ms), 3) if db_ms else None,
+        }
+
+    return {
+        "total": stats([row for rows in endpoints.values() for row in rows], elapsed),
+        # rps của từng endpoint: số request / tổng latency của endpoint đó
+        "endpoints": {
+            name: stats(rows, sum(row[0] for row in rows)) for name, rows in sorted(endpoints.items())
+        },
+    }
+
+# So với kết quả cũ: p95 tăng quá max_regression (tỉ lệ) hoặc số query / request tăng, hoặc có thêm lỗi
+# Bỏ qua endpoint có p95 cũ dưới min_ms (nhiễu đo)
+def compare_results(baseline, current, max_regression=0.2, min_ms=1.0):
+    regressions = []
+
+    for name, stats in current["endpoints"].items():
+        old = baseline["endpoints"].get(name)
+
+        if old is None:
+            continue
+
+        if old["p95_ms"] >= min_ms and stats["p95_ms"] > old["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {old['p95_ms']}ms -> {stats['p95_ms']}ms")
+
+        if (old["queries_per_request"] is not None and stats["queries_per_request"] is not None
+                and stats["queries_per_request"] > old["queries_per_request"]):
+            regressions.append(
+                f"{name}: queries/request {old['queries_per_request']} -> {stats['queries_per_request']}"
+            )
+
+        if stats["errors"] > old["errors"]:
+            regressions.append(f"{name}: errors {old['errors']} -> {stats['errors']}")
+
+    return regressions
+
+def run_benchmark(mix, data, rounds=1, seed=0, warmup=0, base_url=None, concurrency=20):
+    def run(schedule):
+        if base_url is None:
+            return run_in_process(schedule, data["user"])
+
+        return run_http(schedule, data["user"], base_url, concurrency)
+
+    # Warmup: lượt chạy riêng (xáo theo seed khác), không tính vào kết quả
+    if warmup:
+        run(build_schedule(mix, data, warmup, seed + 1))
+
+    schedule = build_schedule(mix, data, rounds, seed)
+    started = time.perf_counter()
+    samples = run(schedule)
+
+    result = summarize_samples(samples, time.perf_counter() - started)
+    result["uncovered_routes"] = uncovered_routes(mix)
+
+    return result
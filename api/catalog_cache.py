@@ -0,0 +1,125 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from .renderers import render_json
+from .counting import normalize_filters
+
+# Read-through cache cho các API catalog (category, payment method)
+# - Lưu sẵn JSON bytes của response, lần sau trả thẳng bytes không query / serialize
+# - Mỗi model có 1 version (thời điểm thay đổi cuối), signal save / delete đổi version
+#   nên các entry cũ không bao giờ được đọc lại
+# - Backend lấy theo CATALOG_CACHE_ALIAS trong settings, chạy nhiều worker thì phải là cache chung
+#   (REDIS_URL) để version mới tới được mọi process
+# - LocMem (không có REDIS_URL): signal chỉ đổi version trong process hiện tại, nên version + entry
+#   chỉ giữ CATALOG_LOCAL_CACHE_TIMEOUT giây => process khác thấy thay đổi chậm tối đa chừng đó
+# - Response có ETag / Last-Modified, client gửi lại If-None-Match / If-Modified-Since
+#   sẽ nhận 304
+
+def get_catalog_cache():
+    return caches[getattr(settings, "CATALOG_CACHE_ALIAS", "default")]
+
+# LocMem chỉ có trong 1 process, Dummy không lưu gì
+def is_shared(cache):
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+# (timeout của entry, timeout của version) theo loại cache
+def get_timeouts(cache):
+    timeout = getattr(settings, "CATALOG_CACHE_TIMEOUT", None)
+
+    if is_shared(cache):
+        return timeout, None
+
+    local_timeout = getattr(settings, "CATALOG_LOCAL_CACHE_TIMEOUT", 5)
+    return min(timeout, local_timeout) if timeout is not None else local_timeout, local_timeout
+
+def version_key(model):
+    return f"catalog_version:{model._meta.label_lower}"
+
+# Version là timestamp (giây) lần thay đổi cuối, dùng luôn cho Last-Modified
+def get_catalog_version(model):
+    cache = get_catalog_cache()
+    version = cache.get(version_key(model))
+
+    if version is None:
+        version = int(time.time())
+        # add: không ghi đè nếu process khác vừa set
+        cache.add(version_key(model), version, get_timeouts(cache)[1])
+        version = cache.get(version_key(model), version)
+
+    return version
+
+async def aget_catalog_version(model):
+    cache = get_catalog_cache()
+    version = await cache.aget(version_key(model))
+
+    if version is None:
+        version = int(time.time())
+        await cache.aadd(version_key(model), version, get_timeouts(cache)[1])
+        version = await cache.aget(version_key(model), version)
+
+    return version
+
+def invalidate_catalog(model):
+    cache = get_catalog_cache()
+    previous = cache.get(version_key(model), 0)
+
+    # Luôn tăng, kể cả khi thay đổi 2 lần trong cùng 1 giây
+    cache.set(version_key(model), max(int(time.time()), previous + 1), get_timeouts(cache)[1])
+
+def build_entry(payload, last_modified):
+    body = render_json(payload)
+    etag = '"%s"' % hashlib.md5(body).hexdigest()
+
+    return {"body": body, "etag": etag, "last_modified": last_modified}
+
+def entry_key(model, version, filters):
+    digest = hashlib.md5(normalize_filters(filters).encode()).hexdigest()
+    return f"catalog:{model._meta.label_lower}:{version}:{digest}"
+
+def entry_response(request, entry):
+    response = HttpResponse(entry["body"], content_type="application/json")
+    response["ETag"] = entry["etag"]
+    response["Last-Modified"] = http_date(entry["last_modified"])
+    patch_cache_control(response, no_cache=True)
+
+    # 304 nếu If-None-Match / If-Modified-Since còn khớp
+    return get_conditional_response(
+        request,
+        etag=entry["etag"],
+        last_modified=entry["last_modified"],
+        response=response
+    )
+
+# `build_payload` chỉ được gọi khi cache miss
+def cached_json_response(request, model, filters, build_payload):
+    cache = get_catalog_cache()
+    version = get_catalog_version(model)
+    key = entry_key(model, version, filters)
+
+    entry = cache.get(key)
+
+    if entry is None:
+        entry = build_entry(build_payload(), version)
+        cache.set(key, entry, get_timeouts(cache)[0])
+
+    return entry_response(request, entry)
+
+# Bản async, `abuild_payload` là coroutine function
+async def acached_json_response(request, model, filters, abuild_payload):
+    cache = get_catalog_cache()
+    version = await aget_catalog_version(model)
+    key = entry_key(model, version, filters)
+
+    entry = await cache.aget(key)
+
+    if entry is None:
+        entry = build_entry(await abuild_payload(), version)
+        await cache.aset(key, entry, get_timeouts(cache)[0])
+
+    return entry_response(request, entry)
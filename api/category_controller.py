@@ -1,3 +1,4 @@
+import logging
 import math
 import uuid
 from rest_framework.decorators import api_view
@@ -5,30 +6,39 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.db.models import Q
 from django.core.exceptions import ValidationError
+from django.views.decorators.http import require_GET
 from .models import Category
 from .serializers import CategorySerializer
+from .catalog_cache import cached_json_response, acached_json_response
+from .utils import json_response
+
+logger = logging.getLogger(__name__)
 
 @api_view(['GET'])
 def get_list(request):
     try:
-        queryset = Category.objects.all()
-
         is_active = request.GET.get('is_active', None)
 
-        if is_active:
-            is_active_bool = True if is_active == "true" else False
+        # Chỉ chạy khi cache miss (xem catalog_cache.py)
+        def build_payload():
+            queryset = Category.objects.all()
 
-            queryset = queryset.filter(is_active=is_active_bool)
+            if is_active:
+                is_active_bool = True if is_active == "true" else False
 
-        serializer = CategorySerializer(queryset, many=True)
+                queryset = queryset.filter(is_active=is_active_bool)
 
-        return Response({
-            "success": True,
-            "data": serializer.data
-        }, status=status.HTTP_200_OK)
+            serializer = CategorySerializer(queryset, many=True)
+
+            return {
+                "success": True,
+                "data": serializer.data
+            }
 
-    except Exception as e:
-        print(f"Error in get_list: {e}")
+        return cached_json_response(request, Category, {"is_active": is_active}, build_payload)
+
+    except Exception:
+        logger.exception("Error in get_list")
 
         return Response({
             "success": False,
@@ -56,8 +66,8 @@ def create_category(request):
             "errors": serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    except Exception as e:
-        print(f"Error creating category: {e}")
+    except Exception:
+        logger.exception("Error creating category")
 
         return Response({
             "success": False,
@@ -101,10 +111,43 @@ def update_category(request, id):
             "errors": str(e)
         }, status=status.HTTP_400_BAD_REQUEST)
 
-    except Exception as e:
-        print(f"Error update category: {e}")
+    except Exception:
+        logger.exception("Error update category")
 
         return Response({
             "success": False,
             "message": "Something wrong",
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+########## Async (ASGI) ##########
+@require_GET
+async def aget_list(request):
+    try:
+        is_active = request.GET.get('is_active', None)
+
+        # Chỉ chạy khi cache miss (xem catalog_cache.py)
+        async def abuild_payload():
+            queryset = Category.objects.all()
+
+            if is_active:
+                is_active_bool = True if is_active == "true" else False
+
+                queryset = queryset.filter(is_active=is_active_bool)
+
+            serializer = CategorySerializer([row async for row in queryset], many=True)
+
+            return {
+                "success": True,
+                "data": serializer.data
+            }
+
+        return await acached_json_response(request, Category, {"is_active": is_active}, abuild_payload)
+
+    except Exception:
+        logger.exception("Error in aget_list")
+
+        return json_response({
+            "success": False,
+            "message": "Something wrong",
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
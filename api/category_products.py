@@ -0,0 +1,140 @@
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Subquery
+from .models import Category, Product, CategoryProduct, Order
+from .counting import invalidate_counts
+from .catalog_cache import invalidate_catalog
+from .snapshots import cleared_snapshot, embeds_any
+
+# Đồng bộ bảng category_product (CategoryProduct) với product_categories + is_active / price của product
+# - m2m_changed / save product: signals.py
+# - bulk import, seed benchmark: link_rows() cùng lúc với bulk_create bảng M2M
+# - UPDATE product hàng loạt: Product.objects.filter(...).update_listing(...) (QuerySet.update() không gửi signal)
+# - rebuild_category_products: tính lại toàn bộ từ bảng M2M, find_link_drift: đếm row bị lệch
+# Count của /products?category=<id> cache theo scope của category (xem counting.py):
+# thay đổi product / link chỉ làm mất cache count của các category liên quan
+
+def category_count_scope(category_id):
+    return f"category:{category_id}" if category_id else None
+
+def invalidate_category_counts(category_ids):
+    for category_id in set(category_ids):
+        invalidate_counts(Product, category_count_scope(category_id))
+
+# Row CategoryProduct cho các product đã có sẵn price / is_active (vd. product vừa bulk_create)
+def link_rows(product, category_ids):
+    return [
+        CategoryProduct(category_id=category_id, product_id=product.id, is_active=product.is_active, price=product.price)
+        for category_id in category_ids
+    ]
+
+def add_links(product_ids, category_ids):
+    products = Product.objects.filter(id__in=product_ids).only("id", "is_active", "price")
+
+    CategoryProduct.objects.bulk_create(
+        [link for product in products for link in link_rows(product, category_ids)],
+        ignore_conflicts=True
+    )
+    invalidate_category_counts(category_ids)
+
+# Xóa link theo product và / hoặc category, trả về các category bị ảnh hưởng
+def remove_links(product_ids=None, category_ids=None):
+    links = CategoryProduct.objects.all()
+
+    if product_ids is not None:
+        links = links.filter(product_id__in=product_ids)
+
+    if category_ids is not None:
+        links = links.filter(category_id__in=category_ids)
+
+    affected = set(links.values_list("category_id", flat=True))
+    links.delete()
+    invalidate_category_counts(affected)
+
+# Product đổi is_active / price: 1 UPDATE cho mọi link của product
+def sync_product(product):
+    links = CategoryProduct.objects.filter(product_id=product.id)
+    category_ids = list(links.values_list("category_id", flat=True))
+
+    if category_ids:
+        links.update(is_active=product.is_active, price=product.price)
+        invalidate_category_counts(category_ids)
+
+# Field của product được chép sang category_product
+LINK_FIELDS = ("is_active", "price")
+
+# QuerySet.update() cho product kèm những gì signal của save() làm: chép is_active / price sang category_product,
+# bỏ snapshot của order có product (nếu đổi cột có trong snapshot), bỏ cache count / catalog sau khi commit
+# id đọc trước khi UPDATE: filter theo chính field bị đổi (vd. is_active=True -> False) vẫn đúng product
+def update_products(products, batch_size=1000, **fields):
+    product_ids = list(products.values_list("id", flat=True))
+    link_fields = [name for name in LINK_FIELDS if name in fields]
+    category_ids = set()
+    updated = 0
+
+    with transaction.atomic():
+        for start in range(0, len(product_ids), batch_size):
+            chunk = product_ids[start:start + batch_size]
+            updated += Product.objects.filter(id__in=chunk).update(**fields)
+
+            if embeds_any(Product, fields):
+                Order.objects.filter(items__product__in=chunk).update(**cleared_snapshot())
+
+            if link_fields:
+                # Giá trị lấy lại từ product đã update: fields có thể là biểu thức (vd. F("price") * 2)
+                links = CategoryProduct.objects.filter(product_id__in=chunk)
+                category_ids.update(links.values_list("category_id", flat=True))
+                links.update(**{
+                    name: Subquery(Product.objects.filter(id=OuterRef("product_id")).values(name)[:1])
+                    for name in link_fields
+                })
+
+        transaction.on_commit(lambda: invalidate_product_caches(category_ids))
+
+    return updated
+
+def invalidate_product_caches(category_ids):
+    invalidate_counts(Product)
+    invalidate_catalog(Product)
+    invalidate_category_counts(category_ids)
+
+# Số row category_product lệch so với bảng M2M + product:
+# missing: link chưa có row, extra: row không còn link, stale: is_active / price khác product
+def find_link_drift():
+    Through = Product.categories.through
+    rows = CategoryProduct.objects.filter(category_id=OuterRef("category_id"), product_id=OuterRef("product_id"))
+    links = Through.objects.filter(category_id=OuterRef("category_id"), product_id=OuterRef("product_id"))
+
+    return {
+        "missing": Through.objects.exclude(Exists(rows)).count(),
+        "extra": CategoryProduct.objects.exclude(Exists(links)).count(),
+        "stale": CategoryProduct.objects.exclude(is_active=F("product__is_active"), price=F("product__price")).count(),
+    }
+
+def rebuild_category_products(batch_size=5000):
+    Through = Product.categories.through
+    links = Through.objects.order_by("id").values_list(
+        "id", "category_id", "product_id", "product__is_active", "product__price"
+    )
+
+    created = 0
+    last_id = 0
+
+    with transaction.atomic():
+        CategoryProduct.objects.all().delete()
+
+        while True:
+            batch = list(links.filter(id__gt=last_id)[:batch_size])
+
+            if not batch:
+                break
+
+            CategoryProduct.objects.bulk_create([
+                CategoryProduct(category_id=category_id, product_id=product_id, is_active=is_active, price=price)
+                for _, category_id, product_id, is_active, price in batch
+            ])
+            created += len(batch)
+            last_id = batch[-1][0]
+
+    invalidate_category_counts(Category.objects.values_list("id", flat=True))
+
+    return created
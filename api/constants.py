@@ -5,4 +5,13 @@ class OrderStatus(models.TextChoices):
     PAID = "paid", "Paid"
     SHIPPED = "shipped", "Shipped"
     COMPLETED = "completed", "Completed"
-    CANCELED = "canceled", "Canceled"
\ No newline at end of file
+    CANCELED = "canceled", "Canceled"
+
+# Các bước chuyển status hợp lệ (dùng cho bulk status update)
+ORDER_STATUS_TRANSITIONS = {
+    OrderStatus.PENDING: {OrderStatus.PAID, OrderStatus.CANCELED},
+    OrderStatus.PAID: {OrderStatus.SHIPPED, OrderStatus.CANCELED},
+    OrderStatus.SHIPPED: {OrderStatus.COMPLETED},
+    OrderStatus.COMPLETED: set(),
+    OrderStatus.CANCELED: set(),
+}
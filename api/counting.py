@@ -0,0 +1,111 @@
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from asgiref.sync import sync_to_async
+from django.db import connections
+
+# Đếm tổng số row cho các API list có phân trang
+# - exact: COUNT(*) thật, cache theo bộ filter đã chuẩn hóa; mọi thay đổi của model
+#   làm tăng "version" của model nên các key cũ tự hết hiệu lực
+# - scope: count có version riêng (vd. "category:<id>" của /products?category=), chỉ hết hiệu lực
+#   khi dữ liệu trong scope đó thay đổi (invalidate_counts(model, scope)), không theo version của model
+# - estimated: lấy TABLE_ROWS trong information_schema (MySQL) khi không có filter,
+#   các trường hợp khác quay về exact
+
+COUNT_EXACT = "exact"
+COUNT_ESTIMATED = "estimated"
+COUNT_MODES = (COUNT_EXACT, COUNT_ESTIMATED)
+
+def get_count_cache_timeout():
+    return getattr(settings, "COUNT_CACHE_TIMEOUT", 60)
+
+def version_key(model, scope=None):
+    key = f"count_version:{model._meta.label_lower}"
+    return f"{key}:{scope}" if scope else key
+
+def get_version(model, scope=None):
+    return cache.get(version_key(model, scope), 0)
+
+# Gọi mỗi khi model có thay đổi (signal hoặc update / bulk_create)
+def invalidate_counts(model, scope=None):
+    key = version_key(model, scope)
+
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+def clean_filters(filters):
+    return {key: str(value) for key, value in filters.items() if value not in (None, "")}
+
+def normalize_filters(filters):
+    return json.dumps(clean_filters(filters), sort_keys=True)
+
+def count_cache_key(model, filters, scope=None):
+    digest = hashlib.md5(normalize_filters(filters).encode()).hexdigest()
+
+    if scope:
+        return f"count:{model._meta.label_lower}:{scope}:{get_version(model, scope)}:{digest}"
+
+    return f"count:{model._meta.label_lower}:{get_version(model)}:{digest}"
+
+def estimate_table_rows(model, using):
+    connection = connections[using]
+
+    if connection.vendor != "mysql":
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            [model._meta.db_table]
+        )
+        row = cursor.fetchone()
+
+    return row[0] if row and row[0] is not None else None
+
+# Trả về (total_items, total_item_type)
+# `filters` là các query param đã dùng để filter `queryset`
+def count_items(queryset, filters, mode=COUNT_EXACT, scope=None):
+    model = queryset.model
+
+    if mode not in COUNT_MODES:
+        raise ValueError(f"Invalid count mode '{mode}'. Must be one of: {list(COUNT_MODES)}")
+
+    if mode == COUNT_ESTIMATED and not clean_filters(filters):
+        estimated = estimate_table_rows(model, queryset.db)
+
+        if estimated is not None:
+            return estimated, COUNT_ESTIMATED
+
+    key = count_cache_key(model, filters, scope)
+    total_items = cache.get(key)
+
+    if total_items is None:
+        total_items = queryset.count()
+        cache.set(key, total_items, get_count_cache_timeout())
+
+    return total_items, COUNT_EXACT
+
+async def acount_items(queryset, filters, mode=COUNT_EXACT, scope=None):
+    model = queryset.model
+
+    if mode not in COUNT_MODES:
+        raise ValueError(f"Invalid count mode '{mode}'. Must be one of: {list(COUNT_MODES)}")
+
+    if mode == COUNT_ESTIMATED and not clean_filters(filters):
+        estimated = await sync_to_async(estimate_table_rows)(model, queryset.db)
+
+        if estimated is not None:
+            return estimated, COUNT_ESTIMATED
+
+    key = count_cache_key(model, filters, scope)
+    total_items = await cache.aget(key)
+
+    if total_items is None:
+        total_items = await queryset.acount()
+        await cache.aset(key, total_items, get_count_cache_timeout())
+
+    return total_items, COUNT_EXACT
@@ -0,0 +1,8 @@
+from django.db.backends.mysql import base
+from api.db.pool import PooledDatabaseWrapperMixin
+
+# ENGINE = 'api.db.mysql': backend MySQL của Django + giới hạn connection (xem api/db/pool.py)
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    pass
@@ -0,0 +1,269 @@
+import threading
+import time
+import weakref
+from django.db import OperationalError, connections
+from api.profiling import labels
+
+# Pool connection DB theo process (worker): connection mượn khi request cần, trả lại khi request kết thúc
+# Backend MySQL của Django không có pool (pool sẵn có chỉ cho PostgreSQL), nên:
+# - get_new_connection() của wrapper lấy 1 connection rảnh trong pool (hoặc mở mới nếu chưa đủ SIZE),
+#   đủ SIZE connection đang được dùng thì chờ tối đa TIMEOUT giây rồi báo PoolTimeout (OperationalError)
+# - request_finished (xem signals.py): connection ngoài transaction được trả về pool thay vì giữ ở thread,
+#   thread rảnh không giữ connection => số thread của server có thể lớn hơn SIZE
+# - CONN_MAX_AGE: tuổi tối đa của 1 connection trong pool, quá tuổi thì đóng khi trả về / khi lấy ra
+# - CONN_HEALTH_CHECKS: connection rảnh lấy ra được kiểm tra (ping) trước khi dùng, chết thì mở connection khác
+# ASGI: mỗi request chạy ORM ở thread mới, phải đặt CONN_MAX_AGE = 0 (đóng sau mỗi request),
+#   pool khi đó chỉ giới hạn số connection mở cùng lúc
+# SIZE = 0: không giới hạn
+
+class PoolTimeout(OperationalError):
+    pass
+
+class ConnectionPool:
+    def __init__(self, alias, size=0, timeout=5.0, max_age=None):
+        self.alias = alias
+        self.size = size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.condition = threading.Condition()
+        # Connection rảnh: (connection của driver, thời điểm mở), lấy ra theo LIFO
+        self.idle = []
+        # Connection đang mở (rảnh + đang dùng)
+        self.open = 0
+        self.in_use = 0
+        self.peak = 0
+        self.waiting = 0
+        self.opened = 0
+        self.reused = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+
+    def expired(self, opened_at):
+        return self.max_age is not None and time.monotonic() - opened_at >= self.max_age
+
+    # -> (connection, thời điểm mở, lấy từ pool hay mới mở); connect(): mở connection mới
+    def checkout(self, connect):
+        expired = []
+        started = None
+
+        try:
+            with self.condition:
+                while True:
+                    if self.idle:
+                        raw, opened_at = self.idle.pop()
+
+                        if self.expired(opened_at):
+                            self.open -= 1
+                            expired.append(raw)
+                            continue
+
+                        self.reused += 1
+                        self.take(started)
+                        return raw, opened_at, True
+
+                    if not self.size or self.open < self.size:
+                        self.open += 1
+                        self.peak = max(self.peak, self.open)
+                        self.take(started)
+                        break
+
+                    if started is None:
+                        started = time.perf_counter()
+                        self.waiting += 1
+
+                    remaining = self.timeout - (time.perf_counter() - started)
+
+                    if remaining <= 0:
+                        self.waiting -= 1
+                        self.waits += 1
+                        self.wait_time += time.perf_counter() - started
+                        self.timeouts += 1
+                        raise PoolTimeout(
+                            f"No free database connection for '{self.alias}' after {self.timeout}s "
+                            f"(pool size {self.size})"
+                        )
+
+                    self.condition.wait(remaining)
+        finally:
+            for raw in expired:
+                close_quietly(raw)
+
+        try:
+            raw = connect()
+        except Exception:
+            self.discard()
+            raise
+
+        with self.condition:
+            self.opened += 1
+
+        return raw, time.monotonic(), False
+
+    # Gọi khi đang giữ lock: đánh dấu đã lấy được connection, cộng thời gian chờ nếu có
+    def take(self, started):
+        self.in_use += 1
+
+        if started is not None:
+            self.waiting -= 1
+            self.waits += 1
+            self.wait_time += time.perf_counter() - started
+
+    def checkin(self, raw, opened_at):
+        if self.expired(opened_at):
+            close_quietly(raw)
+            self.discard()
+            return
+
+        with self.condition:
+            self.in_use -= 1
+            self.idle.append((raw, opened_at))
+            self.condition.notify()
+
+    # Connection đang dùng đã bị đóng (hoặc mở không được): trả chỗ cho connection khác
+    def discard(self):
+        with self.condition:
+            self.in_use -= 1
+            self.open -= 1
+            self.condition.notify()
+
+    def close_idle(self):
+        with self.condition:
+            idle, self.idle = self.idle, []
+            self.open -= len(idle)
+            self.condition.notify_all()
+
+        for raw, _ in idle:
+            close_quietly(raw)
+
+    def snapshot(self):
+        with self.condition:
+            return {
+                "size": self.size,
+                "open": self.open,
+                "in_use": self.in_use,
+                "idle": len(self.idle),
+                "peak": self.peak,
+                "waiting": self.waiting,
+                "opened": self.opened,
+                "reused": self.reused,
+                "waits": self.waits,
+                "wait_time": self.wait_time,
+                "timeouts": self.timeouts,
+            }
+
+def close_quietly(raw):
+    try:
+        raw.close()
+    except Exception:
+        pass
+
+pools = {}
+pools_lock = threading.Lock()
+
+def get_pool(alias, settings_dict):
+    pool = pools.get(alias)
+
+    if pool is None:
+        with pools_lock:
+            pool = pools.get(alias)
+
+            if pool is None:
+                config = settings_dict.get("POOL") or {}
+                pool = pools[alias] = ConnectionPool(
+                    alias, config.get("SIZE", 0), config.get("TIMEOUT", 5.0), settings_dict.get("CONN_MAX_AGE")
+                )
+
+    return pool
+
+# Dùng chung cho các backend trong api/db/<backend>/base.py
+class PooledDatabaseWrapperMixin:
+    pool_slot = None
+    pool_opened_at = None
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+
+        def connect():
+            return super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params)
+
+        while True:
+            raw, opened_at, reused = pool.checkout(connect)
+
+            if not reused or not self.settings_dict["CONN_HEALTH_CHECKS"] or self.raw_is_usable(raw):
+                break
+
+            close_quietly(raw)
+            pool.discard()
+
+        self.pool_opened_at = opened_at
+        # Trả chỗ khi wrapper bị thu hồi mà connection chưa đóng / chưa trả (thread kết thúc)
+        self.pool_slot = weakref.finalize(self, pool.discard)
+
+        return raw
+
+    def raw_is_usable(self, raw):
+        current, self.connection = self.connection, raw
+
+        try:
+            return self.is_usable()
+        finally:
+            self.connection = current
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            if self.pool_slot is not None:
+                self.pool_slot()
+                self.pool_slot = None
+
+    # Trả connection về pool (giữ mở), request sau của thread bất kỳ dùng lại được
+    # Đang trong transaction hoặc autocommit bị đổi: không trả
+    def return_to_pool(self):
+        if self.connection is None or self.pool_slot is None or self.in_atomic_block:
+            return
+
+        if self.get_autocommit() != self.settings_dict["AUTOCOMMIT"] or self.errors_occurred:
+            self.close()
+            return
+
+        self.pool_slot.detach()
+        self.pool_slot = None
+        raw, self.connection = self.connection, None
+        self.pool.checkin(raw, self.pool_opened_at)
+
+# Cuối request: trả connection của thread này về pool
+def return_connections():
+    for connection in connections.all(initialized_only=True):
+        if isinstance(connection, PooledDatabaseWrapperMixin):
+            connection.return_to_pool()
+
+def render_pool_metrics():
+    lines = []
+    snapshots = {alias: pool.snapshot() for alias, pool in sorted(pools.items())}
+
+    for name, key, metric_type, help_text, fmt in (
+        ("shop_db_pool_size", "size", "gauge", "Max open connections per process (0 = unbounded)", "{}"),
+        ("shop_db_pool_open", "open", "gauge", "Open connections (idle + in use)", "{}"),
+        ("shop_db_pool_in_use", "in_use", "gauge", "Connections checked out by a request", "{}"),
+        ("shop_db_pool_idle", "idle", "gauge", "Idle connections kept in the pool", "{}"),
+        ("shop_db_pool_peak", "peak", "gauge", "Most connections open at once", "{}"),
+        ("shop_db_pool_waiting", "waiting", "gauge", "Threads waiting for a connection", "{}"),
+        ("shop_db_pool_connections_total", "opened", "counter", "Connections opened", "{}"),
+        ("shop_db_pool_reused_total", "reused", "counter", "Checkouts served by an idle connection", "{}"),
+        ("shop_db_pool_waits_total", "waits", "counter", "Checkouts that had to wait", "{}"),
+        ("shop_db_pool_wait_seconds_total", "wait_time", "counter", "Time spent waiting for a connection", "{:.6f}"),
+        ("shop_db_pool_timeouts_total", "timeouts", "counter", "Waits that timed out", "{}"),
+    ):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.extend(
+            f"{name}{labels(alias=alias)} {fmt.format(snapshot[key])}" for alias, snapshot in snapshots.items()
+        )
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,220 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.decorators import sync_and_async_middleware
+from api.catalog_cache import is_shared
+
+# Đọc từ replica (DATABASE_REPLICAS trong settings, tạo từ DB_REPLICA_HOSTS) cho request GET / HEAD / OPTIONS
+# - replica_middleware chọn 1 replica còn tốt cho request, ReplicaRouter đưa câu SELECT sang replica đó
+# - Mọi câu write (và các câu đọc sau nó trong request) chạy trên primary, đọc trong transaction cũng vậy
+# - Request có write: client (theo header Authorization, không có thì theo IP) đọc primary thêm
+#   DB_REPLICA_PIN_SECONDS giây => thấy ngay dữ liệu vừa ghi dù replica còn trễ
+#   + pin lưu trong cache REPLICA_PIN_CACHE_ALIAS, bắt buộc là cache chung (Redis): request sau có thể vào
+#     worker khác, LocMem thì middleware báo ImproperlyConfigured lúc khởi động
+#   + client chưa đăng nhập sau cùng 1 NAT / proxy có chung IP nên chung pin (chỉ đọc primary nhiều hơn)
+# - Replica trễ hơn DB_REPLICA_MAX_LAG giây, replication dừng hoặc không kết nối được: đọc primary,
+#   trạng thái kiểm tra lại sau mỗi DB_REPLICA_CHECK_INTERVAL giây (theo process)
+# Không khai báo replica: mọi query chạy trên primary như trước
+
+PRIMARY = DEFAULT_DB_ALIAS
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+logger = logging.getLogger(__name__)
+
+def get_replicas():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+def get_max_lag():
+    return getattr(settings, "REPLICA_MAX_LAG", 5)
+
+def get_check_interval():
+    return getattr(settings, "REPLICA_CHECK_INTERVAL", 5)
+
+def get_pin_seconds():
+    return getattr(settings, "REPLICA_PIN_SECONDS", 5)
+
+def get_pin_cache():
+    return caches[getattr(settings, "REPLICA_PIN_CACHE_ALIAS", "default")]
+
+def check_pin_cache():
+    if get_replicas() and not is_shared(get_pin_cache()):
+        raise ImproperlyConfigured(
+            "DATABASE_REPLICAS needs a shared cache for read-your-writes pins: set REDIS_URL "
+            "or point REPLICA_PIN_CACHE_ALIAS at a cache shared by all workers"
+        )
+
+########## Trạng thái replica ##########
+# Số giây replica trễ so với primary, None nếu không biết (replication dừng / không phải replica)
+# Backend không có replication (vd. SQLite khi chạy local): chỉ kiểm tra kết nối được, trễ 0
+def replica_lag(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor != "mysql":
+            cursor.execute("SELECT 1")
+            return 0
+
+        # MySQL < 8.0.22 chỉ có SHOW SLAVE STATUS
+        try:
+            cursor.execute("SHOW REPLICA STATUS")
+        except DatabaseError:
+            cursor.execute("SHOW SLAVE STATUS")
+
+        row = cursor.fetchone()
+
+        if row is None:
+            return None
+
+        status = dict(zip([column[0] for column in cursor.description], row))
+
+    lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+    return int(lag) if lag is not None else None
+
+def check_replica(alias):
+    connection = connections[alias]
+
+    try:
+        lag = replica_lag(connection)
+    except Exception:
+        logger.warning("Replica %s unavailable, reading from primary", alias, exc_info=True)
+        connection.close()
+        return False
+
+    if lag is None or lag > get_max_lag():
+        logger.warning("Replica %s lagging, reading from primary", alias, extra={"lag": lag})
+        return False
+
+    return True
+
+class ReplicaHealth:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # alias -> (còn tốt, thời điểm kiểm tra)
+        self.states = {}
+
+    def is_healthy(self, alias):
+        state = self.states.get(alias)
+
+        if state is not None and time.monotonic() - state[1] < get_check_interval():
+            return state[0]
+
+        # 1 thread kiểm tra, các thread khác dùng kết quả cũ (chưa có thì coi như chưa tốt)
+        if not self.lock.acquire(blocking=False):
+            return state[0] if state is not None else False
+
+        try:
+            healthy = check_replica(alias)
+            self.states[alias] = (healthy, time.monotonic())
+            return healthy
+        finally:
+            self.lock.release()
+
+    def reset(self):
+        self.states = {}
+
+replica_health = ReplicaHealth()
+
+def choose_replica():
+    healthy = [alias for alias in get_replicas() if replica_health.is_healthy(alias)]
+    return random.choice(healthy) if healthy else None
+
+########## Router ##########
+class RequestRouting:
+    __slots__ = ("replica", "wrote")
+
+    def __init__(self, replica=None):
+        self.replica = replica
+        self.wrote = False
+
+current_routing = ContextVar("current_routing", default=None)
+
+class ReplicaRouter:
+    # Luôn trả alias cụ thể: trả None thì Django dùng DB của instance (object đọc từ replica sẽ bị ghi vào replica)
+    def db_for_read(self, model, **hints):
+        routing = current_routing.get()
+
+        if routing is None or routing.replica is None or routing.wrote or connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = current_routing.get()
+
+        if routing is not None:
+            routing.wrote = True
+
+        return PRIMARY
+
+    # Replica là bản sao của primary: quan hệ giữa object đọc từ 2 nơi vẫn hợp lệ
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db in get_replicas() else None
+
+# Các câu đọc còn lại của request chạy trên primary (vd. đọc để ghi lại, không được dùng dữ liệu trễ)
+def pin_to_primary():
+    routing = current_routing.get()
+
+    if routing is not None:
+        routing.wrote = True
+
+########## Middleware ##########
+def pin_key(request):
+    client = request.headers.get("Authorization") or request.META.get("REMOTE_ADDR", "")
+    return "replica_pin:" + hashlib.sha1(client.encode()).hexdigest()
+
+def start_routing(request):
+    replica = None
+
+    if request.method in READ_METHODS and not get_pin_cache().get(pin_key(request)):
+        replica = choose_replica()
+
+    return RequestRouting(replica)
+
+def finish_routing(request, routing):
+    if routing.wrote:
+        get_pin_cache().set(pin_key(request), True, get_pin_seconds())
+
+@sync_and_async_middleware
+def replica_middleware(get_response):
+    check_pin_cache()
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not get_replicas():
+                return await get_response(request)
+
+            # Kiểm tra replica cần query DB: chạy ở thread sync như ORM của view async
+            routing = await sync_to_async(start_routing)(request)
+            token = current_routing.set(routing)
+
+            try:
+                return await get_response(request)
+            finally:
+                current_routing.reset(token)
+
+                if routing.wrote:
+                    await sync_to_async(finish_routing)(request, routing)
+    else:
+        def middleware(request):
+            if not get_replicas():
+                return get_response(request)
+
+            routing = start_routing(request)
+            token = current_routing.set(routing)
+
+            try:
+                return get_response(request)
+            finally:
+                current_routing.reset(token)
+                finish_routing(request, routing)
+
+    return middleware
@@ -0,0 +1,8 @@
+from django.db.backends.sqlite3 import base
+from api.db.pool import PooledDatabaseWrapperMixin
+
+# ENGINE = 'api.db.sqlite3': chạy local / test pool không cần MySQL (xem api/db/pool.py)
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    pass
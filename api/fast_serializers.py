@@ -0,0 +1,194 @@
+from rest_framework import serializers
+from .models import Category, OrderItem
+from .profiling import timed_serializer
+
+# Serialize read-only cho các API list: lấy row bằng .values() rồi dựng dict bằng
+# hàm row -> dict đã compile sẵn cho từng model, không đi qua Field.to_representation
+# của DRF cho từng field / từng row.
+# Output phải giống hệt ProductSerializer / OrderSerializer (xem test FastSerializerTest):
+# cùng thứ tự key, UUID -> str, Decimal -> "12.00", datetime -> ISO 8601 ("...Z")
+
+# Format Decimal / datetime dùng lại đúng field của DRF để không lệch output
+format_money = serializers.DecimalField(max_digits=12, decimal_places=2).to_representation
+format_datetime = serializers.DateTimeField().to_representation
+
+# fields: [(key, source, converter)]
+# - source là str: key trong row (.values()), là tuple: tên tham số truyền thêm khi gọi
+# - converter = None: giữ nguyên giá trị (str / int / bool), None luôn trả về None như DRF
+def compile_row(fields, name="row_to_dict"):
+    namespace = {}
+    params = []
+    items = []
+
+    for i, (key, source, converter) in enumerate(fields):
+        if isinstance(source, tuple):
+            params.append(source[0])
+            value = source[0]
+        else:
+            value = f"row[{source!r}]"
+
+        if converter is not None:
+            namespace[f"convert_{i}"] = converter
+            value = f"(None if {value} is None else convert_{i}({value}))"
+
+        items.append(f"{key!r}: {value}")
+
+    source = f"def {name}({', '.join(['row'] + params)}):\n    return {{{', '.join(items)}}}\n"
+    exec(compile(source, f"<fast_serializers.{name}>", "exec"), namespace)
+
+    return namespace[name]
+
+# CategorySerializer: id, name, is_active
+category_to_dict = compile_row([
+    ("id", "id", str),
+    ("name", "name", None),
+    ("is_active", "is_active", None),
+], "category_to_dict")
+
+# ProductSerializer: id, name, price, description, categories, is_active
+PRODUCT_FIELDS = ("id", "name", "price", "description", "is_active")
+
+product_to_dict = compile_row([
+    ("id", "id", str),
+    ("name", "name", None),
+    ("price", "price", None),
+    ("description", "description", None),
+    ("categories", ("categories",), None),
+    ("is_active", "is_active", None),
+], "product_to_dict")
+
+# OrderItemSerializer: id, product, quantity, price, sub_total
+ORDER_ITEM_FIELDS = ("order_id", "id", "quantity", "price", "sub_total") + tuple(f"product__{field}" for field in PRODUCT_FIELDS)
+
+item_product_to_dict = compile_row([
+    (field, f"product__{field}", str if field == "id" else None) for field in PRODUCT_FIELDS[:4]
+] + [
+    ("categories", ("categories",), None),
+    ("is_active", "product__is_active", None),
+], "item_product_to_dict")
+
+order_item_to_dict = compile_row([
+    ("id", "id", str),
+    ("product", ("product",), None),
+    ("quantity", "quantity", None),
+    ("price", "price", format_money),
+    ("sub_total", "sub_total", format_money),
+], "order_item_to_dict")
+
+# OrderSerializer: id, user, payment_method, status, note, total_amount, created_at, updated_at, items
+ORDER_FIELDS = (
+    "id", "status", "note", "total_amount", "created_at", "updated_at",
+    "user__id", "user__username", "user__name", "user__is_active",
+    "payment_method__id", "payment_method__key", "payment_method__name", "payment_method__is_active",
+)
+
+user_to_dict = compile_row([
+    ("id", "user__id", str),
+    ("username", "user__username", None),
+    ("name", "user__name", None),
+    ("is_active", "user__is_active", None),
+], "user_to_dict")
+
+payment_method_to_dict = compile_row([
+    ("id", "payment_method__id", str),
+    ("key", "payment_method__key", None),
+    ("name", "payment_method__name", None),
+    ("is_active", "payment_method__is_active", None),
+], "payment_method_to_dict")
+
+order_to_dict = compile_row([
+    ("id", "id", str),
+    ("user", ("user",), None),
+    ("payment_method", ("payment_method",), None),
+    ("status", "status", None),
+    ("note", "note", None),
+    ("total_amount", "total_amount", format_money),
+    ("created_at", "created_at", format_datetime),
+    ("updated_at", "updated_at", format_datetime),
+    ("items", ("items",), None),
+], "order_to_dict")
+
+########## Products ##########
+# Rows cho serialize_products, dùng được với filter / order_by / slice / cursor pagination
+# extra_fields: cột đọc thêm (vd. cột sort cho cursor), không có trong dict trả về
+def product_values(queryset, *extra_fields):
+    return queryset.prefetch_related(None).values(*PRODUCT_FIELDS, *extra_fields)
+
+# Giống query prefetch_related('categories'): 1 query cho cả page, cùng thứ tự category
+def product_categories_queryset(product_ids):
+    return Category.objects.filter(products__in=product_ids).values("products__id", "id", "name", "is_active")
+
+def group_categories(rows):
+    categories = {}
+
+    for row in rows:
+        categories.setdefault(row["products__id"], []).append(category_to_dict(row))
+
+    return categories
+
+def build_products(rows, categories):
+    return [product_to_dict(row, categories.get(row["id"], [])) for row in rows]
+
+@timed_serializer
+def serialize_products(rows):
+    rows = list(rows)
+
+    if not rows:
+        return []
+
+    categories = group_categories(product_categories_queryset([row["id"] for row in rows]))
+
+    return build_products(rows, categories)
+
+@timed_serializer
+async def aserialize_products(rows):
+    if not rows:
+        return []
+
+    categories = group_categories([
+        row async for row in product_categories_queryset([row["id"] for row in rows])
+    ])
+
+    return build_products(rows, categories)
+
+########## Orders ##########
+def order_values(queryset, *extra_fields):
+    return queryset.prefetch_related(None).values(*ORDER_FIELDS, *extra_fields)
+
+# 3 query cho cả page như OrderSerializer.setup_eager_loading:
+# order JOIN user / payment method, item LEFT JOIN product, category của các product
+@timed_serializer
+def serialize_orders(rows):
+    rows = list(rows)
+
+    if not rows:
+        return []
+
+    item_rows = list(
+        OrderItem.objects.filter(order__in=[row["id"] for row in rows]).values(*ORDER_ITEM_FIELDS)
+    )
+
+    product_ids = {row["product__id"] for row in item_rows if row["product__id"] is not None}
+    categories = group_categories(product_categories_queryset(product_ids)) if product_ids else {}
+
+    items = {}
+
+    for row in item_rows:
+        product = None
+
+        if row["product__id"] is not None:
+            product = item_product_to_dict(row, categories.get(row["product__id"], []))
+
+        items.setdefault(row["order_id"], []).append(
+            order_item_to_dict(row, product)
+        )
+
+    return [
+        order_to_dict(
+            row,
+            user_to_dict(row),
+            payment_method_to_dict(row) if row["payment_method__id"] is not None else None,
+            items.get(row["id"], []),
+        )
+        for row in rows
+    ]
@@ -0,0 +1,54 @@
+import os
+import time
+import uuid
+from django.db import models
+
+# UUID v7: 48 bit timestamp (ms) + random
+# Các id sinh sau luôn lớn hơn id sinh trước nên insert vào cuối clustered index (InnoDB)
+# thay vì rải ngẫu nhiên như uuid4
+def uuid7():
+    timestamp_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+
+    value = (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80
+    value |= 0x7 << 76                              # version
+    value |= (rand >> 64 & 0xFFF) << 64             # rand_a, 12 bit
+    value |= 0b10 << 62                             # variant
+    value |= rand & 0x3FFF_FFFF_FFFF_FFFF           # rand_b, 62 bit
+
+    return uuid.UUID(int=value)
+
+
+# UUIDField lưu BINARY(16) trên MySQL thay vì char(32)
+# Các DB khác giữ nguyên cách lưu của UUIDField, API vẫn trả về chuỗi UUID như cũ
+# Internal type riêng để backend MySQL không tự convert giá trị như chuỗi hex
+class BinaryUUIDField(models.UUIDField):
+    def get_internal_type(self):
+        return 'BinaryUUIDField'
+
+    def db_type(self, connection):
+        if connection.vendor == 'mysql':
+            return 'binary(16)'
+
+        return connection.data_types['UUIDField'] % self.db_type_parameters(connection)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if connection.vendor != 'mysql':
+            return super().get_db_prep_value(value, connection, prepared)
+
+        if value is None:
+            return None
+
+        if not isinstance(value, uuid.UUID):
+            value = self.to_python(value)
+
+        return value.bytes
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+
+        if isinstance(value, (bytes, bytearray)):
+            return uuid.UUID(bytes=bytes(value))
+
+        return uuid.UUID(value)
@@ -0,0 +1,125 @@
+import json
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Driver HTTP đơn giản (stdlib) để đo throughput / latency của server đang chạy
+# - run_http_load: mỗi worker là 1 thread gửi request liên tục tới khi hết `duration`
+# - run_http_mix: các worker lần lượt lấy request trong 1 danh sách có sẵn (method, path, body)
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def summarize(latencies, elapsed, errors=0):
+    values = sorted(latencies)
+
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "rps": len(values) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(values, 0.50) * 1000,
+        "p95_ms": percentile(values, 0.95) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+    }
+
+def run_http_load(url, concurrency=20, duration=10.0, headers=None, timeout=30.0):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        local_latencies = []
+        local_errors = 0
+
+        while time.perf_counter() < deadline:
+            request = urllib.request.Request(url, headers=headers or {})
+            start = time.perf_counter()
+
+            try:
+                with urllib.request.urlopen(request, timeout=timeout) as response:
+                    response.read()
+                local_latencies.append(time.perf_counter() - start)
+            except (urllib.error.URLError, OSError):
+                local_errors += 1
+
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    return summarize(latencies, time.perf_counter() - started, errors[0])
+
+# Header Server-Timing của profiling middleware: db;dur=<ms>;desc="<n> queries..."
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries')
+
+# -> (số query, db ms), None nếu response không có header (vd. tắt PROFILING_SERVER_TIMING)
+def parse_server_timing(value):
+    match = SERVER_TIMING_DB.search(value or "")
+    return (int(match.group(2)), float(match.group(1))) if match else (None, None)
+
+# requests: list (name, method, path, body) -> list sample (name, latency giây, status, server timing)
+# status 0: không kết nối được / timeout
+def run_http_mix(base_url, requests, concurrency=20, headers=None, timeout=30.0):
+    samples = []
+    lock = threading.Lock()
+    pending = iter(requests)
+
+    def send(method, path, body):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(
+            f"{base_url}{path}", data=data, method=method,
+            headers={**(headers or {}), **({"Content-Type": "application/json"} if data is not None else {})}
+        )
+
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                response.read()
+                return response.status, response.headers.get("Server-Timing")
+        except urllib.error.HTTPError as error:
+            error.read()
+            return error.code, error.headers.get("Server-Timing")
+        except (urllib.error.URLError, OSError):
+            return 0, None
+
+    def worker():
+        local_samples = []
+
+        while True:
+            with lock:
+                item = next(pending, None)
+
+            if item is None:
+                break
+
+            name, method, path, body = item
+            start = time.perf_counter()
+            status, timing = send(method, path, body)
+            local_samples.append((name, time.perf_counter() - start, status, timing))
+
+        with lock:
+            samples.extend(local_samples)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    return samples
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.category_products import find_link_drift, rebuild_category_products
+
+# So bảng category_product với bảng product_categories + is_active / price của product
+#   python manage.py audit_category_products          # chỉ báo cáo, exit code 1 nếu có lệch
+#   python manage.py audit_category_products --fix    # lệch thì rebuild toàn bộ bảng
+class Command(BaseCommand):
+    help = "Compare the denormalized category_product table with product categories and report (or fix) drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Rebuild category_product when it has drifted")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        drift = find_link_drift()
+        drifted = sum(drift.values())
+        summary = f"{drift['missing']} missing, {drift['extra']} extra, {drift['stale']} stale category links"
+
+        if options["fix"] and drifted:
+            created = rebuild_category_products(options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"{summary}, rebuilt {created} category links"))
+        elif drifted:
+            raise CommandError(summary)
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
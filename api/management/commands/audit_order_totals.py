@@ -0,0 +1,53 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from api.order_totals import find_drift, recompute_totals
+from api.order_stats import rebuild_order_stats
+
+# So total_amount của order với tổng sub_total các item (mỗi batch 1 query tổng hợp)
+#   python manage.py audit_order_totals               # chỉ báo cáo, exit code 1 nếu có lệch
+#   python manage.py audit_order_totals --fix         # tính lại total cho các order bị lệch
+#                                                     # và rollup doanh thu của API report
+class Command(BaseCommand):
+    help = "Recompute order totals from their items and report (or fix) drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Rewrite total_amount of drifted orders")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--show", type=int, default=20, help="Number of drifted orders to print")
+
+    def handle(self, *args, **options):
+        drifted = 0
+        fixed = 0
+        total_drift = Decimal("0.00")
+        pending = []
+
+        for order_id, stored, computed in find_drift(options["batch_size"]):
+            if drifted < options["show"]:
+                self.stdout.write(f"{order_id}  stored {stored}  computed {computed}  drift {computed - stored}")
+
+            drifted += 1
+            total_drift += computed - stored
+
+            if options["fix"]:
+                pending.append(order_id)
+
+                # 1 câu UPDATE cho mỗi batch order bị lệch
+                if len(pending) >= options["batch_size"]:
+                    fixed += recompute_totals(pending)
+                    pending = []
+
+        if pending:
+            fixed += recompute_totals(pending)
+
+        # Doanh thu trong rollup lấy từ total_amount cũ
+        if fixed:
+            rebuild_order_stats()
+
+        summary = f"{drifted} orders drifted, total drift {total_drift}"
+
+        if options["fix"]:
+            self.stdout.write(self.style.SUCCESS(f"{summary}, {fixed} fixed"))
+        elif drifted:
+            raise CommandError(summary)
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,80 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from api.benchmark_data import rolled_back
+from api.benchmark_suite import DEFAULT_MIX, load_mix, seed, run_benchmark, compare_results
+
+# Replay 1 mix request trên dữ liệu seed, in kết quả JSON theo endpoint (xem api/benchmark_suite.py)
+# Mặc định chạy trong process bằng test client, dữ liệu seed + mọi thay đổi của request bị rollback khi xong
+#   python manage.py benchmark_api --products 10000 --orders 5000 --rounds 5 --output bench.json
+#   python manage.py benchmark_api --mix mix.jsonl --baseline bench.json --max-regression 0.2
+# --base-url: gửi request qua HTTP tới server đang chạy (driver trong api/loadtest.py)
+#   server phải thấy dữ liệu seed nên dữ liệu được COMMIT, chỉ dùng với database riêng cho benchmark
+#   python manage.py benchmark_api --base-url http://127.0.0.1:8000 --concurrency 50
+
+
+class Command(BaseCommand):
+    help = "Replay a request mix against every route and report throughput, latency percentiles and queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=2000)
+        parser.add_argument("--categories", type=int, default=20)
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--orders", type=int, default=2000)
+        parser.add_argument("--items-per-order", type=int, default=3)
+        parser.add_argument("--mix", default=None, help="JSONL request mix (default: built-in mix over every route)")
+        parser.add_argument("--rounds", type=int, default=3)
+        parser.add_argument("--warmup", type=int, default=1, help="Rounds run before measuring")
+        parser.add_argument("--seed", type=int, default=0, help="Shuffle seed, same seed = same request order")
+        parser.add_argument("--base-url", default=None)
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument("--output", default=None, help="Write the JSON result to this file")
+        parser.add_argument("--baseline", default=None, help="Fail when slower than this earlier result")
+        parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p95 increase (0.2 = 20%%)")
+
+    def handle(self, *args, **options):
+        try:
+            mix = load_mix(options["mix"]) if options["mix"] else DEFAULT_MIX
+        except (OSError, ValueError) as error:
+            raise CommandError(f"Cannot read mix: {error}")
+
+        if options["base_url"]:
+            with transaction.atomic():
+                data = self.seed(options)
+
+            result = self.run(mix, data, options)
+        else:
+            with rolled_back():
+                result = self.run(mix, self.seed(options), options)
+
+        result["config"] = {
+            key: options[key] for key in (
+                "products", "categories", "users", "orders", "items_per_order",
+                "mix", "rounds", "warmup", "seed", "base_url", "concurrency",
+            )
+        }
+        output = json.dumps(result, indent=2)
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(output)
+
+        self.stdout.write(output)
+
+        if options["baseline"]:
+            with open(options["baseline"], encoding="utf-8") as file:
+                regressions = compare_results(json.load(file), result, options["max_regression"])
+
+            if regressions:
+                raise CommandError("Regressions:\n" + "\n".join(regressions))
+
+    def seed(self, options):
+        return seed(
+            options["products"], options["orders"], options["categories"], options["users"], options["items_per_order"]
+        )
+
+    def run(self, mix, data, options):
+        return run_benchmark(
+            mix, data, options["rounds"], options["seed"], options["warmup"],
+            options["base_url"], options["concurrency"]
+        )
@@ -0,0 +1,121 @@
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.http import QueryDict
+from api.benchmark_data import rolled_back
+from api.category_products import link_rows, category_count_scope
+from api.counting import count_items
+from api.fast_serializers import product_values
+from api.models import Category, Product, CategoryProduct
+from api.product_controller import filter_products
+
+# /products?category= trên bảng category_product so với JOIN bảng M2M + DISTINCT
+# Mặc định 200k product x 5 category = 1M link, tạo trong transaction và rollback khi xong
+#   python manage.py benchmark_category_filter --products 200000 --links-per-product 5
+# - count: COUNT(*) của category, "cached" = count_items theo scope của category
+# - page / price page: page đầu (20 product), có thêm is_active + khoảng giá
+
+
+class Command(BaseCommand):
+    help = "Benchmark category filtering on the denormalized category_product table vs the M2M join"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=200000)
+        parser.add_argument("--categories", type=int, default=50)
+        parser.add_argument("--links-per-product", type=int, default=5)
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            categories = self.seed(options)
+            self.run(categories[0].id, options["limit"], options["repeat"])
+
+    def seed(self, options):
+        categories = Category.objects.bulk_create([
+            Category(name=f"Bench category {i}") for i in range(options["categories"])
+        ])
+        Through = Product.categories.through
+        step = max(len(categories) // options["links_per_product"], 1)
+        started = time.perf_counter()
+
+        # Mỗi batch product insert ngay link của batch đó, không giữ 1M object trong memory
+        for start in range(0, options["products"], options["batch_size"]):
+            products = Product.objects.bulk_create([
+                Product(
+                    name=f"Bench product {i}",
+                    price=1000 + (i * 7919) % 100000,
+                    description=f"Description {i}",
+                    is_active=i % 10 != 0
+                )
+                for i in range(start, min(start + options["batch_size"], options["products"]))
+            ])
+            links = {
+                product.id: list(dict.fromkeys(
+                    categories[(i + k * step) % len(categories)].id for k in range(options["links_per_product"])
+                ))
+                for i, product in enumerate(products, start=start)
+            }
+
+            Through.objects.bulk_create([
+                Through(product_id=product_id, category_id=category_id)
+                for product_id, category_ids in links.items()
+                for category_id in category_ids
+            ])
+            CategoryProduct.objects.bulk_create([
+                link for product in products for link in link_rows(product, links[product.id])
+            ])
+
+        self.stdout.write(
+            f"seeded {options['products']} products, {CategoryProduct.objects.count()} links"
+            f" in {time.perf_counter() - started:.1f}s"
+        )
+
+        return categories
+
+    def run(self, category_id, limit, repeat):
+        params = QueryDict(mutable=True)
+        params.update({"category": str(category_id)})
+        price_params = params.copy()
+        price_params.update({"is_active": "true", "min_price": "20000", "max_price": "40000"})
+
+        queryset, filters = filter_products(params)
+        price_queryset, _ = filter_products(price_params)
+
+        naive = Product.objects.filter(categories__id=category_id).distinct()
+        naive_price = Product.objects.filter(
+            categories__id=category_id, is_active=True, price__gte=20000, price__lte=40000
+        ).distinct()
+
+        def cached_count():
+            return count_items(queryset, filters, scope=category_count_scope(category_id))
+
+        cache.clear()
+        cases = [
+            ("count", lambda: naive.count(), lambda: queryset.count()),
+            ("count cached", lambda: naive.count(), cached_count),
+            ("page", lambda: list(product_values(naive)[:limit]), lambda: list(product_values(queryset)[:limit])),
+            ("price page",
+                lambda: list(product_values(naive_price)[:limit]),
+                lambda: list(product_values(price_queryset)[:limit])),
+            ("price count", lambda: naive_price.count(), lambda: price_queryset.count()),
+        ]
+
+        self.stdout.write(f"{'query':<14}{'m2m+distinct ms':>17}{'category_product ms':>21}{'speedup':>9}")
+
+        for name, baseline, optimized in cases:
+            baseline_ms = self.measure(baseline, repeat)
+            optimized_ms = self.measure(optimized, repeat)
+
+            self.stdout.write(
+                f"{name:<14}{baseline_ms:>17.3f}{optimized_ms:>21.3f}{baseline_ms / optimized_ms:>8.1f}x"
+            )
+
+    def measure(self, run, repeat):
+        started = time.perf_counter()
+
+        for _ in range(repeat):
+            run()
+
+        return (time.perf_counter() - started) / repeat * 1000
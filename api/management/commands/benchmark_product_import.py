@@ -0,0 +1,60 @@
+import time
+from django.core.management.base import BaseCommand
+from api.benchmark_data import rolled_back
+from api.models import Category
+from api.product_import import import_products
+from api.serializers import ProductSerializer
+
+# Throughput của bulk import so với tạo từng product qua ProductSerializer (như create_product)
+# Cả 2 chạy trong transaction và rollback khi xong
+#   python manage.py benchmark_product_import --rows 200000 --chunk-size 1000
+
+
+def make_rows(count, category_ids):
+    return [
+        {
+            "name": f"Bench product {i}",
+            "price": 1000 + i,
+            "description": f"Description {i}",
+            "category_ids": [str(category_id) for category_id in category_ids[:1 + i % 3]],
+        }
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Benchmark bulk product import throughput vs one ProductSerializer per product"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200000)
+        parser.add_argument("--chunk-size", type=int, nargs="+", default=[500, 1000, 5000])
+        parser.add_argument("--baseline-rows", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            categories = Category.objects.bulk_create([Category(name=f"Bench category {i}") for i in range(5)])
+            category_ids = [category.id for category in categories]
+
+            with rolled_back():
+                rows = make_rows(options["baseline_rows"], category_ids)
+                started = time.perf_counter()
+
+                for data in rows:
+                    serializer = ProductSerializer(data=data)
+                    serializer.is_valid(raise_exception=True)
+                    serializer.save()
+
+                baseline = len(rows) / (time.perf_counter() - started)
+                self.stdout.write(f"{'ProductSerializer':<24}{len(rows):>10} rows {baseline:>10.0f} rows/s")
+
+            for chunk_size in options["chunk_size"]:
+                with rolled_back():
+                    rows = make_rows(options["rows"], category_ids)
+                    started = time.perf_counter()
+                    result = import_products(rows, chunk_size=chunk_size)
+                    rate = result["created"] / (time.perf_counter() - started)
+
+                    self.stdout.write(
+                        f"{f'import chunk={chunk_size}':<24}{result['created']:>10} rows {rate:>10.0f} rows/s"
+                        f" {rate / baseline:>6.1f}x"
+                    )
@@ -0,0 +1,79 @@
+import time
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from api.models import Category, Product, Order
+from api.benchmark_data import rolled_back, seed_benchmark_data
+from api.fast_serializers import category_to_dict, product_values, serialize_products, order_values, serialize_orders
+from api.renderers import FastJSONRenderer, orjson, msgspec
+
+# So sánh thời gian render JSON body của các response get_list theo từng encoder
+# - products / orders / categories: data giống response của API (Decimal, datetime đã là str)
+# - order values: row .values() chưa serialize (UUID, Decimal, datetime thật)
+# "same" = bytes giống hệt JSONRenderer của DRF
+#   pip install orjson msgspec
+#   python manage.py benchmark_renderers --sizes 10 100 500
+
+
+class Command(BaseCommand):
+    help = "Benchmark JSON rendering of get_list responses per encoder (json, orjson, msgspec)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+        parser.add_argument("--repeat", type=int, default=200)
+
+    def handle(self, *args, **options):
+        largest = max(options["sizes"])
+
+        backends = ["json"] + [
+            name for name, module in (("orjson", orjson), ("msgspec", msgspec)) if module is not None
+        ]
+
+        with rolled_back():
+            seed_benchmark_data(largest, largest)
+
+            self.stdout.write(f"{'response':<14}{'page':>6}{'backend':>9}{'ms':>9}{'KB':>8}{'speedup':>9}  same")
+
+            for size in options["sizes"]:
+                for name, payload in self.payloads(size).items():
+                    expected = JSONRenderer().render(payload)
+                    baseline = None
+
+                    for backend in backends:
+                        renderer = FastJSONRenderer()
+                        renderer.backend = backend
+
+                        elapsed = self.measure(renderer, payload, options["repeat"])
+                        baseline = baseline or elapsed
+                        same = renderer.render(payload) == expected
+
+                        self.stdout.write(
+                            f"{name:<14}{size:>6}{backend:>9}{elapsed:>9.3f}{len(expected) / 1024:>8.0f}"
+                            f"{baseline / elapsed:>8.1f}x  {same}"
+                        )
+
+    def payloads(self, size):
+        def page(data):
+            return {
+                "success": True,
+                "paging": {"current_page": 1, "total_page": 1, "total_item": len(data), "total_item_type": "exact"},
+                "data": data,
+            }
+
+        orders = Order.objects.order_by("-created_at", "-id")
+
+        return {
+            "products": page(serialize_products(product_values(Product.objects.order_by("id"))[:size])),
+            "orders": page(serialize_orders(order_values(orders)[:size])),
+            "categories": {"success": True, "data": [
+                category_to_dict(row) for row in Category.objects.values("id", "name", "is_active")[:size]
+            ]},
+            "order values": page(list(order_values(orders)[:size])),
+        }
+
+    def measure(self, renderer, payload, repeat):
+        started = time.perf_counter()
+
+        for _ in range(repeat):
+            renderer.render(payload)
+
+        return (time.perf_counter() - started) / repeat * 1000
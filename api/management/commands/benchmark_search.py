@@ -0,0 +1,94 @@
+import random
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from api.models import Product
+from api.counting import invalidate_counts
+from api.search import search_products, product_search_index
+
+WORDS = [
+    "coca", "cola", "pepsi", "tea", "green", "milk", "coffee", "juice", "orange", "apple",
+    "snack", "chips", "cookie", "bread", "cake", "rice", "noodle", "chicken", "beef", "fish",
+    "sweet", "spicy", "fresh", "frozen", "organic", "premium", "classic", "family", "mini", "large",
+]
+
+# So sánh `q` kiểu cũ (icontains) với search backend hiện tại trên N sản phẩm sinh ngẫu nhiên
+# Sản phẩm benchmark có name bắt đầu bằng 1 tag riêng và bị xóa khi chạy xong
+#   python manage.py benchmark_search --sizes 10000 100000 1000000
+class Command(BaseCommand):
+    help = "Benchmark product search: icontains vs full-text backend"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[10000, 100000, 1000000])
+        parser.add_argument("--queries", nargs="+", default=["cola", "green tea", "premium choc"])
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--limit", type=int, default=10)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.tag = f"bench{uuid.uuid4().hex[:8]}"
+        inserted = 0
+
+        try:
+            for size in sorted(options["sizes"]):
+                inserted = self.seed(inserted, size, options["batch_size"])
+
+                # Inverted index build lại ở lần search đầu tiên (không có trên MySQL)
+                start = time.perf_counter()
+                search_products(self.products(), options["queries"][0]).count()
+                warmup_ms = (time.perf_counter() - start) * 1000
+
+                self.stdout.write(f"\n{size} products (first search / index build: {warmup_ms:.1f} ms)")
+                self.stdout.write(f"{'query':<20}{'icontains ms':>15}{'search ms':>15}{'speedup':>10}")
+
+                for q in options["queries"]:
+                    old = self.measure(lambda: self.icontains(q), options["repeat"], options["limit"])
+                    new = self.measure(lambda: search_products(self.products(), q), options["repeat"], options["limit"])
+                    self.stdout.write(f"{q:<20}{old:>15.2f}{new:>15.2f}{old / new if new else 0:>9.1f}x")
+        finally:
+            Product.objects.filter(name__startswith=self.tag).delete()
+            product_search_index.invalidate()
+            invalidate_counts(Product)
+
+    def products(self):
+        return Product.objects.filter(name__startswith=self.tag)
+
+    def icontains(self, q):
+        return self.products().filter(Q(name__icontains=q) | Q(description__icontains=q))
+
+    # Thời gian trung bình (ms) của COUNT + lấy page đầu, giống get_list
+    def measure(self, build_queryset, repeat, limit):
+        total = 0
+
+        for _ in range(repeat):
+            start = time.perf_counter()
+            queryset = build_queryset()
+            queryset.count()
+            list(queryset[:limit])
+            total += time.perf_counter() - start
+
+        return total / repeat * 1000
+
+    def seed(self, current, size, batch_size):
+        while current < size:
+            count = min(batch_size, size - current)
+            Product.objects.bulk_create([self.make_product(current + i) for i in range(count)])
+            current += count
+
+        product_search_index.invalidate()
+        invalidate_counts(Product)
+
+        return current
+
+    def make_product(self, i):
+        name = " ".join(self.rng.choice(WORDS) for _ in range(3))
+        description = " ".join(self.rng.choice(WORDS) for _ in range(8))
+
+        return Product(
+            name=f"{self.tag} {name} {i}",
+            price=self.rng.randint(1, 500) * 1000,
+            description=description
+        )
@@ -0,0 +1,65 @@
+import time
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from api.models import Product, Order
+from api.benchmark_data import rolled_back, seed_benchmark_data
+from api.serializers import ProductSerializer, OrderSerializer
+from api.fast_serializers import product_values, serialize_products, order_values, serialize_orders
+
+# So sánh 2 engine serialize cho 1 page (query + dựng data, không tính render JSON):
+# - drf:  setup_eager_loading + ProductSerializer / OrderSerializer(many=True).data
+# - fast: .values() + hàm dựng dict compile sẵn (fast_serializers.py)
+# Dữ liệu mẫu được tạo trong transaction và rollback khi chạy xong
+#   python manage.py benchmark_serializers --sizes 10 50 100 500 --repeat 50
+
+
+class Command(BaseCommand):
+    help = "Benchmark DRF serializers vs fast_serializers across page sizes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 500])
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--items-per-order", type=int, default=3)
+
+    def handle(self, *args, **options):
+        sizes = options["sizes"]
+        largest = max(sizes)
+
+        with rolled_back():
+            seed_benchmark_data(largest, largest, options["items_per_order"])
+            self.run(sizes, options["repeat"])
+
+    def run(self, sizes, repeat):
+        products = Product.objects.order_by("id")
+        orders = Order.objects.order_by("-created_at", "-id")
+
+        engines = {
+            "products": (
+                lambda n: ProductSerializer(ProductSerializer.setup_eager_loading(products)[:n], many=True).data,
+                lambda n: serialize_products(product_values(products)[:n]),
+            ),
+            "orders": (
+                lambda n: OrderSerializer(OrderSerializer.setup_eager_loading(orders)[:n], many=True).data,
+                lambda n: serialize_orders(order_values(orders)[:n]),
+            ),
+        }
+
+        self.stdout.write(f"{'model':<10}{'page':>6}{'drf ms':>10}{'fast ms':>10}{'speedup':>9}  same output")
+
+        for name, (drf, fast) in engines.items():
+            for size in sizes:
+                same = JSONRenderer().render(drf(size)) == JSONRenderer().render(fast(size))
+                drf_ms = self.measure(drf, size, repeat)
+                fast_ms = self.measure(fast, size, repeat)
+
+                self.stdout.write(
+                    f"{name:<10}{size:>6}{drf_ms:>10.2f}{fast_ms:>10.2f}{drf_ms / fast_ms:>8.1f}x  {same}"
+                )
+
+    def measure(self, build, size, repeat):
+        started = time.perf_counter()
+
+        for _ in range(repeat):
+            build(size)
+
+        return (time.perf_counter() - started) / repeat * 1000
@@ -0,0 +1,85 @@
+import time
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from api.fields import uuid7
+
+# So sánh tốc độ insert theo kiểu primary key:
+# - before: uuid4 lưu char(32) (UUIDField mặc định trên MySQL)
+# - after:  uuid7 lưu BINARY(16) (BinaryUUIDField)
+# Mỗi kiểu insert vào 1 bảng tạm có cấu trúc giống api_orderitem, bảng bị xóa khi chạy xong
+#   python manage.py benchmark_uuid_inserts --rows 3000000
+
+VARIANTS = {
+    "mysql": [
+        ("uuid4 char(32)", "char(32)", lambda: uuid.uuid4().hex),
+        ("uuid7 binary(16)", "binary(16)", lambda: uuid7().bytes),
+    ],
+    "sqlite": [
+        ("uuid4 char(32)", "char(32)", lambda: uuid.uuid4().hex),
+        ("uuid7 blob(16)", "blob", lambda: uuid7().bytes),
+    ],
+}
+
+
+class Command(BaseCommand):
+    help = "Benchmark insert throughput of uuid4 char(32) vs uuid7 binary(16) primary keys"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=3000000)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--report-every", type=int, default=500000)
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+
+        if connection.vendor not in VARIANTS:
+            raise CommandError(f"Unsupported database vendor '{connection.vendor}'")
+
+        for label, column_type, make_id in VARIANTS[connection.vendor]:
+            table = connection.ops.quote_name("bench_uuid_insert")
+
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {table}")
+                cursor.execute(
+                    f"CREATE TABLE {table} ("
+                    f"id {column_type} NOT NULL PRIMARY KEY, "
+                    f"quantity integer NOT NULL, "
+                    f"price decimal(12, 2) NOT NULL)"
+                )
+
+            try:
+                self.stdout.write(f"\n{label}")
+                self.run(connection, table, make_id, options)
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+    def run(self, connection, table, make_id, options):
+        sql = f"INSERT INTO {table} (id, quantity, price) VALUES (%s, %s, %s)"
+        inserted = 0
+        window_rows = 0
+        window_start = started = time.perf_counter()
+
+        while inserted < options["rows"]:
+            count = min(options["batch_size"], options["rows"] - inserted)
+            rows = [(make_id(), 1, 1000) for _ in range(count)]
+
+            with transaction.atomic(using=options["database"]), connection.cursor() as cursor:
+                cursor.executemany(sql, rows)
+
+            inserted += count
+            window_rows += count
+
+            # Tốc độ của từng đoạn để thấy insert chậm dần khi bảng lớn lên
+            if window_rows >= options["report_every"] or inserted == options["rows"]:
+                now = time.perf_counter()
+                self.stdout.write(
+                    f"  {inserted:>10} rows  {window_rows / (now - window_start):>10.0f} rows/s"
+                )
+                window_rows = 0
+                window_start = now
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"  total {inserted / elapsed:.0f} rows/s over {elapsed:.1f}s")
@@ -0,0 +1,150 @@
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from api.models import Category, PaymentMethod, Product
+from api.pagination import ORDER_CURSOR_ORDERING, PRODUCT_CURSOR_ORDERING, cursor_page_queryset, encode_cursor
+from api.product_controller import filter_products, get_product_ordering, ordering_fields, PRODUCT_SORTS
+from api.order_controller import filter_orders
+from api.fast_serializers import product_values
+from api.constants import OrderStatus
+
+# Chạy EXPLAIN cho query của các API list và báo lỗi nếu có query full-scan bảng
+#   python manage.py check_query_plans
+# - MySQL: row có type = ALL
+# - SQLite: "SCAN <table>" không dùng index
+# Bảng có ít hơn --min-rows row được bỏ qua vì optimizer thường chọn scan khi bảng nhỏ
+# Query dựng bằng cùng các hàm mà view dùng (filter_products / filter_orders, product_values,
+# cursor_page_queryset), cursor là cursor của page 2 để có điều kiện keyset
+
+LIMIT = 10
+SAMPLE_ID = uuid.UUID(int=1)
+
+# Cursor đứng sau 1 row giả, mỗi cột của ordering 1 giá trị
+def sample_cursor(ordering):
+    values = {"id": SAMPLE_ID, "created_at": timezone.now(), "price": 10000, "units_sold": 1, "revenue": 10000}
+    return encode_cursor([values[field.lstrip("-")] for field in ordering])
+
+# Giống product_controller.get_list
+def product_list(params):
+    queryset, _ = filter_products(params)
+    ordering = get_product_ordering(params)
+
+    if "cursor" in params:
+        cursor_ordering = ordering or PRODUCT_CURSOR_ORDERING
+        return cursor_page_queryset(
+            product_values(queryset, *ordering_fields(cursor_ordering)), cursor_ordering,
+            sample_cursor(cursor_ordering), LIMIT
+        )
+
+    if ordering:
+        queryset = queryset.order_by(*ordering)
+
+    return product_values(queryset)[:LIMIT]
+
+# Giống order_controller.get_list
+def order_list(params):
+    queryset, _ = filter_orders(params)
+
+    if "cursor" in params:
+        return cursor_page_queryset(
+            queryset.only("id", "created_at", "snapshot"), ORDER_CURSOR_ORDERING, sample_cursor(ORDER_CURSOR_ORDERING),
+            LIMIT
+        )
+
+    return queryset.only("id", "snapshot")[:LIMIT]
+
+def list_queries():
+    category = str(SAMPLE_ID)
+    price_range = {"min_price": "10000", "max_price": "50000"}
+
+    return [
+        ("products: min_price / max_price", product_list(price_range)),
+        ("products: active in price range", product_list({**price_range, "is_active": "true"})),
+        ("products: cursor", product_list({"cursor": ""})),
+        ("products: category in price range",
+            product_list({**price_range, "category": category, "is_active": "true"})),
+        ("products: category + cursor", product_list({"category": category, "cursor": ""})),
+        ("products: sort units_sold", product_list({"sort": "-units_sold"})),
+        ("products: sort price + cursor", product_list({"sort": "price", "cursor": ""})),
+        # Giống product_controller.get_best_sellers
+        ("products: best sellers",
+            product_values(
+                Product.objects.filter(is_active=True, units_sold__gt=0).order_by(*PRODUCT_SORTS["-revenue"]),
+                "units_sold", "revenue"
+            )[:LIMIT]),
+        ("orders: status", order_list({"status": OrderStatus.PENDING})),
+        ("orders: payment_method", order_list({"payment_method": category})),
+        ("orders: cursor", order_list({"cursor": ""})),
+        ("orders: status + cursor", order_list({"status": OrderStatus.PENDING, "cursor": ""})),
+        ("categories: is_active",
+            Category.objects.filter(is_active=True)),
+        ("payment methods: is_active",
+            PaymentMethod.objects.filter(is_active=True)),
+    ]
+
+def mysql_full_scans(cursor, sql, params, min_rows):
+    cursor.execute(f"EXPLAIN {sql}", params)
+    columns = [column[0].lower() for column in cursor.description]
+
+    scans = []
+
+    for row in cursor.fetchall():
+        plan = dict(zip(columns, row))
+
+        if plan.get("type") == "ALL" and (plan.get("rows") or 0) >= min_rows:
+            scans.append(f"full scan on {plan.get('table')} (~{plan.get('rows')} rows)")
+
+    return scans
+
+def sqlite_full_scans(cursor, sql, params, min_rows):
+    cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+    details = [detail for *_, detail in cursor.fetchall()]
+
+    scans = []
+
+    for detail in details:
+        if not detail.startswith("SCAN") or "USING" in detail:
+            continue
+
+        # SQLite không ước lượng số row, đếm trực tiếp
+        table = detail.split()[1]
+        cursor.execute(f'SELECT COUNT(*) FROM "{table}"')
+        rows = cursor.fetchone()[0]
+
+        if rows >= min_rows:
+            scans.append(f"full scan on {table} ({rows} rows)")
+
+    return scans
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the list endpoint queries and fail on full table scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--min-rows", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        failures = []
+
+        for name, queryset in list_queries():
+            sql, params = queryset.using(options["database"]).query.sql_with_params()
+
+            with connection.cursor() as cursor:
+                if connection.vendor == "mysql":
+                    scans = mysql_full_scans(cursor, sql, params, options["min_rows"])
+                elif connection.vendor == "sqlite":
+                    scans = sqlite_full_scans(cursor, sql, params, options["min_rows"])
+                else:
+                    raise CommandError(f"Unsupported database vendor '{connection.vendor}'")
+
+            if scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"FAIL {name}: {'; '.join(scans)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"OK   {name}"))
+
+        if failures:
+            raise CommandError(f"{len(failures)} list queries do a full table scan")
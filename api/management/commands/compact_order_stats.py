@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from api.order_stats import compact_order_stats
+
+# Gộp các row chênh lệch của rollup report (OrderDailyStat) thành 1 row / bucket
+# Chạy định kỳ, vd. cron mỗi phút:
+#   python manage.py compact_order_stats
+class Command(BaseCommand):
+    help = "Fold order report rollup deltas into one row per bucket"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="Days per transaction")
+
+    def handle(self, *args, **options):
+        compacted = compact_order_stats(options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"Compacted {compacted} order stat rows"))
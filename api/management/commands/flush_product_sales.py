@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from api.product_sales import flush_product_sales, rebuild_product_sales
+
+# Cộng các delta doanh số (ProductSalesDelta) vào Product.units_sold / revenue
+# Chạy định kỳ, vd. cron mỗi phút:
+#   python manage.py flush_product_sales
+#   python manage.py flush_product_sales --rebuild     # tính lại toàn bộ từ order item
+class Command(BaseCommand):
+    help = "Apply buffered product sales deltas to product counters"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--rebuild", action="store_true", help="Recompute all counters from order items")
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            updated = rebuild_product_sales()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt sales counters of {updated} products"))
+            return
+
+        flushed = flush_product_sales(options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"Flushed {flushed} sales deltas"))
@@ -0,0 +1,48 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from api.product_import import import_products, parse_rows, IMPORT_FORMATS
+
+# Import product từ file JSON array / NDJSON / CSV (xem product_import.py)
+#   python manage.py import_products products.ndjson --chunk-size 2000
+#   python manage.py import_products products.csv --dry-run
+
+EXTENSIONS = {
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".csv": "csv",
+}
+
+
+class Command(BaseCommand):
+    help = "Bulk import products from a JSON array, NDJSON or CSV file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=IMPORT_FORMATS, default=None, help="Default: from the file extension")
+        parser.add_argument("--chunk-size", type=int, default=None)
+        parser.add_argument("--dry-run", action="store_true", help="Validate only, do not insert")
+        parser.add_argument("--show-errors", type=int, default=20)
+
+    def handle(self, *args, **options):
+        import_format = options["format"] or EXTENSIONS.get(os.path.splitext(options["path"])[1].lower())
+
+        if import_format is None:
+            raise CommandError("Cannot detect the file format, use --format")
+
+        try:
+            with open(options["path"], encoding="utf-8", newline="") as source:
+                result = import_products(
+                    parse_rows(source, import_format),
+                    chunk_size=options["chunk_size"],
+                    dry_run=options["dry_run"],
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in result["errors"][:options["show_errors"]]:
+            self.stdout.write(self.style.WARNING(f"row {error['row']}: {error['errors']}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['total']} rows, {result['created']} created, {result['failed']} failed"
+        ))
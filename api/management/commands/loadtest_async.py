@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from api.loadtest import run_http_load
+
+# So sánh route sync (DRF) và route async (/async/...) trên server đang chạy
+#   pip install uvicorn
+#   uvicorn django_shop.asgi:application --port 8000 --workers 1
+#   python manage.py loadtest_async --base-url http://127.0.0.1:8000 --token <access token>
+
+ENDPOINTS = [
+    "/products",
+    "/products?q=cola",
+    "/categories",
+    "/payment_methods",
+    "/orders",
+]
+
+
+class Command(BaseCommand):
+    help = "Load test sync vs async read endpoints (requests/s, p99 latency)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--token", default=None, help="Access token for /orders")
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--duration", type=float, default=10.0)
+        parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS)
+        parser.add_argument("--detail", nargs="*", default=[], help="Extra paths, e.g. /products/detail/<id>")
+
+    def handle(self, *args, **options):
+        headers = {"Authorization": f"Bearer {options['token']}"} if options["token"] else {}
+        base_url = options["base_url"].rstrip("/")
+
+        self.stdout.write(
+            f"{'endpoint':<32}{'mode':<7}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}"
+        )
+
+        for path in options["endpoints"] + options["detail"]:
+            for mode, prefix in (("sync", ""), ("async", "/async")):
+                stats = run_http_load(
+                    f"{base_url}{prefix}{path}",
+                    concurrency=options["concurrency"],
+                    duration=options["duration"],
+                    headers=headers,
+                )
+
+                self.stdout.write(
+                    f"{path:<32}{mode:<7}{stats['rps']:>10.1f}{stats['p50_ms']:>10.1f}"
+                    f"{stats['p99_ms']:>10.1f}{stats['errors']:>8}"
+                )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from api.category_products import rebuild_category_products
+
+# Tính lại bảng category_product (filter /products?category=) từ bảng product_categories
+# Chạy sau khi sửa link product - category không qua ORM (SQL tay, import thẳng vào DB)
+#   python manage.py rebuild_category_products
+class Command(BaseCommand):
+    help = "Rebuild the denormalized category_product table from product categories"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        created = rebuild_category_products(options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {created} category links"))
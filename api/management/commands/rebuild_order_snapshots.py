@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from api.models import Order
+from api.snapshots import refresh_order_snapshots
+
+# Render snapshot cho các order chưa có (backfill sau migration), --all để render lại toàn bộ
+#   python manage.py rebuild_order_snapshots --batch-size 500
+class Command(BaseCommand):
+    help = "Backfill or rebuild the pre-rendered order snapshots"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Rebuild every order, not only missing ones")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        queryset = Order.objects.order_by("pk")
+
+        if not options["all"]:
+            queryset = queryset.filter(snapshot=None)
+
+        total = 0
+        last_pk = None
+
+        # Duyệt theo pk để mỗi batch là 1 query có index, không dùng OFFSET
+        while True:
+            batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            order_ids = list(batch.values_list("pk", flat=True)[:options["batch_size"]])
+
+            if not order_ids:
+                break
+
+            refresh_order_snapshots(order_ids, only_missing=not options["all"])
+            total += len(order_ids)
+            last_pk = order_ids[-1]
+
+            self.stdout.write(f"{total} orders rendered")
+
+        self.stdout.write(self.style.SUCCESS(f"Done, {total} orders rendered"))
@@ -0,0 +1,27 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from api.order_stats import rebuild_order_stats
+
+# Tính lại rollup của API report (OrderDailyStat) từ bảng Order
+# Chạy sau khi thêm / sửa order không qua API (import, sửa tay trong DB, audit_order_totals --fix)
+#   python manage.py rebuild_order_stats                       # tính lại toàn bộ
+#   python manage.py rebuild_order_stats --since 2025-01-01    # chỉ tính lại từ ngày này
+class Command(BaseCommand):
+    help = "Rebuild the order report rollup table from orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="Only rebuild days from this date (YYYY-MM-DD)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        since = None
+
+        if options["since"]:
+            try:
+                since = date.fromisoformat(options["since"])
+            except ValueError:
+                raise CommandError(f"Invalid --since '{options['since']}'. Must be YYYY-MM-DD")
+
+        created = rebuild_order_stats(since, options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt order stats: {created} rows"))
@@ -0,0 +1,35 @@
+import hmac
+import ipaddress
+from functools import lru_cache
+from django.conf import settings
+
+# Ai được đọc số liệu nội bộ (GET /metrics, header Server-Timing):
+# header "Authorization: Bearer <METRICS_TOKEN>" đúng, hoặc IP client (REMOTE_ADDR)
+# thuộc METRICS_ALLOWED_NETWORKS (mặc định chỉ localhost)
+# Chạy sau reverse proxy: REMOTE_ADDR là IP của proxy => bỏ network của proxy khỏi danh sách, dùng token
+
+def get_token():
+    return getattr(settings, "METRICS_TOKEN", "")
+
+@lru_cache(maxsize=None)
+def parse_networks(networks):
+    return tuple(ipaddress.ip_network(network.strip(), strict=False) for network in networks)
+
+def get_networks():
+    return parse_networks(tuple(getattr(settings, "METRICS_ALLOWED_NETWORKS", ["127.0.0.0/8", "::1/128"])))
+
+def has_valid_token(request):
+    token = get_token()
+    scheme, _, value = request.headers.get("Authorization", "").partition(" ")
+    return bool(token) and scheme.lower() == "bearer" and hmac.compare_digest(value.encode(), token.encode())
+
+def is_internal(request):
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+
+    return any(address in network for network in get_networks())
+
+def can_read_metrics(request):
+    return has_valid_token(request) or is_internal(request)
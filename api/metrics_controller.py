@@ -0,0 +1,21 @@
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+from .profiling import render_prometheus
+from .db.pool import render_pool_metrics
+from .user_cache import render_user_cache_metrics
+from .metrics_access import can_read_metrics
+
+# Số liệu của ProfilingMiddleware (xem profiling.py) + pool connection DB (xem db/pool.py)
+# + cache user của authentication (xem user_cache.py) theo Prometheus text format
+# View Django thường (không qua DRF) để scrape không tốn chi phí authentication / renderer
+# Chỉ cho scrape khi có token / IP nội bộ (xem metrics_access.py)
+
+@require_GET
+def get_metrics(request):
+    if not can_read_metrics(request):
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        render_prometheus() + render_pool_metrics() + render_user_cache_metrics(),
+        content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+# FULLTEXT index chỉ có trên MySQL, các DB khác dùng inverted index trong api/search.py
+
+def add_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+
+    schema_editor.execute(
+        "ALTER TABLE api_product ADD FULLTEXT INDEX product_fulltext_idx (name, description)"
+    )
+
+def remove_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+
+    schema_editor.execute("ALTER TABLE api_product DROP INDEX product_fulltext_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_order_created_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_fulltext_index, remove_fulltext_index),
+    ]
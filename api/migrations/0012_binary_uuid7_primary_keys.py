@@ -0,0 +1,121 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:23
+
+import api.fields
+from django.db import migrations
+
+# Đổi các cột UUID (PK, FK, bảng M2M) từ char(32) sang BINARY(16) trên MySQL
+# Dữ liệu cũ được giữ nguyên: char(32) hex -> VARBINARY(32) -> UNHEX -> BINARY(16)
+# FK constraint phải drop trước khi đổi kiểu cột và tạo lại sau đó
+# Các DB khác không đổi kiểu cột nên chỉ cập nhật migration state
+
+# (table, column, nullable)
+UUID_COLUMNS = [
+    ('api_category', 'id', False),
+    ('api_product', 'id', False),
+    ('api_product_categories', 'product_id', False),
+    ('api_product_categories', 'category_id', False),
+    ('api_user', 'id', False),
+    ('api_paymentmethod', 'id', False),
+    ('api_order', 'id', False),
+    ('api_order', 'user_id', False),
+    ('api_order', 'payment_method_id', True),
+    ('api_orderitem', 'id', False),
+    ('api_orderitem', 'order_id', False),
+    ('api_orderitem', 'product_id', True),
+]
+
+def get_foreign_keys(cursor, tables):
+    placeholders = ", ".join(["%s"] * len(tables))
+    cursor.execute(
+        "SELECT TABLE_NAME, CONSTRAINT_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME "
+        "FROM information_schema.KEY_COLUMN_USAGE "
+        "WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IN (" + placeholders + ")",
+        tables
+    )
+    return cursor.fetchall()
+
+def convert_columns(schema_editor, to_binary):
+    connection = schema_editor.connection
+
+    if connection.vendor != 'mysql':
+        return
+
+    qn = schema_editor.quote_name
+    tables = sorted({table for table, _, _ in UUID_COLUMNS})
+
+    with connection.cursor() as cursor:
+        foreign_keys = get_foreign_keys(cursor, tables)
+
+    for table, name, _, _, _ in foreign_keys:
+        schema_editor.execute(f"ALTER TABLE {qn(table)} DROP FOREIGN KEY {qn(name)}")
+
+    for table, column, nullable in UUID_COLUMNS:
+        null = "NULL" if nullable else "NOT NULL"
+
+        if to_binary:
+            schema_editor.execute(f"ALTER TABLE {qn(table)} MODIFY {qn(column)} varbinary(32) {null}")
+            schema_editor.execute(f"UPDATE {qn(table)} SET {qn(column)} = UNHEX({qn(column)})")
+            schema_editor.execute(f"ALTER TABLE {qn(table)} MODIFY {qn(column)} binary(16) {null}")
+        else:
+            schema_editor.execute(f"ALTER TABLE {qn(table)} MODIFY {qn(column)} varbinary(32) {null}")
+            schema_editor.execute(f"UPDATE {qn(table)} SET {qn(column)} = LOWER(HEX({qn(column)}))")
+            schema_editor.execute(f"ALTER TABLE {qn(table)} MODIFY {qn(column)} char(32) {null}")
+
+    for table, name, column, referenced_table, referenced_column in foreign_keys:
+        schema_editor.execute(
+            f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} FOREIGN KEY ({qn(column)}) "
+            f"REFERENCES {qn(referenced_table)} ({qn(referenced_column)})"
+        )
+
+def forwards(apps, schema_editor):
+    convert_columns(schema_editor, to_binary=True)
+
+def backwards(apps, schema_editor):
+    convert_columns(schema_editor, to_binary=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_list_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(forwards, backwards),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='category',
+                    name='id',
+                    field=api.fields.BinaryUUIDField(default=api.fields.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='order',
+                    name='id',
+                    field=api.fields.BinaryUUIDField(default=api.fields.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='orderitem',
+                    name='id',
+                    field=api.fields.BinaryUUIDField(default=api.fields.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='paymentmethod',
+                    name='id',
+                    field=api.fields.BinaryUUIDField(default=api.fields.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='product',
+                    name='id',
+                    field=api.fields.BinaryUUIDField(default=api.fields.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='user',
+                    name='id',
+                    field=api.fields.BinaryUUIDField(default=api.fields.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+            ],
+        ),
+    ]
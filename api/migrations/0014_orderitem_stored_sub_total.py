@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:44
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_order_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='sub_total',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.F('price')), output_field=models.DecimalField(decimal_places=2, max_digits=12)),
+        ),
+    ]
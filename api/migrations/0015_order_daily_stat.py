@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:46
+
+import api.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_orderitem_stored_sub_total'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderDailyStat',
+            fields=[
+                ('id', api.fields.BinaryUUIDField(default=api.fields.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('shipped', 'Shipped'), ('completed', 'Completed'), ('canceled', 'Canceled')], max_length=20)),
+                ('order_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('payment_method', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_stats', to='api.paymentmethod')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'status', 'payment_method'], name='order_daily_stat_bucket_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:49
+
+import api.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_order_daily_stat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSalesDelta',
+            fields=[
+                ('id', api.fields.BinaryUUIDField(default=api.fields.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('quantity', models.IntegerField()),
+                ('revenue', models.DecimalField(decimal_places=2, max_digits=14)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='revenue',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='units_sold',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['units_sold', 'id'], name='product_units_sold_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['revenue', 'id'], name='product_revenue_idx'),
+        ),
+        migrations.AddField(
+            model_name='productsalesdelta',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_deltas', to='api.product'),
+        ),
+    ]
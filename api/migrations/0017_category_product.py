@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:52
+
+import api.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copy các link product - category đã có sang bảng category_product, mỗi batch 1 INSERT
+def copy_links(apps, schema_editor):
+    Product = apps.get_model('api', 'Product')
+    CategoryProduct = apps.get_model('api', 'CategoryProduct')
+    Through = Product.categories.through
+    db = schema_editor.connection.alias
+
+    links = Through.objects.using(db).order_by('id').values_list(
+        'id', 'category_id', 'product_id', 'product__is_active', 'product__price'
+    )
+    last_id = 0
+
+    while True:
+        batch = list(links.filter(id__gt=last_id)[:5000])
+
+        if not batch:
+            return
+
+        CategoryProduct.objects.using(db).bulk_create([
+            CategoryProduct(
+                id=api.fields.uuid7(), category_id=category_id, product_id=product_id,
+                is_active=is_active, price=price
+            )
+            for _, category_id, product_id, is_active, price in batch
+        ])
+        last_id = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_product_sales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryProduct',
+            fields=[
+                ('id', api.fields.BinaryUUIDField(default=api.fields.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('is_active', models.BooleanField()),
+                ('price', models.IntegerField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_links', to='api.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_links', to='api.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category', 'is_active', 'price'], name='category_product_filter_idx')],
+                'constraints': [models.UniqueConstraint(fields=('category', 'product'), name='category_product_unique')],
+            },
+        ),
+        migrations.RunPython(copy_links, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_category_product'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='snapshot_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,24 +1,37 @@
-import uuid
 from django.db import models
 from django.utils import timezone
 from .constants import OrderStatus
+from .fields import BinaryUUIDField, uuid7
 
 class Category(models.Model):
-    id = models.UUIDField(
+    id = BinaryUUIDField(
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         editable=False
     )
     name = models.CharField(max_length=200)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active'], name='category_is_active_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+class ProductQuerySet(models.QuerySet):
+    # update() không gửi signal nên không chép is_active / price sang CategoryProduct:
+    # UPDATE hàng loạt các field đó phải dùng update_listing() (xem category_products.py)
+    def update_listing(self, **fields):
+        from .category_products import update_products
+
+        return update_products(self, **fields)
+
 class Product(models.Model):
-    id = models.UUIDField(
+    id = BinaryUUIDField(
         primary_key=True, 
-        default=uuid.uuid4, 
+        default=uuid7, 
         editable=False
     )
     name = models.CharField(max_length=200)
@@ -26,14 +39,30 @@ class Product(models.Model):
     price = models.IntegerField()
     description = models.CharField(max_length=200)
     is_active = models.BooleanField(default=True)
+    # Số lượng / doanh thu đã bán (order chưa bị hủy), cộng dồn từ ProductSalesDelta (xem product_sales.py)
+    units_sold = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # get_list: min_price / max_price
+            models.Index(fields=['price'], name='product_price_idx'),
+            # Sản phẩm đang bán theo khoảng giá
+            models.Index(fields=['is_active', 'price'], name='product_active_price_idx'),
+            # get_list ?sort=units_sold / revenue + best sellers
+            models.Index(fields=['units_sold', 'id'], name='product_units_sold_idx'),
+            models.Index(fields=['revenue', 'id'], name='product_revenue_idx'),
+        ]
 
     def __str__(self):
         return self.name
     
 class User(models.Model):
-    id = models.UUIDField(
+    id = BinaryUUIDField(
         primary_key=True, 
-        default=uuid.uuid4, 
+        default=uuid7, 
         editable=False
     )
     username = models.CharField(max_length=200, unique=True)
@@ -50,22 +79,27 @@ class User(models.Model):
         return True
     
 class PaymentMethod(models.Model):
-    id = models.UUIDField(
+    id = BinaryUUIDField(
         primary_key=True, 
-        default=uuid.uuid4, 
+        default=uuid7, 
         editable=False
     )
     key = models.CharField(max_length=200, unique=True)
     name = models.CharField(max_length=200)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active'], name='payment_method_is_active_idx'),
+        ]
+
     def __str__(self):
         return self.key
     
 class Order(models.Model):
-    id = models.UUIDField(
+    id = BinaryUUIDField(
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         editable=False
     )
 
@@ -100,13 +134,28 @@ class Order(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     note = models.TextField(blank=True, null=True)
 
+    # JSON đã render của OrderSerializer (xem snapshots.py), NULL = cần render lại
+    snapshot = models.TextField(blank=True, null=True, editable=False)
+    # Tăng mỗi lần snapshot bị bỏ bằng UPDATE hàng loạt (không qua save(), updated_at không đổi)
+    # Render lại chỉ được ghi snapshot khi updated_at / snapshot_version vẫn như lúc đọc
+    snapshot_version = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination: ORDER BY created_at DESC, id DESC
+            models.Index(fields=['created_at', 'id'], name='order_created_at_id_idx'),
+            # get_list: filter status / payment_method + sắp xếp theo created_at
+            models.Index(fields=['status', 'created_at', 'id'], name='order_status_created_at_idx'),
+            models.Index(fields=['payment_method', 'created_at', 'id'], name='order_payment_created_at_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.user.username}"
 
 class OrderItem(models.Model):
-    id = models.UUIDField(
+    id = BinaryUUIDField(
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         editable=False
     )
 
@@ -126,9 +175,93 @@ class OrderItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     price = models.DecimalField(max_digits=12, decimal_places=2)
 
-    @property
-    def subtotal(self):
-        return self.quantity * self.price
+    # Thành tiền của dòng, DB tự tính khi insert / update quantity, price (STORED generated column)
+    # Order.total_amount = tổng sub_total các item (xem order_totals.py)
+    sub_total = models.GeneratedField(
+        expression=models.F('quantity') * models.F('price'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        db_persist=True
+    )
 
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"
+
+# Rollup: số order + doanh thu theo ngày (created_at) × status × payment method
+# Mỗi khi order được tạo / đổi status, payment method, total: INSERT row chênh lệch (xem order_stats.py)
+# Nhiều row cùng 1 bộ (day, status, payment_method), API report luôn SUM lại, compact_order_stats gộp định kỳ
+class OrderDailyStat(models.Model):
+    id = BinaryUUIDField(
+        primary_key=True,
+        default=uuid7,
+        editable=False
+    )
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=OrderStatus.choices)
+    payment_method = models.ForeignKey(
+        'PaymentMethod',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='daily_stats'
+    )
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['day', 'status', 'payment_method'], name='order_daily_stat_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.order_count} orders"
+
+# Chênh lệch số lượng / doanh thu bán của product, chỉ INSERT khi checkout
+# flush_product_sales gộp theo product rồi cộng vào Product.units_sold / revenue và xóa các row đã gộp,
+# nên checkout không phải khóa row của product bán chạy
+class ProductSalesDelta(models.Model):
+    id = BinaryUUIDField(
+        primary_key=True,
+        default=uuid7,
+        editable=False
+    )
+    product = models.ForeignKey(
+        'Product',
+        on_delete=models.CASCADE,
+        related_name='sales_deltas'
+    )
+    quantity = models.IntegerField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)
+
+# Bản sao của bảng product_categories kèm is_active / price của product, dùng cho /products?category=
+# Filter category + is_active + khoảng giá chạy trên index (category_id, is_active, price),
+# mỗi (category, product) chỉ có 1 row nên JOIN với product không cần DISTINCT
+# Đồng bộ bằng signal (m2m_changed, save product) và bulk import (xem category_products.py)
+# Bất biến: is_active / price luôn bằng của product => sửa hàng loạt product bằng
+# Product.objects.filter(...).update_listing(...), không dùng update() / SQL tay
+# (nếu có: python manage.py audit_category_products --fix)
+class CategoryProduct(models.Model):
+    id = BinaryUUIDField(
+        primary_key=True,
+        default=uuid7,
+        editable=False
+    )
+    category = models.ForeignKey(
+        'Category',
+        on_delete=models.CASCADE,
+        related_name='product_links'
+    )
+    product = models.ForeignKey(
+        'Product',
+        on_delete=models.CASCADE,
+        related_name='category_links'
+    )
+    is_active = models.BooleanField()
+    price = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'product'], name='category_product_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['category', 'is_active', 'price'], name='category_product_filter_idx'),
+        ]
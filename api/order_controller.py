@@ -1,3 +1,4 @@
+import logging
 import math
 import uuid
 from rest_framework.decorators import api_view, permission_classes
@@ -6,35 +7,169 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.db.models import Q
 from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.core.exceptions import ValidationError
+from django.views.decorators.http import require_GET
 from .models import Order, OrderItem, Product, User
+from .authentication import aauthenticate
+from .counting import count_items, acount_items, COUNT_EXACT, COUNT_MODES
+from .pagination import paginate_by_cursor, apaginate_by_cursor, ORDER_CURSOR_ORDERING
 from .serializers import OrderSerializer, OrderItemSerializer
+from .order_export import EXPORT_TYPES
+from .order_status import bulk_transition
+from .snapshots import store_order_snapshot, load_order_snapshots, aload_order_snapshots, render_with_raw_data
+from .utils import json_response, raw_json_response, unauthorized_response
 from .constants import OrderStatus
+from .order_totals import to_money, line_total, apply_total_delta, ZERO
+from .order_stats import order_state, record_order_change
+from .product_sales import counts_as_sale, item_sales, order_item_sales, diff_sales, record_sales
+
+logger = logging.getLogger(__name__)
+
+# Đọc items từ body và lấy tất cả product trong 1 query
+# Trả về list (product, quantity, price) theo đúng thứ tự client gửi lên
+def parse_order_items(items_data):
+    parsed = []
+
+    for item in items_data:
+        product_id = item.get("product")
+        quantity = int(item.get("quantity", 1))
+        price = to_money(item.get("price", 0))
+
+        if not product_id:
+            raise ValueError("Missing product ID for order item")
+
+        try:
+            product_id = uuid.UUID(str(product_id))
+        except ValueError:
+            raise ValueError(f"Invalid product ID {product_id}")
+
+        parsed.append((product_id, quantity, price))
+
+    # Kiểm tra sản phẩm hợp lệ
+    products = Product.objects.filter(is_active=True).in_bulk(
+        {product_id for product_id, _, _ in parsed}
+    )
+
+    items = []
+
+    for product_id, quantity, price in parsed:
+        product = products.get(product_id)
+
+        if not product:
+            raise ValueError(f"Product with ID {product_id} not found or inactive")
+
+        if price <= 0:
+            price = to_money(product.price)  # lấy giá hiện tại của sản phẩm
+
+        items.append((product, quantity, price))
+
+    return items
+
+# So sánh item hiện tại của order với danh sách mới
+# Item cùng product được giữ lại và update, phần còn lại insert / delete theo batch
+# Trả về phần chênh lệch của total_amount (xem order_totals.py)
+def sync_order_items(order, items):
+    existing = {}
+
+    for order_item in order.items.all():
+        existing.setdefault(order_item.product_id, []).append(order_item)
+
+    to_create = []
+    to_update = []
+    delta = ZERO
+
+    for product, quantity, price in items:
+        matches = existing.get(product.id)
+
+        if matches:
+            order_item = matches.pop(0)
+
+            if order_item.quantity != quantity or order_item.price != price:
+                delta += line_total(quantity, price) - order_item.sub_total
+                order_item.quantity = quantity
+                order_item.price = price
+                to_update.append(order_item)
+        else:
+            delta += line_total(quantity, price)
+            to_create.append(OrderItem(order=order, product=product, quantity=quantity, price=price))
+
+    to_delete = [order_item.id for matches in existing.values() for order_item in matches]
+    delta -= sum((order_item.sub_total for matches in existing.values() for order_item in matches), ZERO)
+
+    if to_delete:
+        OrderItem.objects.filter(id__in=to_delete).delete()
+
+    if to_update:
+        OrderItem.objects.bulk_update(to_update, ["quantity", "price"])
+
+    if to_create:
+        OrderItem.objects.bulk_create(to_create)
+
+    return delta
+
+# Queryset + bộ filter theo query params, dùng chung cho get_list / aget_list
+def filter_orders(params):
+    queryset = Order.objects.all()
+
+    status_param = params.get("status", None)
+    payment_method_param = params.get("payment_method", None)
+
+    # Filter by params
+    if status_param:
+        queryset = queryset.filter(status=status_param)
+
+    if payment_method_param:
+        try:
+            queryset = queryset.filter(payment_method=uuid.UUID(payment_method_param))
+        except ValueError:
+            queryset = queryset.none()
+
+    return queryset, {"status": status_param, "payment_method": payment_method_param}
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_list(request):
     try:
-        queryset = Order.objects.all()
-
         # Get query params
-        status_param = request.GET.get("status", None)
-        payment_method_param = request.GET.get("payment_method", None)
+        cursor = request.GET.get("cursor", None)
+        count_mode = request.GET.get("count", COUNT_EXACT)
         page = int(request.GET.get("page", 1))
         limit = int(request.GET.get("limit", 10))
         offset = (page - 1) * limit
 
-        # Filter by params
-        if status_param:
-            queryset = queryset.filter(status=status_param)
-        
-        if payment_method_param:
+        queryset, filters = filter_orders(request.GET)
+
+        # Cursor mode: ?cursor= (rỗng = page đầu), không chạy COUNT
+        if cursor is not None:
             try:
-                queryset = queryset.filter(payment_method=uuid.UUID(payment_method_param))
-            except ValueError:
-                queryset = queryset.none()
+                orders, next_cursor = paginate_by_cursor(
+                    queryset.only("id", "created_at", "snapshot"), ORDER_CURSOR_ORDERING, cursor, limit
+                )
+            except (ValueError, ValidationError) as ve:
+                return Response({
+                    "success": False,
+                    "message": "Invalid data",
+                    "error": str(ve)
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            # Trả thẳng snapshot đã render (xem snapshots.py)
+            return raw_json_response(render_with_raw_data({
+                "success": True,
+                "paging": {
+                    "limit": limit,
+                    "next_cursor": next_cursor
+                }
+            }, load_order_snapshots(orders)), status=status.HTTP_200_OK)
 
-        total_items = queryset.count()
+        if count_mode not in COUNT_MODES:
+            return Response({
+                "success": False,
+                "message": f"Invalid count '{count_mode}'. Must be one of: {list(COUNT_MODES)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Tổng số row: lấy từ cache hoặc ước lượng (xem counting.py)
+        total_items, total_item_type = count_items(queryset, filters, count_mode)
         total_pages = math.ceil(total_items / limit) if limit > 0 else 1
 
         # Case: page > total_pages
@@ -44,28 +179,27 @@ def get_list(request):
                 "paging": {
                     "current_page": page,
                     "total_page": total_pages,
-                    "total_item": total_items
+                    "total_item": total_items,
+                    "total_item_type": total_item_type
                 },
                 "data": []
             }, status=status.HTTP_200_OK)
         
-        # Get pagination data
-        orders = queryset[offset:offset + limit]
-
-        serializer = OrderSerializer(orders, many=True)
+        # Get pagination data: 1 query lấy snapshot đã render (xem snapshots.py)
+        orders = list(queryset.only("id", "snapshot")[offset:offset + limit])
 
-        return Response({
+        return raw_json_response(render_with_raw_data({
             "success": True,
             "paging": {
                 "current_page": page,
                 "total_page": total_pages,
-                "total_item": total_items
-            },
-            "data": serializer.data
-        }, status=status.HTTP_200_OK)
+                "total_item": total_items,
+                "total_item_type": total_item_type
+            }
+        }, load_order_snapshots(orders)), status=status.HTTP_200_OK)
     
-    except Exception as e:
-        print(f"Error in get_list: {e}")
+    except Exception:
+        logger.exception("Error in get_list")
 
         return Response({
             "success": False,
@@ -73,17 +207,49 @@ def get_list(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+########## Export ##########
+# Stream toàn bộ order theo filter status / payment_method, không phân trang (xem order_export.py)
+# ?type=ndjson (mặc định) | csv
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def get_detail(request, id):
+def export_orders(request):
     try:
-        order = Order.objects.get(pk=id)
-        serializer = OrderSerializer(order)
-        
+        export_type = request.GET.get("type", "ndjson")
+
+        if export_type not in EXPORT_TYPES:
+            return Response({
+                "success": False,
+                "message": f"Invalid type '{export_type}'. Must be one of: {list(EXPORT_TYPES)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset, _ = filter_orders(request.GET)
+        generator, content_type, filename = EXPORT_TYPES[export_type]
+
+        response = StreamingHttpResponse(generator(queryset), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+        return response
+
+    except Exception:
+        logger.exception("Error in export orders")
+
         return Response({
-            "success": True,
-            "data": serializer.data
-        }, status=status.HTTP_200_OK)
+            "success": False,
+            "message": "Something wrong",
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_detail(request, id):
+    try:
+        order = Order.objects.only("id", "snapshot").get(pk=id)
+        snapshot = load_order_snapshots([order])[0]
+
+        return raw_json_response(
+            render_with_raw_data({"success": True}, snapshot, many=False),
+            status=status.HTTP_200_OK
+        )
 
     except (Order.DoesNotExist, ValidationError):
         return Response({
@@ -91,8 +257,8 @@ def get_detail(request, id):
             "message": "Order not found."
         }, status=status.HTTP_404_NOT_FOUND)
 
-    except Exception as e:
-        print(f"Error in get detail order: {e}")
+    except Exception:
+        logger.exception("Error in get detail order")
 
         return Response({
             "success": False,
@@ -131,52 +297,38 @@ def create_order(request):
                 "message": "Order must have at least one item"
             }, status=status.HTTP_400_BAD_REQUEST)
 
+        # Lấy toàn bộ product của order trong 1 query
+        items = parse_order_items(items_data)
+
         # Tất cả các bước trong đây thành công thì mới write vào trong database
         with transaction.atomic():
-            # ✅ Tạo đơn hàng trước
+            # ✅ Tạo đơn hàng kèm tổng tiền
             order = Order.objects.create(
                 user=user,
                 payment_method_id=payment_method_id,
                 note=note,
                 status="pending",
-                total_amount=0
+                total_amount=sum((line_total(quantity, price) for _, quantity, price in items), ZERO)
             )
 
-            total = 0
-
-            # ✅ Tạo từng item
-            for item in items_data:
-                product_id = item.get("product")
-                quantity = int(item.get("quantity", 1))
-                price = float(item.get("price", 0))
-
-                if not product_id:
-                    raise ValueError("Missing product ID for order item")
-
-                # Kiểm tra sản phẩm hợp lệ
-                product = Product.objects.filter(id=product_id, is_active=True).first()
-                
-                if not product:
-                    raise ValueError(f"Product with ID {product_id} not found or inactive")
-
-                if price <= 0:
-                    price = product.price  # lấy giá hiện tại của sản phẩm
-
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=quantity,
-                    price=price
-                )
+            # ✅ Tạo tất cả item trong 1 lần insert
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=quantity, price=price)
+                for product, quantity, price in items
+            ])
 
-                total += quantity * price
+            # ✅ Cộng order vào rollup cho API report
+            record_order_change(None, order_state(order))
 
-            # ✅ Cập nhật tổng tiền
-            order.total_amount = total
-            order.save()
+            # ✅ Ghi doanh số của product (chỉ INSERT, xem product_sales.py)
+            record_sales(item_sales(items))
 
+        order = OrderSerializer.setup_eager_loading(Order.objects.all()).get(pk=order.pk)
         serializer = OrderSerializer(order)
 
+        # Lưu read model để các lần đọc sau không phải serialize lại
+        store_order_snapshot(order, serializer.data)
+
         return Response({
             "success": True,
             "message": "Order created successfully",
@@ -190,8 +342,8 @@ def create_order(request):
             "error": str(ve)
         }, status=status.HTTP_400_BAD_REQUEST)
 
-    except Exception as e:
-        print(f"Error in create_order: {e}")
+    except Exception:
+        logger.exception("Error in create_order")
 
         return Response({
             "success": False,
@@ -204,15 +356,16 @@ def create_order(request):
 def update_order(request, id):
     try:
         data = request.data
-        order = Order.objects.get(pk=id)
-
-        if not order:
-            return Response({
-                "success": False,
-                "message": "Order not found"
-            }, status=status.HTTP_404_NOT_FOUND)
+        delta = ZERO
 
         with transaction.atomic():
+            # Khóa row của order tới hết transaction: 2 request sửa cùng order chạy lần lượt, request sau
+            # đọc trạng thái / total / item đã commit của request trước (rollup, total, doanh số không bị lệch)
+            order = Order.objects.select_for_update().get(pk=id)
+
+            # Trạng thái trước khi sửa, để chuyển order giữa các bucket của rollup
+            old_state = order_state(order)
+
             # ✅ Cập nhật thông tin cơ bản
             if "user" in data:
                 return Response({
@@ -244,53 +397,53 @@ def update_order(request, id):
                 order.note = data["note"]
 
             items_data = data.get("items", None)
-            total = 0
-
-            if items_data is not None:
-                # ✅ Xóa item cũ
-                order.items.all().delete()
-
-                # ✅ Tạo lại danh sách item mới
-                for item in items_data:
-                    product_id = item.get("product")
-                    quantity = int(item.get("quantity", 1))
-                    price = float(item.get("price", 0))
-
-                    if not product_id:
-                        raise ValueError("Missing product ID for order item")
 
-                    product = Product.objects.filter(id=product_id, is_active=True).first()
+            # Doanh số của product thay đổi khi đổi item hoặc khi order bị hủy / bỏ hủy
+            track_sales = items_data is not None or counts_as_sale(old_state[1]) != counts_as_sale(order.status)
+            sales_before = order_item_sales([order.pk]) if track_sales and counts_as_sale(old_state[1]) else {}
 
-                    if not product:
-                        raise ValueError(f"Product {product_id} not found or inactive")
+            # total_amount chỉ đổi qua UPDATE cộng chênh lệch bên dưới, không ghi đè bằng giá trị đã load
+            order.save(update_fields=[
+                field.name for field in Order._meta.concrete_fields if field.name not in ("id", "total_amount")
+            ])
 
-                    if price <= 0:
-                        price = product.price
+            if items_data is not None:
+                items = parse_order_items(items_data)
 
-                    sub_total = quantity * price
+                # ✅ Chỉ insert / update / delete phần item thay đổi
+                delta = sync_order_items(order, items)
 
-                    OrderItem.objects.create(
-                        order=order,
-                        product=product,
-                        quantity=quantity,
-                        price=price,
-                    )
+                # ✅ Cập nhật tổng tiền: total_amount = total_amount + chênh lệch, 1 câu UPDATE
+                apply_total_delta(order.pk, delta)
 
-                    total += sub_total
+            # ✅ Cập nhật rollup cho API report (chỉ ghi khi status / payment method / total thay đổi)
+            new_state = (order.created_at, order.status, order.payment_method_id, order.total_amount + delta)
 
-                # ✅ Cập nhật lại tổng tiền
-                order.total_amount = total
+            if new_state != old_state:
+                record_order_change(old_state, new_state)
 
-            order.save()
+            if track_sales:
+                sales_after = order_item_sales([order.pk]) if counts_as_sale(order.status) else {}
+                record_sales(diff_sales(sales_after, sales_before))
 
+        order = OrderSerializer.setup_eager_loading(Order.objects.all()).get(pk=order.pk)
         serializer = OrderSerializer(order)
 
+        # Lưu read model để các lần đọc sau không phải serialize lại
+        store_order_snapshot(order, serializer.data)
+
         return Response({
             "success": True,
             "message": "Order updated successfully",
             "data": serializer.data
         }, status=status.HTTP_200_OK)
 
+    except (Order.DoesNotExist, ValidationError):
+        return Response({
+            "success": False,
+            "message": "Order not found."
+        }, status=status.HTTP_404_NOT_FOUND)
+
     except ValueError as ve:
         return Response({
             "success": False,
@@ -298,10 +451,159 @@ def update_order(request, id):
             "error": str(ve)
         }, status=status.HTTP_400_BAD_REQUEST)
 
-    except Exception as e:
-        print(f"Error in update_order: {e}")
+    except Exception:
+        logger.exception("Error in update_order")
+
+        return Response({
+            "success": False,
+            "message": "Something went wrong"
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+########## Bulk status ##########
+# Body: {"ids": [...], "status": "shipped"}, chỉ cho phép các bước chuyển trong ORDER_STATUS_TRANSITIONS
+# Kết quả trả về theo từng order, đúng thứ tự ids gửi lên (xem order_status.py)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def bulk_update_status(request):
+    try:
+        ids = request.data.get("ids", None)
+        status_body = request.data.get("status", None)
+
+        if not isinstance(ids, list) or not ids:
+            return Response({
+                "success": False,
+                "message": "ids must be a non-empty list of order IDs"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if status_body not in OrderStatus.values:
+            return Response({
+                "success": False,
+                "message": f"Invalid status '{status_body}'. Must be one of: {OrderStatus.values}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        result = bulk_transition(ids, status_body)
+
+        return Response({
+            "success": True,
+            "message": f"{result['updated']} orders updated",
+            "data": result
+        }, status=status.HTTP_200_OK)
+
+    except Exception:
+        logger.exception("Error in bulk_update_status")
 
         return Response({
             "success": False,
             "message": "Something went wrong"
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+########## Async (ASGI) ##########
+@require_GET
+async def aget_list(request):
+    try:
+        if not await aauthenticate(request):
+            return unauthorized_response()
+
+        # Get query params
+        cursor = request.GET.get("cursor", None)
+        count_mode = request.GET.get("count", COUNT_EXACT)
+        page = int(request.GET.get("page", 1))
+        limit = int(request.GET.get("limit", 10))
+        offset = (page - 1) * limit
+
+        queryset, filters = filter_orders(request.GET)
+
+        # Cursor mode: ?cursor= (rỗng = page đầu), không chạy COUNT
+        if cursor is not None:
+            try:
+                orders, next_cursor = await apaginate_by_cursor(
+                    queryset.only("id", "created_at", "snapshot"), ORDER_CURSOR_ORDERING, cursor, limit
+                )
+            except (ValueError, ValidationError) as ve:
+                return json_response({
+                    "success": False,
+                    "message": "Invalid data",
+                    "error": str(ve)
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            return raw_json_response(render_with_raw_data({
+                "success": True,
+                "paging": {
+                    "limit": limit,
+                    "next_cursor": next_cursor
+                }
+            }, await aload_order_snapshots(orders)), status=status.HTTP_200_OK)
+
+        if count_mode not in COUNT_MODES:
+            return json_response({
+                "success": False,
+                "message": f"Invalid count '{count_mode}'. Must be one of: {list(COUNT_MODES)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        total_items, total_item_type = await acount_items(queryset, filters, count_mode)
+        total_pages = math.ceil(total_items / limit) if limit > 0 else 1
+
+        # Case: page > total_pages
+        if page > total_pages and total_pages > 0:
+            return json_response({
+                "success": True,
+                "paging": {
+                    "current_page": page,
+                    "total_page": total_pages,
+                    "total_item": total_items,
+                    "total_item_type": total_item_type
+                },
+                "data": []
+            }, status=status.HTTP_200_OK)
+
+        # Get pagination data: 1 query lấy snapshot đã render (xem snapshots.py)
+        orders = [order async for order in queryset.only("id", "snapshot")[offset:offset + limit]]
+
+        return raw_json_response(render_with_raw_data({
+            "success": True,
+            "paging": {
+                "current_page": page,
+                "total_page": total_pages,
+                "total_item": total_items,
+                "total_item_type": total_item_type
+            }
+        }, await aload_order_snapshots(orders)), status=status.HTTP_200_OK)
+
+    except Exception:
+        logger.exception("Error in aget_list")
+
+        return json_response({
+            "success": False,
+            "message": "Something wrong",
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@require_GET
+async def aget_detail(request, id):
+    try:
+        if not await aauthenticate(request):
+            return unauthorized_response()
+
+        order = await Order.objects.only("id", "snapshot").aget(pk=id)
+        snapshot = (await aload_order_snapshots([order]))[0]
+
+        return raw_json_response(
+            render_with_raw_data({"success": True}, snapshot, many=False),
+            status=status.HTTP_200_OK
+        )
+
+    except (Order.DoesNotExist, ValidationError):
+        return json_response({
+            "success": False,
+            "message": "Order not found."
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    except Exception:
+        logger.exception("Error in aget detail order")
+
+        return json_response({
+            "success": False,
+            "message": "Something went wrong"
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,90 @@
+import csv
+from django.conf import settings
+from .fast_serializers import order_values, serialize_orders
+from .pagination import keyset_filter
+from .snapshots import load_order_snapshots
+
+# Export toàn bộ order (theo filter của get_list) dưới dạng NDJSON / CSV, stream từng batch
+# Mỗi batch là 1 query keyset (created_at, id) có index, không OFFSET, không giữ cursor mở:
+# PyMySQL đọc hết kết quả của 1 query vào memory nên .iterator() không giữ được memory ổn định
+# trên MySQL, chia query theo batch thì memory chỉ phụ thuộc batch size
+
+EXPORT_ORDERING = ['created_at', 'id']
+
+CSV_HEADER = [
+    "order_id", "created_at", "updated_at", "status", "username", "payment_method", "total_amount", "note",
+    "item_id", "product_id", "product_name", "quantity", "price", "sub_total",
+]
+
+def get_batch_size():
+    return getattr(settings, "ORDER_EXPORT_BATCH_SIZE", 500)
+
+# `queryset` trả về model instance hoặc dict (.values()), mỗi lần yield 1 list row
+def iter_batches(queryset, batch_size):
+    queryset = queryset.order_by(*EXPORT_ORDERING)
+    last = None
+
+    while True:
+        batch = queryset if last is None else queryset.filter(keyset_filter(EXPORT_ORDERING, last))
+        rows = list(batch[:batch_size])
+
+        if not rows:
+            return
+
+        yield rows
+
+        if len(rows) < batch_size:
+            return
+
+        row = rows[-1]
+        last = [row[field] for field in EXPORT_ORDERING] if isinstance(row, dict) \
+            else [getattr(row, field) for field in EXPORT_ORDERING]
+
+# Mỗi dòng là JSON của order giống order detail, lấy thẳng từ snapshot (xem snapshots.py)
+def iter_ndjson(queryset, batch_size=None):
+    for orders in iter_batches(queryset.only("id", "created_at", "snapshot"), batch_size or get_batch_size()):
+        yield b"".join(snapshot + b"\n" for snapshot in load_order_snapshots(orders))
+
+# csv.writer cần 1 object có write(), trả về luôn dòng vừa ghi
+class Echo:
+    def write(self, value):
+        return value
+
+# 1 dòng / order item, order không có item vẫn có 1 dòng với các cột item để trống
+def order_csv_rows(order):
+    payment_method = order["payment_method"]["key"] if order["payment_method"] else ""
+    columns = [
+        order["id"], order["created_at"], order["updated_at"], order["status"],
+        order["user"]["username"], payment_method, order["total_amount"], order["note"] or "",
+    ]
+
+    if not order["items"]:
+        return [columns + [""] * 6]
+
+    return [
+        columns + [
+            item["id"],
+            item["product"]["id"] if item["product"] else "",
+            item["product"]["name"] if item["product"] else "",
+            item["quantity"],
+            item["price"],
+            item["sub_total"],
+        ]
+        for item in order["items"]
+    ]
+
+def iter_csv(queryset, batch_size=None):
+    writer = csv.writer(Echo())
+
+    yield writer.writerow(CSV_HEADER)
+
+    for rows in iter_batches(order_values(queryset), batch_size or get_batch_size()):
+        yield "".join(
+            writer.writerow(row) for order in serialize_orders(rows) for row in order_csv_rows(order)
+        )
+
+# type -> (generator, content type, tên file)
+EXPORT_TYPES = {
+    "ndjson": (iter_ndjson, "application/x-ndjson", "orders.ndjson"),
+    "csv": (iter_csv, "text/csv", "orders.csv"),
+}
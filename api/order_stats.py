@@ -0,0 +1,140 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Order, OrderDailyStat
+from .order_totals import ZERO
+
+# Rollup cho API report: số order + doanh thu theo (ngày tạo, status, payment method)
+# - Mỗi lần order được tạo / đổi status, payment method, total: INSERT các row chênh lệch cho bucket cũ / mới
+#   trong cùng transaction với thay đổi của order, không UPDATE row có sẵn
+#   => nhiều order cùng ngày / status không phải chờ khóa cùng 1 row, không có race khi tạo bucket mới
+# - Report luôn SUM theo bucket nên đọc ngay được chênh lệch mới, không trễ
+# - compact_order_stats (chạy định kỳ, vd. cron mỗi phút) gộp các row của 1 bucket thành 1 row
+# - rebuild_order_stats tính lại từ Order (sau khi import dữ liệu, sửa total bằng tay, ...)
+# Ngày tính theo TIME_ZONE, giống TruncDate('created_at') lúc rebuild
+
+# Trạng thái của order dùng cho rollup: (created_at, status, payment_method_id, total_amount)
+def order_state(order):
+    return (order.created_at, order.status, order.payment_method_id, order.total_amount)
+
+def stat_key(created_at, status, payment_method_id):
+    return (timezone.localdate(created_at), status, payment_method_id)
+
+# Chênh lệch {bucket: [số order, doanh thu]} khi order đổi từ `old` sang `new` (None = chưa có / đã xóa)
+def order_change_deltas(old, new, deltas=None):
+    deltas = {} if deltas is None else deltas
+
+    for state, sign in ((old, -1), (new, 1)):
+        if state is None:
+            continue
+
+        created_at, status, payment_method_id, total = state
+        delta = deltas.setdefault(stat_key(created_at, status, payment_method_id), [0, ZERO])
+        delta[0] += sign
+        delta[1] += sign * total
+
+    return deltas
+
+def get_compact_batch_size():
+    return getattr(settings, "ORDER_STATS_COMPACT_BATCH_SIZE", 31)
+
+# 1 câu INSERT cho tất cả bucket thay đổi
+def apply_stat_deltas(deltas):
+    rows = [
+        OrderDailyStat(
+            day=day, status=status, payment_method_id=payment_method_id, order_count=count, revenue=revenue
+        )
+        for (day, status, payment_method_id), (count, revenue) in deltas.items()
+        if count or revenue
+    ]
+
+    if rows:
+        OrderDailyStat.objects.bulk_create(rows)
+
+def record_order_change(old, new):
+    apply_stat_deltas(order_change_deltas(old, new))
+
+# Gộp các row của `days` (list ngày), trả về số row đã xóa
+# skip_locked: nhiều worker chạy cùng lúc không gộp trùng 1 row (SQLite bỏ qua FOR UPDATE)
+# Row chèn trong lúc gộp không nằm trong danh sách đã khóa nên được giữ nguyên
+def compact_days(days):
+    with transaction.atomic():
+        rows = OrderDailyStat.objects.select_for_update(skip_locked=True).filter(day__in=days).values_list(
+            "id", "day", "status", "payment_method", "order_count", "revenue"
+        )
+        buckets = {}
+
+        for stat_id, day, status, payment_method_id, count, revenue in rows:
+            bucket = buckets.setdefault((day, status, payment_method_id), [[], 0, ZERO])
+            bucket[0].append(stat_id)
+            bucket[1] += count
+            bucket[2] += revenue
+
+        # Bucket đã có 1 row khác 0: giữ nguyên; bucket về 0 (order đã chuyển đi): xóa luôn
+        merged = {key: bucket for key, bucket in buckets.items() if len(bucket[0]) > 1 or not (bucket[1] or bucket[2])}
+
+        if not merged:
+            return 0
+
+        stat_ids = [stat_id for bucket in merged.values() for stat_id in bucket[0]]
+        OrderDailyStat.objects.filter(id__in=stat_ids).delete()
+        OrderDailyStat.objects.bulk_create([
+            OrderDailyStat(
+                day=day, status=status, payment_method_id=payment_method_id, order_count=count, revenue=revenue
+            )
+            for (day, status, payment_method_id), (_, count, revenue) in merged.items()
+            if count or revenue
+        ])
+
+    return len(stat_ids)
+
+# Chỉ đụng tới ngày có bucket nhiều row / row bằng 0, mỗi transaction `batch_size` ngày
+def compact_order_stats(batch_size=None):
+    batch_size = batch_size or get_compact_batch_size()
+    days = sorted({
+        row["day"] for row in OrderDailyStat.objects.values("day", "status", "payment_method").annotate(
+            rows=Count("id"), total_orders=Sum("order_count"), total_revenue=Sum("revenue")
+        ).order_by()
+        if row["rows"] > 1 or not (row["total_orders"] or row["total_revenue"])
+    })
+    compacted = 0
+
+    for start in range(0, len(days), batch_size):
+        compacted += compact_days(days[start:start + batch_size])
+
+    return compacted
+
+# Tính lại rollup từ Order, `since` (date) = chỉ tính lại từ ngày đó trở đi
+# Đọc tổng bằng FOR UPDATE trong cùng transaction với DELETE / INSERT: khóa các order trong phạm vi (và khoảng
+# trống của index, chặn order mới) tới khi commit
+# - Thay đổi đang chạy (đã INSERT row chênh lệch, chưa commit) đang giữ khóa order: rebuild chờ chúng commit
+#   rồi mới đọc, tổng đã gồm thay đổi đó nên xóa row chênh lệch của nó là đúng
+# - Thay đổi tới sau phải chờ rebuild commit rồi mới INSERT row chênh lệch, row đó không bị xóa
+# => create / update / bulk status bị chặn trong lúc rebuild, nên chạy lúc ít request
+def rebuild_order_stats(since=None, batch_size=1000):
+    orders = Order.objects.order_by()
+    stats = OrderDailyStat.objects.all()
+
+    if since is not None:
+        orders = orders.filter(created_at__date__gte=since)
+        stats = stats.filter(day__gte=since)
+
+    with transaction.atomic():
+        rows = list(
+            orders.select_for_update().annotate(day=TruncDate("created_at")).values(
+                "day", "status", "payment_method"
+            ).annotate(order_count=Count("id"), revenue=Sum("total_amount"))
+        )
+
+        stats.delete()
+        created = OrderDailyStat.objects.bulk_create([
+            OrderDailyStat(
+                day=row["day"], status=row["status"], payment_method_id=row["payment_method"],
+                order_count=row["order_count"], revenue=row["revenue"] or ZERO
+            )
+            for row in rows
+        ], batch_size=batch_size)
+
+    return len(created)
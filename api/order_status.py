@@ -0,0 +1,135 @@
+import uuid
+from itertools import islice
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import Order
+from .snapshots import cleared_snapshot
+from .constants import ORDER_STATUS_TRANSITIONS
+from .counting import invalidate_counts
+from .order_stats import order_change_deltas, apply_stat_deltas
+from .product_sales import counts_as_sale, order_item_sales, negate_sales, record_sales
+
+# Chuyển status cho nhiều order trong 1 request
+# Mỗi chunk id: 1 query đọc status hiện tại, sau đó mỗi status nguồn 1 câu
+#   UPDATE api_order SET status = <mới>, ... WHERE id IN (...) AND status = <nguồn>
+# Điều kiện status = <nguồn> đảm bảo order bị đổi status ở request khác trong lúc đó
+# không bị ghi đè (báo lỗi "conflict" cho order đó)
+# QuerySet.update() không gửi signal: tự bỏ snapshot (snapshot = NULL) và invalidate count
+# Rollup của report (order_stats.py) được cộng chênh lệch theo bucket, gộp cho cả chunk
+# Order bị hủy: trừ doanh số product của các order đó (product_sales.py), 1 query + 1 INSERT
+
+def get_chunk_size():
+    return getattr(settings, "ORDER_BULK_UPDATE_CHUNK_SIZE", 1000)
+
+def parse_order_ids(values):
+    results = {}
+    order_ids = {}
+
+    for value in values:
+        try:
+            order_ids[uuid.UUID(str(value))] = None
+        except ValueError:
+            results[str(value)] = {"id": str(value), "success": False, "error": "Invalid order ID"}
+
+    return list(order_ids), results
+
+def transition_chunk(order_ids, new_status, now):
+    results = {}
+    groups = {}
+
+    # id -> (created_at, status, payment_method_id, total_amount)
+    current = {
+        row[0]: row[1:] for row in Order.objects.filter(id__in=order_ids).values_list(
+            "id", "created_at", "status", "payment_method_id", "total_amount"
+        )
+    }
+
+    for order_id in order_ids:
+        old_status = current[order_id][1] if order_id in current else None
+
+        if old_status is None:
+            results[order_id] = {"success": False, "error": "Order not found"}
+        elif old_status == new_status:
+            results[order_id] = {"success": True, "status": new_status, "updated": False}
+        elif new_status not in ORDER_STATUS_TRANSITIONS[old_status]:
+            results[order_id] = {"success": False, "error": f"Cannot change status from '{old_status}' to '{new_status}'"}
+        else:
+            groups.setdefault(old_status, []).append(order_id)
+
+    updated = 0
+    deltas = {}
+    canceled = []
+
+    for old_status, ids in groups.items():
+        count = Order.objects.filter(id__in=ids, status=old_status).update(
+            status=new_status, updated_at=now, **cleared_snapshot()
+        )
+        updated += count
+
+        # Có order đã bị đổi status giữa lúc đọc và UPDATE -> tìm các order thực sự được update
+        changed = set(ids) if count == len(ids) else set(
+            Order.objects.filter(id__in=ids, status=new_status, updated_at=now).values_list("id", flat=True)
+        )
+
+        for order_id in ids:
+            if order_id in changed:
+                results[order_id] = {"success": True, "status": new_status, "updated": True}
+
+                created_at, _, payment_method_id, total = current[order_id]
+                order_change_deltas(
+                    current[order_id], (created_at, new_status, payment_method_id, total), deltas
+                )
+
+                if counts_as_sale(old_status) and not counts_as_sale(new_status):
+                    canceled.append(order_id)
+            else:
+                results[order_id] = {"success": False, "error": "Order status changed by another request"}
+
+    apply_stat_deltas(deltas)
+
+    if canceled:
+        record_sales(negate_sales(order_item_sales(canceled)))
+
+    return results, updated
+
+# Trả về {"updated": số order đã đổi, "failed": số lỗi, "results": [...]} theo thứ tự `values`
+def bulk_transition(values, new_status, chunk_size=None):
+    chunk_size = chunk_size or get_chunk_size()
+    order_ids, invalid = parse_order_ids(values)
+    now = timezone.now()
+
+    results = {}
+    updated = 0
+    remaining = iter(order_ids)
+
+    try:
+        while True:
+            chunk = list(islice(remaining, chunk_size))
+
+            if not chunk:
+                break
+
+            with transaction.atomic():
+                chunk_results, chunk_updated = transition_chunk(chunk, new_status, now)
+
+            results.update(chunk_results)
+            updated += chunk_updated
+    finally:
+        if updated:
+            invalidate_counts(Order)
+
+    ordered = []
+
+    for value in values:
+        if str(value) in invalid:
+            ordered.append(invalid[str(value)])
+        else:
+            order_id = uuid.UUID(str(value))
+            ordered.append({"id": str(order_id), **results[order_id]})
+
+    return {
+        "updated": updated,
+        "failed": sum(1 for result in ordered if not result["success"]),
+        "results": ordered,
+    }
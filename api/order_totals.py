@@ -0,0 +1,60 @@
+from decimal import Decimal, InvalidOperation
+from django.db.models import F, OuterRef, Subquery, Sum, Value, DecimalField
+from django.db.models.functions import Coalesce
+from .models import Order, OrderItem
+from .snapshots import cleared_snapshot
+
+# Tổng tiền của order, tính bằng Decimal (không dùng float)
+# - OrderItem.sub_total = quantity * price do DB tự tính (GeneratedField)
+# - Order.total_amount = tổng sub_total, cập nhật theo phần chênh lệch khi item thay đổi:
+#     UPDATE api_order SET total_amount = total_amount + <delta> WHERE id = ...
+# - audit_order_totals tính lại từ item để phát hiện / sửa chênh lệch
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+
+def to_money(value):
+    try:
+        return Decimal(str(value)).quantize(CENT)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Invalid price {value}")
+
+# Giống giá trị DB tính cho cột sub_total
+def line_total(quantity, price):
+    return (quantity * price).quantize(CENT)
+
+def apply_total_delta(order_id, delta):
+    if delta:
+        Order.objects.filter(pk=order_id).update(total_amount=F("total_amount") + delta)
+
+# SUM(sub_total) các item của order bên ngoài, order không có item -> 0
+def items_total():
+    total = OrderItem.objects.filter(order=OuterRef("pk")).values("order").annotate(
+        total=Sum("sub_total")
+    ).values("total")
+
+    return Coalesce(Subquery(total), Value(ZERO), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+# Tính lại total của các order trong 1 câu UPDATE, bỏ snapshot vì total đã đổi
+def recompute_totals(order_ids):
+    return Order.objects.filter(pk__in=order_ids).update(total_amount=items_total(), **cleared_snapshot())
+
+# Duyệt order theo pk từng batch, mỗi batch 1 query tổng hợp
+# yield (order_id, total đang lưu, total tính từ item) cho các order bị lệch
+def find_drift(batch_size=1000):
+    queryset = Order.objects.order_by("pk")
+    last_pk = None
+
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(batch.annotate(computed=items_total()).values_list("pk", "total_amount", "computed")[:batch_size])
+
+        if not rows:
+            return
+
+        for order_id, stored, computed in rows:
+            # So sánh sau khi làm tròn: SQLite cộng decimal bằng số thực
+            if to_money(stored) != to_money(computed):
+                yield order_id, stored, computed
+
+        last_pk = rows[-1][0]
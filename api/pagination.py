@@ -0,0 +1,76 @@
+import base64
+import json
+from django.db.models import Q
+
+# Keyset (cursor) pagination
+# Thay vì OFFSET + COUNT, query tiếp theo bắt đầu ngay sau row cuối của page trước:
+#   WHERE (created_at < c) OR (created_at = c AND id < i) ORDER BY created_at DESC, id DESC
+# nên chi phí mỗi page không phụ thuộc vào độ sâu của page.
+
+ORDER_CURSOR_ORDERING = ['-created_at', '-id']
+PRODUCT_CURSOR_ORDERING = ['id']
+
+def encode_cursor(values):
+    raw = json.dumps([str(value) for value in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor, ordering):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise ValueError("Invalid cursor")
+
+    return values
+
+# Điều kiện "đứng sau" row có giá trị `values` theo thứ tự `ordering`
+def keyset_filter(ordering, values):
+    condition = Q()
+
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+
+        filters = {previous.lstrip('-'): value for previous, value in zip(ordering[:i], values[:i])}
+        filters[f"{name}__{lookup}"] = values[i]
+
+        condition |= Q(**filters)
+
+    return condition
+
+# Query của 1 page: lấy dư 1 row để biết còn page sau hay không
+# cursor rỗng ("") nghĩa là page đầu tiên
+def cursor_page_queryset(queryset, ordering, cursor, limit):
+    if limit <= 0:
+        raise ValueError("Limit must be greater than 0")
+
+    queryset = queryset.order_by(*ordering)
+
+    if cursor:
+        queryset = queryset.filter(keyset_filter(ordering, decode_cursor(cursor, ordering)))
+
+    return queryset[:limit + 1]
+
+def split_cursor_page(rows, ordering, limit):
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    # row là model instance hoặc dict (queryset.values())
+    get = last.get if isinstance(last, dict) else lambda name: getattr(last, name)
+    next_cursor = encode_cursor([get(field.lstrip('-')) for field in ordering])
+
+    return rows, next_cursor
+
+# Trả về (rows, next_cursor), next_cursor = None khi đã tới page cuối
+def paginate_by_cursor(queryset, ordering, cursor, limit):
+    rows = list(cursor_page_queryset(queryset, ordering, cursor, limit))
+    return split_cursor_page(rows, ordering, limit)
+
+async def apaginate_by_cursor(queryset, ordering, cursor, limit):
+    rows = [row async for row in cursor_page_queryset(queryset, ordering, cursor, limit)]
+    return split_cursor_page(rows, ordering, limit)
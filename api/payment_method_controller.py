@@ -1,34 +1,44 @@
+import logging
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.db.models import Q
 from django.core.exceptions import ValidationError
+from django.views.decorators.http import require_GET
 from .models import PaymentMethod
 from .serializers import PaymentMethodSerializer
+from .catalog_cache import cached_json_response, acached_json_response
+from .utils import json_response
+
+logger = logging.getLogger(__name__)
 
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def get_list(request):
     try:
-        queryset = PaymentMethod.objects.all()
-
         is_active = request.GET.get('is_active', None)
 
-        if is_active:
-            is_active_bool = True if is_active == "true" else False
+        # Chỉ chạy khi cache miss (xem catalog_cache.py)
+        def build_payload():
+            queryset = PaymentMethod.objects.all()
 
-            queryset = queryset.filter(is_active=is_active_bool)
+            if is_active:
+                is_active_bool = True if is_active == "true" else False
 
-        serializer = PaymentMethodSerializer(queryset, many=True)
+                queryset = queryset.filter(is_active=is_active_bool)
 
-        return Response({
-            "success": True,
-            "data": serializer.data
-        }, status=status.HTTP_200_OK)
+            serializer = PaymentMethodSerializer(queryset, many=True)
+
+            return {
+                "success": True,
+                "data": serializer.data
+            }
+
+        return cached_json_response(request, PaymentMethod, {"is_active": is_active}, build_payload)
     
-    except Exception as e:
-        print(f"Error in get_list: {e}")
+    except Exception:
+        logger.exception("Error in get_list")
 
         return Response({
             "success": False,
@@ -57,10 +67,43 @@ def create_payment_method(request):
             "errors": serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
 
-    except Exception as e:
-        print(f"Error in create payment method: {e}")
+    except Exception:
+        logger.exception("Error in create payment method")
 
         return Response({
             "success": False,
             "message": "Something wrong",
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+########## Async (ASGI) ##########
+@require_GET
+async def aget_list(request):
+    try:
+        is_active = request.GET.get('is_active', None)
+
+        # Chỉ chạy khi cache miss (xem catalog_cache.py)
+        async def abuild_payload():
+            queryset = PaymentMethod.objects.all()
+
+            if is_active:
+                is_active_bool = True if is_active == "true" else False
+
+                queryset = queryset.filter(is_active=is_active_bool)
+
+            serializer = PaymentMethodSerializer([row async for row in queryset], many=True)
+
+            return {
+                "success": True,
+                "data": serializer.data
+            }
+
+        return await acached_json_response(request, PaymentMethod, {"is_active": is_active}, abuild_payload)
+
+    except Exception:
+        logger.exception("Error in aget_list")
+
+        return json_response({
+            "success": False,
+            "message": "Something wrong",
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1,42 +1,152 @@
+import logging
 import math
 import uuid
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import ParseError
 from rest_framework.permissions import IsAuthenticated
+from asgiref.sync import sync_to_async
 from django.db.models import Q
 from django.core.exceptions import ValidationError
+from django.views.decorators.http import require_GET
 from .models import Product
+from .counting import count_items, acount_items, COUNT_EXACT, COUNT_MODES
+from .category_products import category_count_scope
+from .pagination import paginate_by_cursor, apaginate_by_cursor, PRODUCT_CURSOR_ORDERING
+from .search import search_products
 from .serializers import ProductSerializer
+from .fast_serializers import PRODUCT_FIELDS, product_values, serialize_products, aserialize_products, format_money
+from .product_import import import_products, parse_rows, IMPORT_FORMATS
+from .utils import json_response
+
+logger = logging.getLogger(__name__)
+
+# Queryset + bộ filter theo query params, dùng chung cho get_list / aget_list
+def filter_products(params):
+    # Get data from database
+    queryset = ProductSerializer.setup_eager_loading(Product.objects.all())
+
+    q = params.get('q', None)
+    category = params.get('category', None)
+    is_active = params.get('is_active', None)
+    min_price = params.get('min_price', None)
+    max_price = params.get('max_price', None)
+
+    filters = {"q": q, "category": category, "is_active": is_active, "min_price": min_price, "max_price": max_price}
+
+    # Filter by params
+    if q:
+        # Full-text search, sắp xếp theo relevance (xem search.py)
+        queryset = search_products(queryset, q)
+
+    # Có category: is_active / price filter trên bảng category_product (index (category_id, is_active, price)),
+    # tất cả điều kiện trong 1 lần filter() để chỉ JOIN 1 lần, mỗi product 1 row / category nên không cần DISTINCT
+    conditions = {}
+    prefix = ""
+
+    if category:
+        try:
+            conditions["category_links__category_id"] = uuid.UUID(category)
+        except ValueError:
+            return queryset.none(), filters
+
+        prefix = "category_links__"
+
+    if is_active:
+        conditions[f"{prefix}is_active"] = is_active == "true"
+
+    if min_price:
+        conditions[f"{prefix}price__gte"] = min_price
+
+    if max_price:
+        conditions[f"{prefix}price__lte"] = max_price
+
+    return queryset.filter(**conditions), filters
+
+# ?sort=: thêm id để thứ tự ổn định, dùng được cho cả cursor pagination (có index (cột, id))
+PRODUCT_SORTS = {
+    "price": ["price", "id"],
+    "-price": ["-price", "-id"],
+    "units_sold": ["units_sold", "id"],
+    "-units_sold": ["-units_sold", "-id"],
+    "revenue": ["revenue", "id"],
+    "-revenue": ["-revenue", "-id"],
+}
+
+# Trả về ordering theo ?sort=, None = giữ thứ tự mặc định (hoặc relevance khi có q)
+def get_product_ordering(params):
+    sort = params.get("sort", None)
+
+    if not sort:
+        return None
+
+    if sort not in PRODUCT_SORTS:
+        raise ValueError(f"Invalid sort '{sort}'. Must be one of: {list(PRODUCT_SORTS)}")
+
+    return PRODUCT_SORTS[sort]
+
+# Cột của ordering cần đọc thêm ngoài PRODUCT_FIELDS (cursor lấy giá trị từ row cuối)
+def ordering_fields(ordering):
+    return [field.lstrip("-") for field in ordering if field.lstrip("-") not in PRODUCT_FIELDS]
 
 ########## Get list ##########
 @api_view(["GET"])
 def get_list(request):
     try:
-        # Get data from database
-        queryset = Product.objects.all()
-
         # Get query params
-        q = request.GET.get('q', None)
-        min_price = request.GET.get('min_price', None)
-        max_price = request.GET.get('max_price', None)
+        cursor = request.GET.get("cursor", None)
+        count_mode = request.GET.get("count", COUNT_EXACT)
         page = int(request.GET.get("page", 1))
         limit = int(request.GET.get("limit", 10))
         offset = (page - 1) * limit
 
-        # Filter by params
-        if q:
-            queryset = queryset.filter(
-                Q(name__icontains=q) | Q(description__icontains=q)
-            )
-        
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
+        queryset, filters = filter_products(request.GET)
+
+        try:
+            ordering = get_product_ordering(request.GET)
+        except ValueError as ve:
+            return Response({
+                "success": False,
+                "message": "Invalid data",
+                "error": str(ve)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Cursor mode: ?cursor= (rỗng = page đầu), không chạy COUNT
+        if cursor is not None:
+            cursor_ordering = ordering or PRODUCT_CURSOR_ORDERING
+
+            try:
+                products, next_cursor = paginate_by_cursor(
+                    product_values(queryset, *ordering_fields(cursor_ordering)), cursor_ordering, cursor, limit
+                )
+            except (ValueError, ValidationError) as ve:
+                return Response({
+                    "success": False,
+                    "message": "Invalid data",
+                    "error": str(ve)
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            return Response({
+                "success": True,
+                "paging": {
+                    "limit": limit,
+                    "next_cursor": next_cursor
+                },
+                "data": serialize_products(products)
+            }, status=status.HTTP_200_OK)
 
-        if max_price:
-            queryset = queryset.filter(price__lte=max_price)
+        if count_mode not in COUNT_MODES:
+            return Response({
+                "success": False,
+                "message": f"Invalid count '{count_mode}'. Must be one of: {list(COUNT_MODES)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        total_items = queryset.count()
+        # Tổng số row: lấy từ cache hoặc ước lượng (xem counting.py)
+        # ?category=: cache count theo category, không mất khi product của category khác thay đổi
+        total_items, total_item_type = count_items(
+            queryset, filters, count_mode, scope=category_count_scope(filters["category"])
+        )
         total_pages = math.ceil(total_items / limit) if limit > 0 else 1
 
         # Case: page > total_pages
@@ -46,16 +156,20 @@ def get_list(request):
                 "paging": {
                     "current_page": page,
                     "total_page": total_pages,
-                    "total_item": total_items
+                    "total_item": total_items,
+                    "total_item_type": total_item_type
                 },
                 "data": []
             }, status=status.HTTP_200_OK)
 
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+
         # Get pagination data
-        products = queryset[offset:offset + limit]
+        products = product_values(queryset)[offset:offset + limit]
 
-        # Serialize
-        serializer = ProductSerializer(products, many=True)
+        # Serialize: .values() + hàm dựng dict compile sẵn (xem fast_serializers.py)
+        data = serialize_products(products)
 
         # Return json
         return Response({
@@ -63,13 +177,60 @@ def get_list(request):
             "paging": {
                 "current_page": page,
                 "total_page": total_pages,
-                "total_item": total_items
+                "total_item": total_items,
+                "total_item_type": total_item_type
             },
-            "data": serializer.data
+            "data": data
         }, status=status.HTTP_200_OK)
 
-    except Exception as e:
-        print(f"Error in get_list: {e}")
+    except Exception:
+        logger.exception("Error in get_list")
+
+        return Response({
+            "success": False,
+            "message": "Something wrong",
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+########## Best sellers ##########
+BEST_SELLER_SORTS = ("units_sold", "revenue")
+MAX_BEST_SELLERS = 100
+
+# Product đang bán có doanh số cao nhất, đọc counter của product (index (units_sold, id) / (revenue, id))
+# Counter được cộng định kỳ bởi flush_product_sales, có thể trễ 1 chu kỳ flush
+@api_view(["GET"])
+def get_best_sellers(request):
+    try:
+        by = request.GET.get("by", "units_sold")
+        limit = min(int(request.GET.get("limit", 10)), MAX_BEST_SELLERS)
+
+        if by not in BEST_SELLER_SORTS:
+            return Response({
+                "success": False,
+                "message": f"Invalid by '{by}'. Must be one of: {list(BEST_SELLER_SORTS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = Product.objects.filter(is_active=True, units_sold__gt=0).order_by(*PRODUCT_SORTS[f"-{by}"])
+        rows = list(product_values(queryset, "units_sold", "revenue")[:max(limit, 0)])
+
+        data = serialize_products(rows)
+
+        for product, row in zip(data, rows):
+            product["units_sold"] = row["units_sold"]
+            product["revenue"] = format_money(row["revenue"])
+
+        return Response({
+            "success": True,
+            "data": data
+        }, status=status.HTTP_200_OK)
+
+    except ValueError:
+        return Response({
+            "success": False,
+            "message": "Invalid limit"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    except Exception:
+        logger.exception("Error in get_best_sellers")
 
         return Response({
             "success": False,
@@ -80,7 +241,7 @@ def get_list(request):
 @api_view(['GET'])
 def get_detail(request, id):
     try:
-        product = Product.objects.get(pk=id)
+        product = ProductSerializer.setup_eager_loading(Product.objects.all()).get(pk=id)
         serializer = ProductSerializer(product)
         
         return Response({
@@ -94,8 +255,8 @@ def get_detail(request, id):
             "message": "Product not found."
         }, status=status.HTTP_404_NOT_FOUND)
 
-    except Exception as e:
-        print(f"Error get detail product: {e}")
+    except Exception:
+        logger.exception("Error get detail product")
 
         return Response({
             "success": False,
@@ -123,14 +284,62 @@ def create_product(request):
             "errors": serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
 
-    except Exception as e:
-        print(f"Error creating product: {e}")
+    except Exception:
+        logger.exception("Error creating product")
 
         return Response({
             "success": False,
             "message": "Something wrong",
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+########## Bulk import ##########
+# Body: JSON array (application/json), NDJSON (application/x-ndjson) hoặc CSV (text/csv)
+# CSV: header name,price,description,category_ids,is_active, category_ids cách nhau bằng "|"
+# ?dry_run=true chỉ validate, không insert (xem product_import.py)
+IMPORT_CONTENT_TYPES = {
+    "application/json": "json",
+    "application/x-ndjson": "ndjson",
+    "text/csv": "csv",
+}
+
+@api_view(["POST"])
+def import_product_list(request):
+    try:
+        content_type = request.content_type.split(";")[0].strip()
+        import_format = IMPORT_CONTENT_TYPES.get(content_type)
+        dry_run = request.GET.get("dry_run", None) == "true"
+
+        if import_format not in IMPORT_FORMATS:
+            return Response({
+                "success": False,
+                "message": f"Unsupported content type '{content_type}'. Must be one of: {list(IMPORT_CONTENT_TYPES)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # JSON parse cả body, NDJSON / CSV đọc từng dòng từ stream của request
+        try:
+            source = request.data if import_format == "json" else (request.stream or [])
+            result = import_products(parse_rows(source, import_format), dry_run=dry_run)
+        except (ValueError, ParseError) as ve:
+            return Response({
+                "success": False,
+                "message": "Invalid data",
+                "error": str(ve)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "success": True,
+            "message": "Import products successfully",
+            "data": result
+        }, status=status.HTTP_200_OK)
+
+    except Exception:
+        logger.exception("Error import products")
+
+        return Response({
+            "success": False,
+            "message": "Something wrong"
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(["PATCH"])
 def update_product(request, id):
     try:
@@ -168,10 +377,138 @@ def update_product(request, id):
             "errors": str(e)
         }, status=status.HTTP_400_BAD_REQUEST) 
 
-    except Exception as e:
-        print(f"Error update product: {e}")
+    except Exception:
+        logger.exception("Error update product")
 
         return Response({
             "success": False,
             "message": "Something wrong"
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+########## Async (ASGI) ##########
+@require_GET
+async def aget_list(request):
+    try:
+        # Get query params
+        q = request.GET.get('q', None)
+        cursor = request.GET.get("cursor", None)
+        count_mode = request.GET.get("count", COUNT_EXACT)
+        page = int(request.GET.get("page", 1))
+        limit = int(request.GET.get("limit", 10))
+        offset = (page - 1) * limit
+
+        # Inverted index (DB không phải MySQL) có thể phải query để build nên chạy trong thread
+        if q:
+            queryset, filters = await sync_to_async(filter_products)(request.GET)
+        else:
+            queryset, filters = filter_products(request.GET)
+
+        try:
+            ordering = get_product_ordering(request.GET)
+        except ValueError as ve:
+            return json_response({
+                "success": False,
+                "message": "Invalid data",
+                "error": str(ve)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Cursor mode: ?cursor= (rỗng = page đầu), không chạy COUNT
+        if cursor is not None:
+            cursor_ordering = ordering or PRODUCT_CURSOR_ORDERING
+
+            try:
+                products, next_cursor = await apaginate_by_cursor(
+                    product_values(queryset, *ordering_fields(cursor_ordering)), cursor_ordering, cursor, limit
+                )
+            except (ValueError, ValidationError) as ve:
+                return json_response({
+                    "success": False,
+                    "message": "Invalid data",
+                    "error": str(ve)
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            return json_response({
+                "success": True,
+                "paging": {
+                    "limit": limit,
+                    "next_cursor": next_cursor
+                },
+                "data": await aserialize_products(products)
+            }, status=status.HTTP_200_OK)
+
+        if count_mode not in COUNT_MODES:
+            return json_response({
+                "success": False,
+                "message": f"Invalid count '{count_mode}'. Must be one of: {list(COUNT_MODES)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        total_items, total_item_type = await acount_items(
+            queryset, filters, count_mode, scope=category_count_scope(filters["category"])
+        )
+        total_pages = math.ceil(total_items / limit) if limit > 0 else 1
+
+        # Case: page > total_pages
+        if page > total_pages and total_pages > 0:
+            return json_response({
+                "success": True,
+                "paging": {
+                    "current_page": page,
+                    "total_page": total_pages,
+                    "total_item": total_items,
+                    "total_item_type": total_item_type
+                },
+                "data": []
+            }, status=status.HTTP_200_OK)
+
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+
+        # Get pagination data: 1 query cho product, 1 query cho category (xem fast_serializers.py)
+        products = [product async for product in product_values(queryset)[offset:offset + limit]]
+
+        data = await aserialize_products(products)
+
+        return json_response({
+            "success": True,
+            "paging": {
+                "current_page": page,
+                "total_page": total_pages,
+                "total_item": total_items,
+                "total_item_type": total_item_type
+            },
+            "data": data
+        }, status=status.HTTP_200_OK)
+
+    except Exception:
+        logger.exception("Error in aget_list")
+
+        return json_response({
+            "success": False,
+            "message": "Something wrong",
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@require_GET
+async def aget_detail(request, id):
+    try:
+        product = await ProductSerializer.setup_eager_loading(Product.objects.all()).aget(pk=id)
+        serializer = ProductSerializer(product)
+
+        return json_response({
+            "success": True,
+            "data": serializer.data
+        }, status=status.HTTP_200_OK)
+
+    except (Product.DoesNotExist, ValidationError):
+        return json_response({
+            "success": False,
+            "message": "Product not found."
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    except Exception:
+        logger.exception("Error aget detail product")
+
+        return json_response({
+            "success": False,
+            "message": "Something wrong",
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,185 @@
+import csv
+import json
+from itertools import islice
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+from .models import Category, Product, CategoryProduct
+from .serializers import ProductImportSerializer
+from .counting import invalidate_counts
+from .search import product_search_index
+from .category_products import link_rows, invalidate_category_counts
+
+# Import nhiều product 1 lần (JSON array / NDJSON / CSV), xử lý theo chunk:
+# - Validate field từng row bằng ProductImportSerializer (1 instance dùng lại cho mọi row)
+# - Category của cả chunk kiểm tra bằng 1 query
+# - bulk_create product + row của bảng product_categories + category_product, 1 transaction / chunk
+# - Row lỗi bị bỏ qua và trả về trong "errors" (số thứ tự row bắt đầu từ 1)
+# bulk_create không gửi signal nên tự invalidate count cache + search index khi xong
+
+IMPORT_FORMATS = ("json", "ndjson", "csv")
+
+# CSV: category_ids cách nhau bằng "|"
+CSV_CATEGORY_SEPARATOR = "|"
+
+# Giới hạn số lỗi trả về, tránh response quá lớn khi file sai hàng loạt
+MAX_REPORTED_ERRORS = 1000
+
+def get_chunk_size():
+    return getattr(settings, "PRODUCT_IMPORT_CHUNK_SIZE", 1000)
+
+########## Parse ##########
+def decode_lines(lines):
+    for line in lines:
+        yield line.decode("utf-8") if isinstance(line, bytes) else line
+
+def parse_json_array(data):
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of products")
+
+    return iter(data)
+
+def parse_ndjson(lines):
+    for number, line in enumerate(decode_lines(lines), start=1):
+        line = line.strip()
+
+        if not line:
+            continue
+
+        # Dòng lỗi không dừng cả lần import, được báo lỗi như 1 row không hợp lệ
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield ValueError(f"Invalid JSON on line {number}")
+
+def read_csv(lines):
+    try:
+        yield from csv.DictReader(decode_lines(lines))
+    except csv.Error as e:
+        raise ValueError(f"Invalid CSV: {e}")
+
+def parse_csv(lines):
+    for row in read_csv(lines):
+        category_ids = row.get("category_ids")
+
+        if category_ids is not None:
+            row["category_ids"] = [value.strip() for value in category_ids.split(CSV_CATEGORY_SEPARATOR) if value.strip()]
+
+        # Cột để trống = dùng default của model
+        yield {key: value for key, value in row.items() if value != ""}
+
+def parse_rows(source, import_format):
+    if import_format == "json":
+        return parse_json_array(json.load(source) if hasattr(source, "read") else source)
+
+    if import_format == "ndjson":
+        return parse_ndjson(source)
+
+    if import_format == "csv":
+        return parse_csv(source)
+
+    raise ValueError(f"Invalid format '{import_format}'. Must be one of: {list(IMPORT_FORMATS)}")
+
+########## Import ##########
+# Trả về (data hợp lệ, [(số thứ tự row, lỗi)])
+def validate_rows(validator, chunk):
+    valid = []
+    errors = []
+
+    for number, data in chunk:
+        if isinstance(data, ValueError):
+            errors.append((number, {"non_field_errors": [str(data)]}))
+            continue
+
+        if not isinstance(data, dict):
+            errors.append((number, {"non_field_errors": ["Expected an object"]}))
+            continue
+
+        try:
+            valid.append((number, validator.run_validation(data)))
+        except serializers.ValidationError as exc:
+            errors.append((number, exc.detail))
+
+    # Tất cả category_ids của chunk trong 1 query
+    category_ids = {category_id for _, data in valid for category_id in data["category_ids"]}
+    existing_ids = set(Category.objects.filter(id__in=category_ids).values_list("id", flat=True))
+
+    rows = []
+
+    for number, data in valid:
+        invalid_ids = [str(category_id) for category_id in data["category_ids"] if category_id not in existing_ids]
+
+        if invalid_ids:
+            errors.append((number, {"category_ids": {
+                "message": "These category_ids do not exist",
+                "invalid_ids": invalid_ids
+            }}))
+        else:
+            rows.append(data)
+
+    return rows, sorted(errors, key=lambda error: error[0])
+
+def create_rows(rows):
+    products = []
+    links = []
+    category_links = []
+    Through = Product.categories.through
+
+    for data in rows:
+        category_ids = data.pop("category_ids")
+        product = Product(**data)
+        products.append(product)
+
+        # id (uuid7) có sẵn từ lúc khởi tạo, không cần đọc lại sau khi insert
+        category_ids = list(dict.fromkeys(category_ids))
+        links.extend(Through(product_id=product.id, category_id=category_id) for category_id in category_ids)
+        category_links.extend(link_rows(product, category_ids))
+
+    with transaction.atomic():
+        Product.objects.bulk_create(products)
+        Through.objects.bulk_create(links)
+        CategoryProduct.objects.bulk_create(category_links)
+
+    return len(products), {link.category_id for link in category_links}
+
+# rows: iterable các dict (đã parse), trả về kết quả giống response của API
+def import_products(rows, chunk_size=None, dry_run=False):
+    chunk_size = chunk_size or get_chunk_size()
+    validator = ProductImportSerializer()
+    numbered = enumerate(rows, start=1)
+
+    total = created = failed = 0
+    errors = []
+    category_ids = set()
+
+    try:
+        while True:
+            chunk = list(islice(numbered, chunk_size))
+
+            if not chunk:
+                break
+
+            valid, chunk_errors = validate_rows(validator, chunk)
+
+            if valid and not dry_run:
+                count, chunk_category_ids = create_rows(valid)
+                created += count
+                category_ids |= chunk_category_ids
+
+            total += len(chunk)
+            failed += len(chunk_errors)
+
+            # Chỉ giữ số lỗi cần trả về, còn lại chỉ đếm
+            errors.extend(chunk_errors[:MAX_REPORTED_ERRORS - len(errors)])
+    finally:
+        if created:
+            invalidate_counts(Product)
+            invalidate_category_counts(category_ids)
+            product_search_index.invalidate()
+
+    return {
+        "total": total,
+        "created": created,
+        "failed": failed,
+        "errors": [{"row": number, "errors": detail} for number, detail in errors],
+    }
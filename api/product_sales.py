@@ -0,0 +1,134 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value, IntegerField, DecimalField
+from django.db.models.functions import Coalesce
+from .models import OrderItem, Product, ProductSalesDelta
+from .constants import OrderStatus
+from .order_totals import line_total, ZERO
+
+# Số lượng / doanh thu đã bán của từng product, dùng cho best sellers và ?sort= của /products
+# - Checkout / sửa order / đổi status chỉ INSERT các row ProductSalesDelta (không UPDATE product)
+#   => nhiều order cùng mua 1 product không phải chờ khóa row của product đó
+# - flush_product_sales (chạy định kỳ, vd. cron mỗi phút) gộp delta theo product:
+#   mỗi batch 1 câu UPDATE / product + 1 DELETE, counter trễ tối đa 1 chu kỳ flush
+# - Order bị hủy (canceled) không tính vào doanh số
+
+def get_flush_batch_size():
+    return getattr(settings, "PRODUCT_SALES_FLUSH_BATCH_SIZE", 5000)
+
+def counts_as_sale(status):
+    return status != OrderStatus.CANCELED
+
+# items: list (product, quantity, price) -> {product_id: [số lượng, doanh thu]}
+def item_sales(items):
+    sales = {}
+
+    for product, quantity, price in items:
+        sale = sales.setdefault(product.id, [0, ZERO])
+        sale[0] += quantity
+        sale[1] += line_total(quantity, price)
+
+    return sales
+
+# Doanh số hiện tại của các order, 1 query GROUP BY product
+def order_item_sales(order_ids):
+    rows = OrderItem.objects.filter(order_id__in=order_ids, product__isnull=False).values("product").annotate(
+        units=Sum("quantity"), revenue=Sum("sub_total")
+    ).order_by()
+
+    return {row["product"]: [row["units"], row["revenue"]] for row in rows}
+
+# after - before, theo product
+def diff_sales(after, before):
+    sales = {product_id: list(sale) for product_id, sale in after.items()}
+
+    for product_id, (units, revenue) in before.items():
+        sale = sales.setdefault(product_id, [0, ZERO])
+        sale[0] -= units
+        sale[1] -= revenue
+
+    return sales
+
+def negate_sales(sales):
+    return {product_id: [-units, -revenue] for product_id, (units, revenue) in sales.items()}
+
+# 1 câu INSERT cho tất cả product
+def record_sales(sales):
+    deltas = [
+        ProductSalesDelta(product_id=product_id, quantity=units, revenue=revenue)
+        for product_id, (units, revenue) in sales.items()
+        if units or revenue
+    ]
+
+    if deltas:
+        ProductSalesDelta.objects.bulk_create(deltas)
+
+# Cộng dồn 1 batch delta vào product, trả về số delta đã xử lý
+# skip_locked: nhiều worker flush cùng lúc không cộng trùng 1 delta (SQLite bỏ qua FOR UPDATE)
+def flush_batch(batch_size):
+    with transaction.atomic():
+        delta_ids = list(
+            ProductSalesDelta.objects.select_for_update(skip_locked=True).order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+
+        if not delta_ids:
+            return 0
+
+        totals = ProductSalesDelta.objects.filter(id__in=delta_ids).values("product").annotate(
+            units=Sum("quantity"), revenue=Sum("revenue")
+        ).order_by("product")
+
+        # Theo thứ tự product id để các worker khóa row product cùng thứ tự
+        for row in totals:
+            if row["units"] or row["revenue"]:
+                Product.objects.filter(pk=row["product"]).update(
+                    units_sold=F("units_sold") + row["units"], revenue=F("revenue") + row["revenue"]
+                )
+
+        ProductSalesDelta.objects.filter(id__in=delta_ids).delete()
+
+    return len(delta_ids)
+
+def flush_product_sales(batch_size=None):
+    batch_size = batch_size or get_flush_batch_size()
+    flushed = 0
+
+    while True:
+        count = flush_batch(batch_size)
+        flushed += count
+
+        if count < batch_size:
+            return flushed
+
+# Tính lại counter từ order item (bỏ order canceled), xóa toàn bộ delta chưa flush
+def rebuild_product_sales(batch_size=1000):
+    items = OrderItem.objects.filter(product=OuterRef("pk")).exclude(order__status=OrderStatus.CANCELED) \
+        .values("product").order_by()
+
+    units = Subquery(items.annotate(units=Sum("quantity")).values("units"))
+    revenue = Subquery(items.annotate(revenue=Sum("sub_total")).values("revenue"))
+
+    updated = 0
+    last_pk = None
+
+    with transaction.atomic():
+        ProductSalesDelta.objects.all().delete()
+
+        # Mỗi batch product (theo pk) 1 câu UPDATE
+        while True:
+            products = Product.objects.order_by("pk")
+
+            if last_pk is not None:
+                products = products.filter(pk__gt=last_pk)
+
+            chunk = list(products.values_list("pk", flat=True)[:batch_size])
+
+            if not chunk:
+                return updated
+
+            last_pk = chunk[-1]
+            updated += Product.objects.filter(pk__in=chunk).update(
+                units_sold=Coalesce(units, Value(0), output_field=IntegerField()),
+                revenue=Coalesce(revenue, Value(ZERO), output_field=DecimalField(max_digits=16, decimal_places=2)),
+            )
@@ -0,0 +1,328 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.decorators import sync_and_async_middleware
+from .metrics_access import can_read_metrics
+
+# Đo từng request theo URL pattern (route trong django_shop/urls.py):
+# - wall time, DB time + số query (execute_wrapper gắn vào mọi connection, xem signals.py)
+# - query lặp lại trong 1 request (N+1): cùng fingerprint >= PROFILING_DUPLICATE_THRESHOLD lần
+# - thời gian serialize (DRF serializer + fast_serializers), không tính thời gian query bên trong
+# Kết quả: header Server-Timing của response + GET /metrics (Prometheus text format)
+# Server-Timing lộ số query / thời gian DB: chỉ gắn cho request được đọc /metrics (xem metrics_access.py)
+# Số liệu giữ trong memory của từng process (mỗi worker 1 bộ), Prometheus cộng lại theo instance
+# Chi phí: ~2 perf_counter + 1 dict lookup / query, 1 lock / request
+# DB time chỉ tính cursor.execute(), không tính fetch; response stream chỉ đo tới lúc view trả về
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Số fingerprint N+1 giữ lại mỗi endpoint
+MAX_FINGERPRINTS_PER_ENDPOINT = 50
+
+UNMATCHED_ENDPOINT = "<unmatched>"
+
+# Label method chỉ nhận các giá trị này, method khác (HEAD, OPTIONS, tự đặt) gộp vào "other"
+METRIC_METHODS = ("GET", "POST", "PATCH", "PUT", "DELETE")
+
+logger = logging.getLogger(__name__)
+
+def is_enabled():
+    return getattr(settings, "PROFILING_ENABLED", True)
+
+def get_duplicate_threshold():
+    return getattr(settings, "PROFILING_DUPLICATE_THRESHOLD", 3)
+
+def server_timing_enabled():
+    return getattr(settings, "PROFILING_SERVER_TIMING", True)
+
+########## Profile của 1 request ##########
+class RequestProfile:
+    __slots__ = ("started", "queries", "db_time", "serializer_time", "serializer_depth", "fingerprints")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.fingerprints = Counter()
+
+    # {fingerprint: số lần} của các query chạy >= threshold lần
+    def duplicates(self, threshold=None):
+        threshold = threshold or get_duplicate_threshold()
+        return {sql: count for sql, count in self.fingerprints.items() if count >= threshold}
+
+current_profile = ContextVar("current_profile", default=None)
+
+# Dùng ngoài request (test, benchmark): with profiled() as profile: ...
+@contextmanager
+def profiled():
+    profile = RequestProfile()
+    token = current_profile.set(profile)
+
+    try:
+        yield profile
+    finally:
+        current_profile.reset(token)
+
+########## Query ##########
+IN_LIST = re.compile(r"\((?:%s, )*%s\)")
+VALUES_LIST = re.compile(r"(\((?:%s(?:, )?)+\))(?:, \((?:%s(?:, )?)+\))+")
+NUMBER = re.compile(r"\b\d+\b")
+
+# SQL của Django đã tách params (%s), chỉ cần gộp IN (...) / VALUES (...) có độ dài khác nhau
+# và số LIMIT / OFFSET / tên savepoint; cache theo câu SQL vì số câu SQL khác nhau có hạn
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    sql = VALUES_LIST.sub(r"\1, ...", sql)
+    sql = IN_LIST.sub("(%s, ...)", sql)
+    return NUMBER.sub("?", sql)
+
+def profile_query(execute, sql, params, many, context):
+    profile = current_profile.get()
+
+    if profile is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.db_time += time.perf_counter() - started
+        profile.queries += 1
+        profile.fingerprints[fingerprint(sql)] += 1
+
+def install_query_hook(connection):
+    if profile_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(profile_query)
+
+########## Serializer ##########
+# Lồng nhau (serializer con, fast_serializers gọi nhau) chỉ tính ở lớp ngoài cùng
+@contextmanager
+def serializer_timer():
+    profile = current_profile.get()
+
+    if profile is None:
+        yield
+        return
+
+    profile.serializer_depth += 1
+    started = time.perf_counter()
+    db_time = profile.db_time
+
+    try:
+        yield
+    finally:
+        profile.serializer_depth -= 1
+
+        # Bỏ thời gian query chạy bên trong (vd. query category của serialize_products)
+        if not profile.serializer_depth:
+            profile.serializer_time += time.perf_counter() - started - (profile.db_time - db_time)
+
+def timed_serializer(func):
+    if iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with serializer_timer():
+                return await func(*args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with serializer_timer():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+# Cho DRF serializer: ListSerializer gọi to_representation của serializer con cho từng row
+class SerializerTimingMixin:
+    def to_representation(self, instance):
+        with serializer_timer():
+            return super().to_representation(instance)
+
+########## Metrics ##########
+class EndpointMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            # (endpoint, method, status) -> số request
+            self.requests = Counter()
+            # endpoint -> [count, wall, db, queries, serializer, request có N+1, buckets]
+            self.endpoints = {}
+            # endpoint -> {hash của fingerprint: số lần chạy trong các request bị N+1}
+            self.duplicates = {}
+
+    def record(self, endpoint, method, status, wall_time, profile, duplicates):
+        bucket = bisect_left(DURATION_BUCKETS, wall_time)
+        method = method if method in METRIC_METHODS else "other"
+        new_queries = []
+
+        with self.lock:
+            self.requests[(endpoint, method, status)] += 1
+
+            stats = self.endpoints.get(endpoint)
+
+            if stats is None:
+                stats = self.endpoints[endpoint] = [0, 0.0, 0.0, 0, 0.0, 0, [0] * (len(DURATION_BUCKETS) + 1)]
+
+            stats[0] += 1
+            stats[1] += wall_time
+            stats[2] += profile.db_time
+            stats[3] += profile.queries
+            stats[4] += profile.serializer_time
+            stats[6][bucket] += 1
+
+            if duplicates:
+                stats[5] += 1
+                fingerprints = self.duplicates.setdefault(endpoint, Counter())
+
+                for sql, count in duplicates.items():
+                    key = query_hash(sql)
+
+                    if key in fingerprints:
+                        fingerprints[key] += count
+                    elif len(fingerprints) < MAX_FINGERPRINTS_PER_ENDPOINT:
+                        fingerprints[key] = count
+                        new_queries.append((key, sql))
+
+        # /metrics chỉ có hash: câu SQL ghi vào log 1 lần (mỗi endpoint, mỗi process) để tra theo hash
+        for key, sql in new_queries:
+            logger.info("Repeated query", extra={"fingerprint": key, "sql": sql[:2000]})
+
+    def snapshot(self):
+        with self.lock:
+            return (
+                dict(self.requests),
+                {endpoint: stats[:6] + [list(stats[6])] for endpoint, stats in self.endpoints.items()},
+                {endpoint: dict(fingerprints) for endpoint, fingerprints in self.duplicates.items()},
+            )
+
+metrics = EndpointMetrics()
+
+def query_hash(sql):
+    return hashlib.md5(sql.encode()).hexdigest()[:12]
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def labels(**values):
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in values.items()) + "}"
+
+def render_prometheus():
+    requests, endpoints, duplicates = metrics.snapshot()
+    lines = []
+
+    def metric(name, metric_type, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.extend(f"{name}{label} {value}" for label, value in samples)
+
+    metric("shop_http_requests_total", "counter", "Requests per endpoint, method and status", [
+        (labels(endpoint=endpoint, method=method, status=status), count)
+        for (endpoint, method, status), count in sorted(requests.items())
+    ])
+
+    histogram = []
+
+    for endpoint, stats in sorted(endpoints.items()):
+        cumulative = 0
+
+        for bound, count in zip(DURATION_BUCKETS + ("+Inf",), stats[6]):
+            cumulative += count
+            histogram.append((f"_bucket{labels(endpoint=endpoint, le=bound)}", cumulative))
+
+        histogram.append((f"_sum{labels(endpoint=endpoint)}", f"{stats[1]:.6f}"))
+        histogram.append((f"_count{labels(endpoint=endpoint)}", stats[0]))
+
+    metric("shop_http_request_duration_seconds", "histogram", "Wall time per endpoint", histogram)
+
+    for name, index, help_text, fmt in (
+        ("shop_db_seconds_total", 2, "Time spent executing SQL per endpoint", "{:.6f}"),
+        ("shop_db_queries_total", 3, "SQL queries executed per endpoint", "{}"),
+        ("shop_serializer_seconds_total", 4, "Time spent serializing (excluding SQL) per endpoint", "{:.6f}"),
+        ("shop_duplicate_query_requests_total", 5, "Requests that repeated one query (N+1) per endpoint", "{}"),
+    ):
+        metric(name, "counter", help_text, [
+            (labels(endpoint=endpoint), fmt.format(stats[index])) for endpoint, stats in sorted(endpoints.items())
+        ])
+
+    metric("shop_duplicate_queries_total", "counter", "Executions of repeated query fingerprints (N+1)", [
+        (labels(endpoint=endpoint, fingerprint=key), count)
+        for endpoint, fingerprints in sorted(duplicates.items())
+        for key, count in sorted(fingerprints.items(), key=lambda item: -item[1])
+    ])
+
+    return "\n".join(lines) + "\n"
+
+########## Middleware ##########
+def endpoint_name(request):
+    match = getattr(request, "resolver_match", None)
+    return f"/{match.route}" if match is not None else UNMATCHED_ENDPOINT
+
+def server_timing(wall_time, profile, duplicates):
+    description = f"{profile.queries} queries"
+
+    if duplicates:
+        description += f", {sum(duplicates.values())} repeated"
+
+    return (
+        f'total;dur={wall_time * 1000:.1f}, '
+        f'db;dur={profile.db_time * 1000:.1f};desc="{description}", '
+        f'serialize;dur={profile.serializer_time * 1000:.1f}'
+    )
+
+def finish(request, response, profile):
+    wall_time = time.perf_counter() - profile.started
+    duplicates = profile.duplicates()
+
+    metrics.record(endpoint_name(request), request.method, response.status_code, wall_time, profile, duplicates)
+
+    if server_timing_enabled() and can_read_metrics(request):
+        response["Server-Timing"] = server_timing(wall_time, profile, duplicates)
+
+    return response
+
+@sync_and_async_middleware
+def profiling_middleware(get_response):
+    if not is_enabled():
+        raise MiddlewareNotUsed()
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            profile = RequestProfile()
+            token = current_profile.set(profile)
+
+            try:
+                response = await get_response(request)
+            finally:
+                current_profile.reset(token)
+
+            return finish(request, response, profile)
+    else:
+        def middleware(request):
+            profile = RequestProfile()
+            token = current_profile.set(profile)
+
+            try:
+                response = get_response(request)
+            finally:
+                current_profile.reset(token)
+
+            return finish(request, response, profile)
+
+    return middleware
@@ -0,0 +1,80 @@
+from functools import lru_cache
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# orjson / msgspec là optional: pip install orjson
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Encoder cho JSON response, chọn bằng REST_FRAMEWORK["JSON_RENDERER_BACKEND"]:
+# - "auto" (mặc định): orjson -> msgspec -> json (stdlib) tùy package nào đã cài
+# - "orjson" / "msgspec" / "json": bắt buộc dùng encoder đó
+# Output giống JSONRenderer của DRF (compact, UTF-8, escape \u2028 / \u2029):
+# - orjson: datetime / Decimal / lazy str... đi qua JSONEncoder.default của DRF, UUID encode sẵn
+# - msgspec: UUID / datetime / Decimal encode sẵn, Decimal ra số giữ nguyên chữ số ("12.50")
+#   thay vì float như DRF. Serializer của API đã đổi Decimal / datetime sang str nên không ảnh hưởng
+JSON_BACKENDS = ("auto", "orjson", "msgspec", "json")
+
+drf_default = JSONEncoder().default
+
+ENCODE_ERRORS = (TypeError, ValueError) + ((msgspec.EncodeError,) if msgspec is not None else ())
+
+def orjson_dumps():
+    return lambda data: orjson.dumps(data, default=drf_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+def msgspec_dumps():
+    return msgspec.json.Encoder(enc_hook=drf_default, decimal_format="number").encode
+
+@lru_cache(maxsize=None)
+def get_json_dumps(backend):
+    if backend not in JSON_BACKENDS:
+        raise ImproperlyConfigured(f"Invalid JSON_RENDERER_BACKEND '{backend}'. Must be one of: {list(JSON_BACKENDS)}")
+
+    if backend in ("auto", "orjson") and orjson is not None:
+        return "orjson", orjson_dumps()
+
+    if backend in ("auto", "msgspec") and msgspec is not None:
+        return "msgspec", msgspec_dumps()
+
+    if backend not in ("auto", "json"):
+        raise ImproperlyConfigured(f"JSON_RENDERER_BACKEND '{backend}' is not installed")
+
+    return "json", None
+
+def get_json_backend():
+    return getattr(settings, "REST_FRAMEWORK", {}).get("JSON_RENDERER_BACKEND", "auto")
+
+class FastJSONRenderer(JSONRenderer):
+    # None = lấy theo settings, benchmark_renderers gán trực tiếp để so sánh từng encoder
+    backend = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        _, dumps = get_json_dumps(self.backend or get_json_backend())
+
+        # Pretty print (?indent / Browsable API) hoặc setting JSON khác mặc định -> để DRF render
+        if dumps is None or not self.compact or self.ensure_ascii \
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = dumps(data)
+        except ENCODE_ERRORS:
+            # Kiểu encoder nhanh không hỗ trợ (int > 64 bit, key không phải str...)
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+def render_json(data):
+    return FastJSONRenderer().render(data)
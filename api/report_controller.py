@@ -0,0 +1,123 @@
+import logging
+import uuid
+from datetime import date
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from .models import OrderDailyStat
+from .constants import OrderStatus
+from .fast_serializers import format_money
+
+logger = logging.getLogger(__name__)
+
+# Report order đọc từ rollup OrderDailyStat (xem order_stats.py), không quét Order / OrderItem
+# group_by: các cột để nhóm, cách nhau bằng dấu phẩy (mặc định day,status,payment_method)
+REPORT_GROUPS = ("day", "month", "status", "payment_method")
+
+DEFAULT_REPORT_GROUP_BY = ["day", "status", "payment_method"]
+
+def parse_group_by(value):
+    if not value:
+        return DEFAULT_REPORT_GROUP_BY
+
+    group_by = list(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    invalid = [name for name in group_by if name not in REPORT_GROUPS]
+
+    if invalid or ("day" in group_by and "month" in group_by):
+        raise ValueError(f"Invalid group_by '{value}'. Must be a list of: {list(REPORT_GROUPS)} (day or month)")
+
+    return group_by
+
+def parse_date(value, name):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name} '{value}'. Must be YYYY-MM-DD")
+
+def format_report_row(row, group_by):
+    data = {}
+
+    for name in group_by:
+        value = row[name]
+
+        if name == "day":
+            value = value.isoformat()
+        elif name == "month":
+            value = value.strftime("%Y-%m")
+        elif name == "payment_method" and value is not None:
+            value = str(value)
+
+        data[name] = value
+
+    data["order_count"] = row["total_orders"]
+    data["revenue"] = format_money(row["total_revenue"])
+
+    return data
+
+# GET /reports/orders?from=2025-01-01&to=2025-01-31&status=paid&payment_method=<id>&group_by=day,status
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_order_report(request):
+    try:
+        params = request.GET
+        queryset = OrderDailyStat.objects.order_by()
+
+        group_by = parse_group_by(params.get("group_by", None))
+
+        if params.get("from"):
+            queryset = queryset.filter(day__gte=parse_date(params["from"], "from"))
+
+        if params.get("to"):
+            queryset = queryset.filter(day__lte=parse_date(params["to"], "to"))
+
+        status_param = params.get("status", None)
+
+        if status_param:
+            if status_param not in OrderStatus.values:
+                raise ValueError(f"Invalid status '{status_param}'. Must be one of: {OrderStatus.values}")
+
+            queryset = queryset.filter(status=status_param)
+
+        payment_method_param = params.get("payment_method", None)
+
+        if payment_method_param:
+            try:
+                queryset = queryset.filter(payment_method=uuid.UUID(payment_method_param))
+            except ValueError:
+                raise ValueError(f"Invalid payment method '{payment_method_param}'")
+
+        if "month" in group_by:
+            queryset = queryset.annotate(month=TruncMonth("day"))
+
+        # 1 câu GROUP BY trên bảng rollup, vài row / ngày
+        # Bucket không còn order (order đã chuyển sang status khác) bị bỏ qua
+        rows = list(queryset.values(*group_by).annotate(
+            total_orders=Sum("order_count"), total_revenue=Sum("revenue")
+        ).filter(total_orders__gt=0).order_by(*group_by))
+
+        return Response({
+            "success": True,
+            "summary": {
+                "order_count": sum(row["total_orders"] for row in rows),
+                "revenue": format_money(sum((row["total_revenue"] for row in rows), 0)),
+            },
+            "data": [format_report_row(row, group_by) for row in rows]
+        }, status=status.HTTP_200_OK)
+
+    except ValueError as ve:
+        return Response({
+            "success": False,
+            "message": "Invalid params",
+            "error": str(ve)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    except Exception:
+        logger.exception("Error in get_order_report")
+
+        return Response({
+            "success": False,
+            "message": "Something wrong",
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
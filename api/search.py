@@ -0,0 +1,150 @@
+import heapq
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, When, Value, IntegerField
+from django.db.models.expressions import RawSQL
+from .models import Product
+from .catalog_cache import get_catalog_version, invalidate_catalog
+
+# Tìm kiếm sản phẩm theo `q` (name + description)
+# - MySQL: FULLTEXT index (migration 0010), MATCH ... AGAINST ở BOOLEAN MODE,
+#   mỗi từ trong q phải khớp tiền tố của 1 từ trong sản phẩm ("coca co" -> +coca* +co*)
+# - DB khác (SQLite khi test / dev): inverted index giữ trong process, cùng ngữ nghĩa
+#   + chỉ lấy SEARCH_MAX_RESULTS sản phẩm có score cao nhất => id__in / CASE có kích thước giới hạn
+#   + index gắn với catalog version của Product (xem catalog_cache.py), version đổi thì build lại,
+#     cache chung (REDIS_URL) => thay đổi ở process nào thì mọi process đều build lại
+# Kết quả được annotate `relevance` và sắp xếp theo relevance giảm dần
+
+NAME_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+
+def get_max_results():
+    return getattr(settings, "SEARCH_MAX_RESULTS", 1000)
+
+def tokenize(text):
+    return re.findall(r"\w+", (text or "").lower())
+
+def fulltext_search(queryset, terms):
+    connection = connections[queryset.db]
+    table = connection.ops.quote_name(Product._meta.db_table)
+
+    # terms chỉ gồm \w nên không chứa toán tử của BOOLEAN MODE
+    boolean_query = " ".join(f"+{term}*" for term in terms)
+
+    relevance = RawSQL(
+        f"MATCH ({table}.`name`, {table}.`description`) AGAINST (%s IN BOOLEAN MODE)",
+        [boolean_query]
+    )
+
+    return queryset.annotate(relevance=relevance).filter(relevance__gt=0).order_by('-relevance', 'id')
+
+
+class ProductSearchIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.postings = None  # token -> {product_id: weight}
+        self.sorted_tokens = []
+        # Catalog version của Product lúc build
+        self.version = None
+
+    # Gọi khi Product thay đổi: đổi version chung, index của mọi process build lại ở lần search sau
+    def invalidate(self):
+        invalidate_catalog(Product)
+
+    def build(self, using):
+        postings = defaultdict(dict)
+        rows = Product.objects.using(using).values_list('id', 'name', 'description')
+
+        for product_id, name, description in rows.iterator():
+            for weight, text in ((NAME_WEIGHT, name), (DESCRIPTION_WEIGHT, description)):
+                for token in tokenize(text):
+                    postings[token][product_id] = postings[token].get(product_id, 0) + weight
+
+        self.postings = postings
+        self.sorted_tokens = sorted(postings)
+
+    # Các token trong index bắt đầu bằng `prefix`
+    def expand(self, prefix):
+        start = bisect_left(self.sorted_tokens, prefix)
+
+        for token in self.sorted_tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            yield token
+
+    # Trả về {product_id: score} của các sản phẩm khớp tất cả các từ
+    def search(self, terms, using='default'):
+        version = get_catalog_version(Product)
+
+        with self.lock:
+            if self.postings is None or self.version != version:
+                self.build(using)
+                self.version = version
+
+            scores = None
+
+            for term in terms:
+                term_scores = defaultdict(int)
+
+                for token in self.expand(term):
+                    for product_id, weight in self.postings[token].items():
+                        term_scores[product_id] += weight
+
+                if scores is None:
+                    scores = dict(term_scores)
+                else:
+                    scores = {
+                        product_id: score + term_scores[product_id]
+                        for product_id, score in scores.items()
+                        if product_id in term_scores
+                    }
+
+                if not scores:
+                    return {}
+
+            return scores or {}
+
+
+product_search_index = ProductSearchIndex()
+
+# `limit` sản phẩm score cao nhất (cùng score thì id nhỏ trước, giống order_by của queryset)
+def top_scores(scores, limit):
+    if len(scores) <= limit:
+        return scores
+
+    return dict(heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0])))
+
+def inverted_index_search(queryset, terms):
+    scores = top_scores(product_search_index.search(terms, queryset.db), get_max_results())
+
+    if not scores:
+        return queryset.none()
+
+    # Gom theo score để CASE chỉ có vài nhánh thay vì 1 nhánh / sản phẩm
+    buckets = defaultdict(list)
+
+    for product_id, score in scores.items():
+        buckets[score].append(product_id)
+
+    relevance = Case(
+        *[When(id__in=ids, then=Value(score)) for score, ids in buckets.items()],
+        default=Value(0),
+        output_field=IntegerField()
+    )
+
+    return queryset.filter(id__in=list(scores)).annotate(relevance=relevance).order_by('-relevance', 'id')
+
+def search_products(queryset, q):
+    terms = tokenize(q)
+
+    if not terms:
+        return queryset.none()
+
+    if connections[queryset.db].vendor == 'mysql':
+        return fulltext_search(queryset, terms)
+
+    return inverted_index_search(queryset, terms)
@@ -1,12 +1,14 @@
 from rest_framework import serializers
+from django.db.models import Prefetch
 from .models import Product, Category, User, PaymentMethod, Order, OrderItem
+from .profiling import SerializerTimingMixin
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SerializerTimingMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name', 'is_active']
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     # Dùng để hiển thị nested data khi GET (read_only)
     categories = CategorySerializer(many=True, read_only=True)
 
@@ -19,6 +21,11 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = ['id', 'name', 'price', 'description', 'categories', 'category_ids', 'is_active']
 
+    # Load trước các relation mà serializer sẽ đọc để tránh N+1 query
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.prefetch_related('categories')
+
     # Hàm này tự trigger khi serializer.is_valid() chạy ở product_controller
     def validate_category_ids(self, value):
         # Lấy danh sách ID của các category hiện có
@@ -59,7 +66,16 @@ class ProductSerializer(serializers.ModelSerializer):
 
         return instance
     
-class UserSerializer(serializers.ModelSerializer):
+# Validate từng row của bulk import (xem product_import.py)
+# Không có validate_category_ids: category của cả chunk được kiểm tra bằng 1 query
+class ProductImportSerializer(SerializerTimingMixin, serializers.ModelSerializer):
+    category_ids = serializers.ListField(child=serializers.UUIDField())
+
+    class Meta:
+        model = Product
+        fields = ['name', 'price', 'description', 'category_ids', 'is_active']
+
+class UserSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'password', 'name', 'is_active']
@@ -67,27 +83,30 @@ class UserSerializer(serializers.ModelSerializer):
             'password': {'write_only': True}
         }
 
-class PaymentMethodSerializer(serializers.ModelSerializer):
+class PaymentMethodSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     class Meta:
         model = PaymentMethod
         fields = ['id', 'key', 'name', 'is_active']
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     # Dùng để hiển thị nested data khi GET (read_only)
     product = ProductSerializer(many=False, read_only=True)
     sub_total = serializers.DecimalField(
         max_digits=12,
         decimal_places=2,
-        source='subtotal',  # lấy từ @property
-        read_only=True
+        read_only=True  # cột do DB tính (GeneratedField)
     )
 
     class Meta:
         model = OrderItem
         fields = ['id', 'product', 'quantity', 'price', 'sub_total']
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('product').prefetch_related('product__categories')
+
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     # Dùng để hiển thị nested data khi GET (read_only)
     user = UserSerializer(many=False, read_only=True)
     payment_method = PaymentMethodSerializer(many=False, read_only=True)
@@ -107,4 +126,15 @@ class OrderSerializer(serializers.ModelSerializer):
             'updated_at',
             'items',
         ]
-        read_only_fields = ['total_amount', 'created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['total_amount', 'created_at', 'updated_at']
+
+    # user, payment_method: JOIN trong cùng 1 query
+    # items -> product -> categories: mỗi tầng thêm 1 query cho cả page
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('user', 'payment_method').prefetch_related(
+            Prefetch(
+                'items',
+                queryset=OrderItemSerializer.setup_eager_loading(OrderItem.objects.all())
+            )
+        )
@@ -0,0 +1,139 @@
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete, m2m_changed
+from django.dispatch import receiver
+from .models import Product, Order, Category, PaymentMethod, User
+from .counting import invalidate_counts
+from .catalog_cache import invalidate_catalog
+from .user_cache import user_cache
+from .snapshots import cleared_snapshot, embedded_changed
+from .profiling import install_query_hook
+from .db.pool import return_connections
+from .category_products import add_links, remove_links, sync_product, invalidate_category_counts
+
+# Product / Order thay đổi -> bỏ cache tổng số row của API list
+# Bỏ cache sau khi commit: bỏ trước commit thì request khác có thể đếm lại dữ liệu cũ và cache
+# dưới version mới cho tới hết timeout (ngoài transaction thì on_commit chạy ngay)
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Order)
+def invalidate_list_counts(sender, **kwargs):
+    transaction.on_commit(lambda: invalidate_counts(sender), using=kwargs.get("using"))
+
+# Product: version dùng cho inverted index của search (xem search.py)
+# Sau khi commit, cùng lý do như invalidate_list_counts
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=PaymentMethod)
+def invalidate_catalog_cache(sender, **kwargs):
+    transaction.on_commit(lambda: invalidate_catalog(sender), using=kwargs.get("using"))
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    user_cache.invalidate_user(instance.id)
+
+# Order snapshot (xem snapshots.py): mọi lần save order đều phải render lại
+@receiver(pre_save, sender=Order)
+def clear_order_snapshot(sender, instance, **kwargs):
+    instance.snapshot = None
+
+# Dữ liệu nằm trong snapshot thay đổi -> bỏ snapshot của các order liên quan
+# Dùng pre_delete vì sau khi xóa, FK của order / item đã bị SET_NULL
+def clear_snapshots(**filters):
+    # Cả order đang NULL cũng tăng version: có thể đang được render lại từ dữ liệu cũ
+    Order.objects.filter(**filters).update(**cleared_snapshot())
+
+# Save chỉ đổi cột không có trong snapshot (vd. units_sold / revenue) thì giữ snapshot
+# So với row hiện tại trước khi save, bỏ snapshot ở post_save (sau khi đã ghi dữ liệu mới)
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=PaymentMethod)
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=Category)
+def track_embedded_changes(sender, instance, update_fields=None, **kwargs):
+    instance.snapshot_changed = not instance._state.adding and embedded_changed(instance, update_fields)
+
+def snapshot_changed(instance, created, signal):
+    return signal is pre_delete or (not created and getattr(instance, "snapshot_changed", True))
+
+@receiver([post_save, pre_delete], sender=User)
+def clear_user_order_snapshots(sender, instance, signal, created=False, **kwargs):
+    if snapshot_changed(instance, created, signal):
+        clear_snapshots(user=instance)
+
+@receiver([post_save, pre_delete], sender=PaymentMethod)
+def clear_payment_method_order_snapshots(sender, instance, signal, created=False, **kwargs):
+    if snapshot_changed(instance, created, signal):
+        clear_snapshots(payment_method=instance)
+
+@receiver([post_save, pre_delete], sender=Product)
+def clear_product_order_snapshots(sender, instance, signal, created=False, **kwargs):
+    if snapshot_changed(instance, created, signal):
+        clear_snapshots(items__product=instance)
+
+@receiver([post_save, pre_delete], sender=Category)
+def clear_category_order_snapshots(sender, instance, signal, created=False, **kwargs):
+    if snapshot_changed(instance, created, signal):
+        clear_snapshots(items__product__categories=instance)
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def clear_product_categories_order_snapshots(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+
+    if not reverse:
+        clear_snapshots(items__product=instance)
+    elif pk_set:
+        # instance là category, pk_set là các product được thêm / bỏ
+        clear_snapshots(items__product__in=pk_set)
+    else:
+        clear_snapshots(items__product__categories=instance)
+
+
+# Bảng category_product (xem category_products.py)
+@receiver(m2m_changed, sender=Product.categories.through)
+def sync_category_links(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "post_add" and pk_set:
+        if reverse:
+            add_links(pk_set, [instance.id])
+        else:
+            add_links([instance.id], pk_set)
+
+    elif action == "post_remove" and pk_set:
+        if reverse:
+            remove_links(product_ids=pk_set, category_ids=[instance.id])
+        else:
+            remove_links(product_ids=[instance.id], category_ids=pk_set)
+
+    elif action == "post_clear":
+        if reverse:
+            remove_links(category_ids=[instance.id])
+        else:
+            remove_links(product_ids=[instance.id])
+
+@receiver(post_save, sender=Product)
+def sync_category_link_product(sender, instance, created, **kwargs):
+    # Product mới chưa có category, link được tạo ở m2m_changed
+    if not created:
+        sync_product(instance)
+
+# Link bị xóa theo CASCADE, chỉ cần bỏ cache count của các category
+@receiver(pre_delete, sender=Product)
+def invalidate_product_category_counts(sender, instance, **kwargs):
+    invalidate_category_counts(instance.category_links.values_list("category_id", flat=True))
+
+@receiver(post_delete, sender=Category)
+def invalidate_deleted_category_counts(sender, instance, **kwargs):
+    invalidate_category_counts([instance.id])
+
+
+# Đo query của request (xem profiling.py): gắn execute_wrapper cho mọi connection mới,
+# kể cả connection của thread sync_to_async khi chạy async view
+@receiver(connection_created)
+def install_profiling_query_hook(sender, connection, **kwargs):
+    install_query_hook(connection)
+
+# Pool connection (xem db/pool.py): request xong thì trả connection về pool, thread không giữ connection khi rảnh
+# Đăng ký sau close_old_connections của Django: connection lỗi / quá CONN_MAX_AGE đã được đóng trước đó
+@receiver(request_finished)
+def return_pooled_connections(sender, **kwargs):
+    return_connections()
@@ -0,0 +1,121 @@
+from asgiref.sync import sync_to_async
+from django.db.models import Case, F, Q, TextField, Value, When
+from .db.router import pin_to_primary
+from .models import Category, Order, PaymentMethod, Product, User
+from .renderers import render_json
+from .fast_serializers import order_values, serialize_orders
+from .serializers import CategorySerializer, PaymentMethodSerializer, ProductSerializer, UserSerializer
+
+# Read model của order: JSON đã render sẵn của OrderSerializer lưu ở cột Order.snapshot
+# - Ghi sau khi create_order / update_order commit, cùng điều kiện version như khi render lại
+# - Order.save() và thay đổi của user / payment method / product / category liên quan
+#   (chỉ các cột có trong snapshot, xem EMBEDDED_FIELDS) set snapshot = NULL (xem signals.py), lần đọc sau sẽ render lại
+# - API đọc trả thẳng bytes đã lưu, không JOIN / prefetch / serialize
+# - Render lại đọc dữ liệu trên primary (replica có thể trễ) và chỉ ghi vào các order chưa đổi từ lúc đọc:
+#   thay đổi xảy ra trong lúc render không bị snapshot cũ ghi đè
+
+def render(data):
+    return render_json(data)
+
+# Cột của các model liên quan có trong snapshot (theo serializer lồng trong OrderSerializer)
+# Sửa cột khác (vd. units_sold / revenue của product) không làm mất snapshot
+def embedded_fields(model, serializer):
+    columns = {field.attname for field in model._meta.concrete_fields}
+    return tuple(name for name in serializer.Meta.fields if name in columns and name != "id")
+
+EMBEDDED_FIELDS = {
+    User: embedded_fields(User, UserSerializer),
+    PaymentMethod: embedded_fields(PaymentMethod, PaymentMethodSerializer),
+    Product: embedded_fields(Product, ProductSerializer),
+    Category: embedded_fields(Category, CategorySerializer),
+}
+
+# `fields` (tên cột) có cột nào nằm trong snapshot không
+def embeds_any(model, fields):
+    return any(name in EMBEDDED_FIELDS[model] for name in fields)
+
+# Trước khi save `instance` (đã có trong DB): cột nằm trong snapshot có đổi so với row hiện tại không
+# save(update_fields=...) không đụng cột nào trong snapshot: không cần query
+def embedded_changed(instance, update_fields=None):
+    model = type(instance)
+    fields = [name for name in EMBEDDED_FIELDS[model] if update_fields is None or name in update_fields]
+
+    if not fields:
+        return False
+
+    current = model.objects.filter(pk=instance.pk).values(*fields).first()
+
+    return current is None or any(current[name] != getattr(instance, name) for name in fields)
+
+# Field cho UPDATE hàng loạt làm mất snapshot (thay đổi của user / product / total / status...)
+def cleared_snapshot():
+    return {"snapshot": None, "snapshot_version": F("snapshot_version") + 1}
+
+# `order` vừa đọc lại sau khi commit: chỉ ghi nếu order chưa đổi từ lúc đó
+# (update_order / bulk_transition / signal chạy xen vào thì giữ NULL, lần đọc sau render lại)
+def store_order_snapshot(order, data):
+    snapshot = render(data).decode()
+    Order.objects.filter(
+        pk=order.pk, updated_at=order.updated_at, snapshot_version=order.snapshot_version
+    ).update(snapshot=snapshot)
+    return snapshot
+
+# Render lại và lưu snapshot cho các order, trả về {order_id: snapshot}
+# Dữ liệu lấy bằng fast_serializers (cùng output với OrderSerializer, ít CPU hơn)
+# only_missing: chỉ ghi vào order còn snapshot NULL (đọc từ API), False khi rebuild toàn bộ
+def refresh_order_snapshots(order_ids, only_missing=True):
+    pin_to_primary()
+
+    # updated_at / snapshot_version đọc cùng row của order: thay đổi sau lúc này làm version khác, không ghi
+    rows = list(order_values(Order.objects.filter(id__in=order_ids), "snapshot_version"))
+    versions = {row["id"]: (row["updated_at"], row["snapshot_version"]) for row in rows}
+    snapshots = {row["id"]: render(data).decode() for row, data in zip(rows, serialize_orders(rows))}
+
+    if snapshots:
+        queryset = Order.objects.filter(id__in=list(snapshots))
+
+        if only_missing:
+            queryset = queryset.filter(snapshot__isnull=True)
+
+        queryset.update(snapshot=Case(
+            *[
+                When(
+                    Q(id=order_id, updated_at=versions[order_id][0], snapshot_version=versions[order_id][1]),
+                    then=Value(snapshot)
+                )
+                for order_id, snapshot in snapshots.items()
+            ],
+            default=F("snapshot"),
+            output_field=TextField()
+        ))
+
+    return snapshots
+
+# `orders` chỉ cần load id + snapshot (queryset.only(...))
+def load_order_snapshots(orders):
+    missing = [order.id for order in orders if order.snapshot is None]
+    rebuilt = refresh_order_snapshots(missing) if missing else {}
+
+    snapshots = []
+
+    for order in orders:
+        snapshot = order.snapshot if order.snapshot is not None else rebuilt.get(order.id)
+
+        if snapshot is not None:
+            snapshots.append(snapshot.encode())
+
+    return snapshots
+
+async def aload_order_snapshots(orders):
+    if any(order.snapshot is None for order in orders):
+        return await sync_to_async(load_order_snapshots)(orders)
+
+    return [order.snapshot.encode() for order in orders]
+
+# Render `payload` như JSONRenderer rồi gắn thêm "data" là các đoạn JSON có sẵn
+# `payload` không được chứa key "data", "data" luôn là key cuối giống các response khác
+def render_with_raw_data(payload, raw_data, many=True):
+    body = render(payload)
+    data = b"[" + b",".join(raw_data) + b"]" if many else raw_data
+
+    return body[:-1] + b',"data":' + data + b"}"
@@ -0,0 +1,218 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import traceback
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueListener
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+# Log dạng JSON (1 dòng / record) kèm request_id, endpoint của request đang chạy
+# - Thread của request chỉ bỏ record vào queue (put_nowait), QueueListener ghi ra stream ở thread riêng
+#   => request không bao giờ chờ I/O của stdout; queue đầy thì bỏ record và đếm số record bị bỏ
+# - SamplingFilter: chỉ giữ 1 phần record INFO của các logger nhiều record (vd. access log),
+#   WARNING trở lên (lỗi, request chậm) luôn được giữ
+# - request_logging_middleware: gán request id (header X-Request-ID hoặc tự tạo) + 1 access log / request
+
+ACCESS_LOGGER = "api.access"
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Thuộc tính có sẵn của LogRecord, phần còn lại (extra=...) được ghi thành field của JSON
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+# Extra bỏ đi khi đưa vào queue: django.request / django.server gắn cả object request / socket
+# (request_id, endpoint của RequestContextFilter + access log đã đủ để tra request)
+DROPPED_EXTRAS = {"request"}
+
+PRIMITIVE_TYPES = (str, int, float, bool, type(None))
+
+def get_sample_rates():
+    return getattr(settings, "LOG_SAMPLE_RATES", {})
+
+def get_slow_request_ms():
+    return getattr(settings, "LOG_SLOW_REQUEST_MS", 1000)
+
+########## Context của request ##########
+current_request = ContextVar("current_request", default=None)
+
+def endpoint_name(request):
+    match = getattr(request, "resolver_match", None)
+    return f"/{match.route}" if match is not None else None
+
+class RequestContextFilter(logging.Filter):
+    def filter(self, record):
+        request = current_request.get()
+
+        if request is not None:
+            record.request_id = getattr(request, "request_id", None)
+            record.endpoint = endpoint_name(request)
+
+        return True
+
+class SamplingFilter(logging.Filter):
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+
+        rate = get_sample_rates().get(record.name, 1.0)
+
+        return rate >= 1.0 or random.random() < rate
+
+########## Format ##########
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith("_"):
+                data[key] = value
+
+        if record.exc_text:
+            data["exc"] = record.exc_text
+
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+########## Handler ##########
+# Cùng cách làm của QueueHandler (prepare + put_nowait) nhưng không kế thừa QueueHandler:
+# dictConfig của Python 3.12+ xử lý riêng các class con của QueueHandler
+class AsyncJSONHandler(logging.Handler):
+    def __init__(self, stream=None, queue_size=10000):
+        super().__init__()
+        self.queue = queue.Queue(queue_size)
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.target.setFormatter(JSONFormatter())
+        self.listener = None
+        self.pid = None
+        self.dropped = 0
+        self.start_lock = threading.Lock()
+
+    # Listener (thread) tạo theo process: worker fork từ master không có thread của master
+    def ensure_listener(self):
+        if self.pid == os.getpid():
+            return
+
+        with self.start_lock:
+            if self.pid != os.getpid():
+                self.listener = QueueListener(self.queue, self.target)
+                self.listener.start()
+                self.pid = os.getpid()
+                atexit.register(self.stop)
+
+    # Chuẩn bị ở thread của request: message + traceback thành str, bỏ args / exc_info,
+    # extra không phải kiểu cơ bản thành giá trị JSON / str
+    # (không giữ reference tới object của request trong queue, listener không đọc object đang bị sửa)
+    def prepare(self, record):
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+
+        if record.exc_info:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+
+        for key, value in list(vars(record).items()):
+            if key in RECORD_ATTRIBUTES or isinstance(value, PRIMITIVE_TYPES):
+                continue
+
+            if key in DROPPED_EXTRAS:
+                delattr(record, key)
+            elif isinstance(value, (dict, list, tuple)):
+                setattr(record, key, json.loads(json.dumps(value, default=str)))
+            else:
+                setattr(record, key, str(value))
+
+        return record
+
+    def emit(self, record):
+        try:
+            self.ensure_listener()
+
+            if self.dropped:
+                self.report_dropped()
+
+            self.queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    # Queue có chỗ trở lại: ghi 1 record báo số record đã bị bỏ
+    def report_dropped(self):
+        record = logging.makeLogRecord({
+            "name": __name__,
+            "levelno": logging.WARNING,
+            "levelname": "WARNING",
+            "msg": "Log queue full, records dropped",
+            "dropped": self.dropped,
+        })
+        self.queue.put_nowait(record)
+        self.dropped = 0
+
+    def stop(self):
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+            self.pid = None
+
+    def close(self):
+        self.stop()
+        super().close()
+
+########## Middleware ##########
+access_logger = logging.getLogger(ACCESS_LOGGER)
+
+def start_request(request):
+    request.request_id = request.headers.get(REQUEST_ID_HEADER, "")[:64] or uuid.uuid4().hex
+    return current_request.set(request), time.perf_counter()
+
+def finish_request(request, response, started):
+    latency_ms = round((time.perf_counter() - started) * 1000, 2)
+    response[REQUEST_ID_HEADER] = request.request_id
+
+    # Lỗi server / request chậm: WARNING để không bị sampling bỏ qua
+    level = logging.WARNING if response.status_code >= 500 or latency_ms >= get_slow_request_ms() else logging.INFO
+
+    if access_logger.isEnabledFor(level):
+        access_logger.log(level, "request", extra={
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "latency_ms": latency_ms,
+        })
+
+    return response
+
+@sync_and_async_middleware
+def request_logging_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token, started = start_request(request)
+
+            try:
+                return finish_request(request, await get_response(request), started)
+            finally:
+                current_request.reset(token)
+    else:
+        def middleware(request):
+            token, started = start_request(request)
+
+            try:
+                return finish_request(request, get_response(request), started)
+            finally:
+                current_request.reset(token)
+
+    return middleware
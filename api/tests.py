@@ -1,3 +1,1822 @@
-from django.test import TestCase
+import csv
+import gc
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipIf
+from io import StringIO
+from types import SimpleNamespace
+from django.core.cache import cache
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command, CommandError
+from django.db import OperationalError, connection, connections
+from django.db.models import F, QuerySet, Sum
+from django.contrib.auth.hashers import make_password
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from .models import Category, Product, User, PaymentMethod, Order, OrderItem, OrderDailyStat, ProductSalesDelta, CategoryProduct
+from .user_cache import user_cache
+from .fields import uuid7
+from .order_status import bulk_transition
+from .profiling import metrics, profiled, fingerprint
+from .benchmark_suite import DEFAULT_MIX, seed as seed_benchmark, build_schedule, run_benchmark, compare_results, load_mix
+from .db.router import ReplicaRouter, RequestRouting, current_routing, replica_health, replica_lag, replica_middleware, start_routing, finish_routing
+from .catalog_cache import get_catalog_cache, get_timeouts, invalidate_catalog
+from .db.pool import pools, PoolTimeout, return_connections
+from .db.sqlite3.base import DatabaseWrapper as PooledSQLiteWrapper
+from .structured_logging import AsyncJSONHandler, RequestContextFilter, SamplingFilter
+from .renderers import FastJSONRenderer, get_json_dumps, orjson
+from .serializers import ProductSerializer, OrderSerializer
+from .fast_serializers import product_values, serialize_products, order_values, serialize_orders
+from .snapshots import cleared_snapshot, load_order_snapshots, store_order_snapshot
 
-# Create your tests here.
+# Log JSON của app (handler "json" trong settings.LOGGING) ghi vào buffer thay vì stdout khi chạy test,
+# test cần đọc log thì gắn handler riêng (xem StructuredLoggingTest.capture_logs)
+captured_streams = []
+
+def setUpModule():
+    for logger_name in ("", "django"):
+        for handler in logging.getLogger(logger_name).handlers:
+            if isinstance(handler, AsyncJSONHandler):
+                captured_streams.append((handler, handler.target.setStream(StringIO())))
+
+def tearDownModule():
+    while captured_streams:
+        handler, stream = captured_streams.pop()
+        handler.target.setStream(stream)
+
+# Tạo dữ liệu mẫu dùng chung cho các test
+def create_catalog(num_products=3):
+    categories = [
+        Category.objects.create(name="Drinks"),
+        Category.objects.create(name="Snacks"),
+    ]
+
+    products = []
+    for i in range(num_products):
+        product = Product.objects.create(
+            name=f"Product {i}",
+            price=1000 * (i + 1),
+            description=f"Description {i}"
+        )
+        product.categories.set(categories)
+        products.append(product)
+
+    return categories, products
+
+def create_orders(user, payment_method, products, num_orders, items_per_order=3):
+    orders = []
+    for _ in range(num_orders):
+        order = Order.objects.create(user=user, payment_method=payment_method)
+        for product in products[:items_per_order]:
+            OrderItem.objects.create(order=order, product=product, quantity=2, price=product.price)
+        order.total_amount = sum(2 * product.price for product in products[:items_per_order])
+        Order.objects.filter(pk=order.pk).update(total_amount=order.total_amount)
+        orders.append(order)
+
+    return orders
+
+
+class OrderListQueryCountTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tester", name="Tester", password="x")
+        self.payment_method = PaymentMethod.objects.create(key="cod", name="Cash on delivery")
+        _, self.products = create_catalog()
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    # Số query của 1 page không phụ thuộc vào số order / item trong page
+    def test_order_list_query_count_is_constant(self):
+        # Cache count bị bỏ sau commit (on_commit), TestCase không commit nên chạy callback ở đây
+        with self.captureOnCommitCallbacks(execute=True):
+            create_orders(self.user, self.payment_method, self.products, 2)
+
+        # count + snapshot, chưa có snapshot nên render lại:
+        # orders (JOIN user, payment_method) + items (JOIN product) + categories + bulk update
+        with self.assertNumQueries(6):
+            response = self.client.get("/orders", {"limit": 50})
+        self.assertEqual(len(response.json()["data"]), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_orders(self.user, self.payment_method, self.products, 20)
+
+        with self.assertNumQueries(6):
+            response = self.client.get("/orders", {"limit": 50})
+        self.assertEqual(len(response.json()["data"]), 22)
+
+        item = response.json()["data"][0]["items"][0]
+        self.assertEqual(len(item["product"]["categories"]), 2)
+
+    # Snapshot đã có + count đã cache: 1 query cho cả page
+    def test_order_list_reads_snapshots(self):
+        create_orders(self.user, self.payment_method, self.products, 10)
+        expected = self.client.get("/orders", {"limit": 50}).json()
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/orders", {"limit": 50})
+        self.assertEqual(response.json(), expected)
+
+    def test_order_detail_query_count(self):
+        order = create_orders(self.user, self.payment_method, self.products, 1)[0]
+
+        with self.assertNumQueries(5):
+            response = self.client.get(f"/orders/detail/{order.id}")
+        self.assertEqual(len(response.json()["data"]["items"]), 3)
+
+        with self.assertNumQueries(1):
+            self.client.get(f"/orders/detail/{order.id}")
+
+
+class ProductListQueryCountTest(TestCase):
+    def test_product_list_query_count_is_constant(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_catalog(num_products=2)
+
+        # count + products + categories
+        with self.assertNumQueries(3):
+            response = APIClient().get("/products", {"limit": 50})
+        self.assertEqual(len(response.data["data"]), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_catalog(num_products=20)
+
+        with self.assertNumQueries(3):
+            response = APIClient().get("/products", {"limit": 50})
+        self.assertEqual(len(response.data["data"]), 22)
+
+
+class OrderWriteTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tester", name="Tester", password="x")
+        self.payment_method = PaymentMethod.objects.create(key="cod", name="Cash on delivery")
+        _, self.products = create_catalog(num_products=30)
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def post_order(self, products):
+        return self.client.post("/orders/create", {
+            "user_id": str(self.user.id),
+            "payment_method": str(self.payment_method.id),
+            "items": [{"product": str(p.id), "quantity": 2} for p in products],
+        }, format="json")
+
+    # Số query khi tạo order không tăng theo số item
+    def test_create_order_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as small:
+            response = self.post_order(self.products[:2])
+        self.assertEqual(response.status_code, 201)
+
+        with CaptureQueriesContext(connection) as large:
+            response = self.post_order(self.products)
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(len(response.data["data"]["items"]), 30)
+        self.assertEqual(float(response.data["data"]["total_amount"]), sum(2 * p.price for p in self.products))
+
+    def test_create_order_rejects_inactive_product(self):
+        Product.objects.filter(pk=self.products[1].pk).update(is_active=False)
+
+        response = self.post_order(self.products[:3])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.count(), 0)
+
+    # Update chỉ thay đổi phần item khác biệt, item giữ nguyên không bị tạo lại
+    def test_update_order_applies_item_diff(self):
+        order_id = self.post_order(self.products[:3]).data["data"]["id"]
+        kept = OrderItem.objects.get(order_id=order_id, product=self.products[0])
+
+        response = self.client.patch(f"/orders/update/{order_id}", {
+            "items": [
+                {"product": str(self.products[0].id), "quantity": 2},
+                {"product": str(self.products[1].id), "quantity": 5},
+                {"product": str(self.products[3].id), "quantity": 1},
+            ]
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        items = OrderItem.objects.filter(order_id=order_id)
+        self.assertEqual(
+            {(item.product_id, item.quantity) for item in items},
+            {(self.products[0].id, 2), (self.products[1].id, 5), (self.products[3].id, 1)}
+        )
+        self.assertTrue(items.filter(pk=kept.pk).exists())
+
+        expected = 2 * self.products[0].price + 5 * self.products[1].price + self.products[3].price
+        self.assertEqual(float(response.data["data"]["total_amount"]), expected)
+
+    # Trạng thái cũ (rollup, total, doanh số) đọc từ row đã khóa trong transaction của update
+    def test_update_order_reads_locked_row(self):
+        order_id = self.post_order(self.products[:2]).data["data"]["id"]
+        select_for_update = QuerySet.select_for_update
+
+        with mock.patch.object(QuerySet, "select_for_update", autospec=True, side_effect=select_for_update) as locked:
+            response = self.client.patch(f"/orders/update/{order_id}", {"status": "paid"}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([call.args[0].model for call in locked.call_args_list], [Order])
+
+        stats = OrderDailyStat.objects.values("status").annotate(count=Sum("order_count"))
+        self.assertEqual({row["status"]: row["count"] for row in stats if row["count"]}, {"paid": 1})
+
+    def test_update_missing_order_returns_404(self):
+        response = self.client.patch(f"/orders/update/{uuid.uuid4()}", {"status": "shipped"}, format="json")
+
+        self.assertEqual(response.status_code, 404)
+
+
+class CursorPaginationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tester", name="Tester", password="x")
+        self.payment_method = PaymentMethod.objects.create(key="cod", name="Cash on delivery")
+        _, self.products = create_catalog(num_products=5)
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def walk(self, url, limit):
+        pages = []
+        cursor = ""
+
+        while cursor is not None:
+            response = self.client.get(url, {"cursor": cursor, "limit": limit})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("total_item", response.json()["paging"])
+
+            pages.append([row["id"] for row in response.json()["data"]])
+            cursor = response.json()["paging"]["next_cursor"]
+
+        return pages
+
+    def test_order_cursor_walks_every_order_once_newest_first(self):
+        orders = create_orders(self.user, self.payment_method, self.products, 5, items_per_order=1)
+
+        pages = self.walk("/orders", 2)
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        ids = [order_id for page in pages for order_id in page]
+        expected = sorted(orders, key=lambda order: (order.created_at, order.id), reverse=True)
+        self.assertEqual(ids, [str(order.id) for order in expected])
+
+    def test_product_cursor_walks_every_product_once(self):
+        pages = self.walk("/products", 2)
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        ids = [product_id for page in pages for product_id in page]
+        self.assertEqual(ids, sorted(str(product.id) for product in self.products))
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/orders", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ListCountCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_catalog(num_products=3)
+
+    def test_count_is_cached_until_product_changes(self):
+        response = APIClient().get("/products")
+        self.assertEqual(response.data["paging"]["total_item"], 3)
+        self.assertEqual(response.data["paging"]["total_item_type"], "exact")
+
+        # Lần 2 không chạy COUNT: products + categories
+        with self.assertNumQueries(2):
+            response = APIClient().get("/products")
+        self.assertEqual(response.data["paging"]["total_item"], 3)
+
+        # Filter khác -> key khác
+        response = APIClient().get("/products", {"min_price": 2000})
+        self.assertEqual(response.data["paging"]["total_item"], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_catalog(num_products=1)
+
+        response = APIClient().get("/products")
+        self.assertEqual(response.data["paging"]["total_item"], 4)
+
+    # SQLite không có thống kê bảng -> quay về exact
+    def test_estimated_count_falls_back_to_exact(self):
+        response = APIClient().get("/products", {"count": "estimated"})
+        self.assertEqual(response.data["paging"]["total_item"], 3)
+        self.assertEqual(response.data["paging"]["total_item_type"], "exact")
+
+    def test_invalid_count_mode(self):
+        response = APIClient().get("/products", {"count": "fast"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ProductSearchTest(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Coca Cola", price=12000, description="Refreshing soda drink")
+            Product.objects.create(name="Green tea", price=9000, description="Less sugar than cola")
+            Product.objects.create(name="Bánh mì", price=20000, description="Vietnamese bread")
+
+    def search(self, q):
+        response = APIClient().get("/products", {"q": q})
+        self.assertEqual(response.status_code, 200)
+        return [product["name"] for product in response.data["data"]]
+
+    # Khớp trong name được xếp trên khớp trong description
+    def test_search_ranks_name_matches_first(self):
+        self.assertEqual(self.search("cola"), ["Coca Cola", "Green tea"])
+
+    def test_search_matches_word_prefixes_of_every_term(self):
+        self.assertEqual(self.search("gre te"), ["Green tea"])
+        self.assertEqual(self.search("bánh"), ["Bánh mì"])
+        self.assertEqual(self.search("cola bread"), [])
+        self.assertEqual(self.search("%%"), [])
+
+    def test_search_sees_product_changes(self):
+        self.assertEqual(self.search("pepsi"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Pepsi", price=11500, description="Popular cola beverage")
+
+        self.assertEqual(self.search("pepsi"), ["Pepsi"])
+
+    # Thay đổi ở process khác chỉ tới được qua catalog version trong cache chung
+    def test_index_follows_shared_catalog_version(self):
+        self.assertEqual(self.search("pepsi"), [])
+
+        Product.objects.bulk_create([Product(name="Pepsi", price=11500, description="")])
+        self.assertEqual(self.search("pepsi"), [])
+
+        invalidate_catalog(Product)
+        self.assertEqual(self.search("pepsi"), ["Pepsi"])
+
+    @override_settings(SEARCH_MAX_RESULTS=1)
+    def test_search_keeps_only_best_matches(self):
+        self.assertEqual(self.search("cola"), ["Coca Cola"])
+
+
+class CatalogCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        Category.objects.create(name="Drinks")
+        Category.objects.create(name="Snacks", is_active=False)
+
+    def test_category_list_is_served_from_cache(self):
+        response = APIClient().get("/categories")
+        self.assertEqual(len(response.json()["data"]), 2)
+
+        with self.assertNumQueries(0):
+            cached = APIClient().get("/categories")
+        self.assertEqual(cached.content, response.content)
+
+        # Filter khác -> entry khác
+        response = APIClient().get("/categories", {"is_active": "true"})
+        self.assertEqual([c["name"] for c in response.json()["data"]], ["Drinks"])
+
+    # Bỏ cache sau khi commit: trước commit request khác vẫn đọc dữ liệu cũ, không được cache dưới version mới
+    def test_invalidation_waits_for_commit(self):
+        APIClient().get("/categories")
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            Category.objects.create(name="Bakery")
+
+        with self.assertNumQueries(0):
+            APIClient().get("/categories")
+
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(len(APIClient().get("/categories").json()["data"]), 3)
+
+    def test_category_save_invalidates_cache(self):
+        APIClient().get("/categories")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="Bakery")
+
+        response = APIClient().get("/categories")
+        self.assertEqual(len(response.json()["data"]), 3)
+
+    def test_payment_method_list_revalidates_with_etag(self):
+        PaymentMethod.objects.create(key="cod", name="Cash on delivery")
+
+        response = APIClient().get("/payment_methods")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Last-Modified", response)
+
+        response = APIClient().get("/payment_methods", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PaymentMethod.objects.create(key="card", name="Card")
+
+        response = APIClient().get("/payment_methods", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["data"]), 2)
+
+
+    # LocMem: process khác không nhận được invalidate, entry + version chỉ giữ vài giây
+    @override_settings(CATALOG_CACHE_TIMEOUT=3600, CATALOG_LOCAL_CACHE_TIMEOUT=5)
+    def test_process_local_cache_expires_quickly(self):
+        self.assertEqual(get_timeouts(get_catalog_cache()), (5, 5))
+
+        with mock.patch("api.catalog_cache.is_shared", return_value=True):
+            self.assertEqual(get_timeouts(get_catalog_cache()), (3600, None))
+
+        self.client.get("/async/categories")
+
+        # Thay đổi từ process khác: không có signal trong process này
+        Category.objects.filter(name="Snacks").update(name="Chips")
+
+        with self.assertNumQueries(0):
+            self.assertIn("Snacks", self.client.get("/async/categories").content.decode())
+
+        with mock.patch("time.time", return_value=time.time() + 6):
+            response = self.client.get("/categories")
+
+        self.assertIn("Chips", response.content.decode())
+
+
+class AuthUserCacheTest(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create(username="tester", name="Tester", password=make_password("secret"))
+
+        response = APIClient().post("/auth/login", {"username": "tester", "password": "secret"}, format="json")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['data']['token']}")
+
+    def test_user_is_loaded_once_per_token(self):
+        self.assertEqual(self.client.get("/auth/profile").status_code, 200)
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/auth/profile")
+        self.assertEqual(response.data["data"]["username"], "tester")
+
+        self.assertEqual(user_cache.stats()["hits"], 1)
+        self.assertEqual(user_cache.stats()["misses"], 1)
+
+    def test_user_save_invalidates_cache(self):
+        self.client.get("/auth/profile")
+
+        self.user.name = "Renamed"
+        self.user.save()
+
+        response = self.client.get("/auth/profile")
+        self.assertEqual(response.data["data"]["name"], "Renamed")
+        self.assertEqual(user_cache.stats()["misses"], 2)
+
+    @override_settings(AUTH_TRUST_TOKEN_CLAIMS=True)
+    def test_trusted_claims_skip_database(self):
+        with self.assertNumQueries(0):
+            response = self.client.get("/auth/profile")
+
+        self.assertEqual(response.data["data"]["id"], str(self.user.id))
+        self.assertEqual(response.data["data"]["name"], "Tester")
+        self.assertEqual(user_cache.stats()["claim_hits"], 1)
+
+    @override_settings(AUTH_USER_CACHE_SIZE=1)
+    def test_stats_are_exported_in_metrics(self):
+        self.client.get("/auth/profile")
+        self.client.get("/auth/profile")
+
+        response = APIClient().post("/auth/login", {"username": "tester", "password": "secret"}, format="json")
+        APIClient(HTTP_AUTHORIZATION=f"Bearer {response.data['data']['token']}").get("/auth/profile")
+
+        body = APIClient().get("/metrics").content.decode()
+        self.assertIn("shop_auth_user_cache_hits_total 1\n", body)
+        self.assertIn("shop_auth_user_cache_misses_total 2\n", body)
+        self.assertIn("shop_auth_user_cache_evictions_total 1\n", body)
+        self.assertIn("shop_auth_user_cache_size 1\n", body)
+        self.assertIn("# TYPE shop_auth_user_cache_claim_hits_total counter", body)
+
+
+class QueryPlanTest(TestCase):
+    # Query của products / orders phải dùng index kể cả khi bảng rỗng
+    def test_product_and_order_list_queries_use_indexes(self):
+        out = StringIO()
+
+        try:
+            call_command("check_query_plans", min_rows=0, stdout=out)
+        except CommandError:
+            pass
+
+        lines = [line for line in out.getvalue().splitlines() if line.split()[1] in ("products:", "orders:")]
+        self.assertEqual(len(lines), 12)
+        self.assertTrue(all(line.startswith("OK") for line in lines), lines)
+
+    def test_check_passes_on_small_tables(self):
+        call_command("check_query_plans", stdout=StringIO())
+
+
+class BinaryUUIDFieldTest(TestCase):
+    def test_uuid7_is_time_ordered(self):
+        ids = [uuid7() for _ in range(1000)]
+
+        self.assertTrue(all(value.version == 7 for value in ids))
+        self.assertTrue(all(value.variant == uuid.RFC_4122 for value in ids))
+
+        later = uuid7()
+        time.sleep(0.002)
+        self.assertLess(later, uuid7())
+
+    # MySQL lưu 16 byte, đọc ra lại đúng UUID ban đầu
+    def test_mysql_round_trip_uses_16_bytes(self):
+        field = Order._meta.pk
+        mysql = SimpleNamespace(vendor="mysql")
+        value = uuid7()
+
+        self.assertEqual(field.db_type(mysql), "binary(16)")
+
+        stored = field.get_db_prep_value(str(value), mysql)
+        self.assertEqual(stored, value.bytes)
+        self.assertEqual(field.from_db_value(stored, None, mysql), value)
+
+    def test_api_keeps_uuid_string_representation(self):
+        product = Product.objects.create(name="Pepsi", price=11500, description="Cola")
+
+        response = APIClient().get(f"/products/detail/{product.id}")
+
+        self.assertEqual(response.data["data"]["id"], str(product.id))
+        self.assertEqual(Product.objects.get(pk=str(product.id)), product)
+
+
+class AsyncEndpointTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.user = User.objects.create(username="tester", name="Tester", password="x")
+        self.payment_method = PaymentMethod.objects.create(key="cod", name="Cash on delivery")
+        _, self.products = create_catalog(num_products=4)
+        self.orders = create_orders(self.user, self.payment_method, self.products, 3)
+
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    # Bản async trả về đúng nội dung như bản sync
+    async def test_async_routes_match_sync_routes(self):
+        order_id = self.orders[0].id
+        product_id = self.products[0].id
+
+        for path, params in [
+            ("/products", {"limit": 2}),
+            ("/products", {"cursor": "", "limit": 2}),
+            ("/products", {"q": "product"}),
+            (f"/products/detail/{product_id}", {}),
+            ("/categories", {"is_active": "true"}),
+            ("/payment_methods", {}),
+            ("/orders", {"status": "pending"}),
+            ("/orders", {"cursor": ""}),
+            (f"/orders/detail/{order_id}", {}),
+        ]:
+            expected = await self.async_client.get(path, params, **self.auth)
+            response = await self.async_client.get(f"/async{path}", params, **self.auth)
+
+            self.assertEqual(response.status_code, expected.status_code, path)
+            self.assertEqual(response.json(), expected.json(), path)
+
+    async def test_async_order_routes_require_token(self):
+        response = await self.async_client.get("/async/orders")
+        self.assertEqual(response.status_code, 401)
+
+        response = await self.async_client.get("/async/orders", HTTP_AUTHORIZATION="Bearer invalid")
+        self.assertEqual(response.status_code, 401)
+
+    async def test_async_detail_not_found(self):
+        response = await self.async_client.get("/async/products/detail/not-a-uuid")
+        self.assertEqual(response.status_code, 404)
+
+
+class OrderSnapshotTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tester", name="Tester", password="x")
+        self.payment_method = PaymentMethod.objects.create(key="cod", name="Cash on delivery")
+        self.categories, self.products = create_catalog()
+        self.order = create_orders(self.user, self.payment_method, self.products, 1)[0]
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def detail(self):
+        return self.client.get(f"/orders/detail/{self.order.id}").json()["data"]
+
+    def test_related_changes_clear_snapshot(self):
+        self.detail()
+
+        product = self.products[0]
+        product.name = "Renamed product"
+        product.save()
+        self.assertIn("Renamed product", [item["product"]["name"] for item in self.detail()["items"]])
+
+        self.categories[0].name = "Renamed category"
+        self.categories[0].save()
+        names = [category["name"] for category in self.detail()["items"][0]["product"]["categories"]]
+        self.assertIn("Renamed category", names)
+
+        product.categories.set([self.categories[1]])
+        item = next(item for item in self.detail()["items"] if item["product"]["id"] == str(product.id))
+        self.assertEqual(len(item["product"]["categories"]), 1)
+
+        self.payment_method.name = "COD"
+        self.payment_method.save()
+        self.assertEqual(self.detail()["payment_method"]["name"], "COD")
+
+    # Cột không có trong snapshot (units_sold / revenue) hoặc giá trị không đổi: giữ snapshot
+    def test_unrelated_changes_keep_snapshot(self):
+        self.detail()
+        snapshot = Order.objects.get(pk=self.order.pk).snapshot
+
+        product = self.products[0]
+        product.units_sold += 3
+        product.save()
+        product.save(update_fields=["revenue"])
+        self.categories[0].save()
+        self.assertEqual(Order.objects.get(pk=self.order.pk).snapshot, snapshot)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=product.pk).update_listing(units_sold=10)
+        self.assertEqual(Order.objects.get(pk=self.order.pk).snapshot, snapshot)
+
+        product.price += 1
+        product.save()
+        self.assertIsNone(Order.objects.get(pk=self.order.pk).snapshot)
+        self.assertIn(product.price, [item["product"]["price"] for item in self.detail()["items"]])
+
+        # Xóa luôn bỏ snapshot, kể cả khi lần save trước không đổi gì
+        self.payment_method.save()
+        self.payment_method.delete()
+        self.assertIsNone(self.detail()["payment_method"])
+
+    def test_update_order_refreshes_snapshot(self):
+        self.detail()
+
+        response = self.client.patch(f"/orders/update/{self.order.id}", {"status": "paid"}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.detail()["status"], "paid")
+
+    # Product đổi tên trong lúc render (sau khi đã đọc order): snapshot cũ không được lưu
+    def test_change_during_render_is_not_overwritten(self):
+        Order.objects.filter(pk=self.order.pk).update(snapshot=None)
+        product = self.products[0]
+
+        def serialize_then_rename(rows):
+            data = serialize_orders(rows)
+            product.name = "Renamed product"
+            product.save()
+            return data
+
+        with mock.patch("api.snapshots.serialize_orders", side_effect=serialize_then_rename):
+            snapshot = load_order_snapshots(Order.objects.filter(pk=self.order.pk).only("id", "snapshot"))[0]
+
+        self.assertNotIn(b"Renamed product", snapshot)
+        self.assertIsNone(Order.objects.get(pk=self.order.pk).snapshot)
+        self.assertIn("Renamed product", [item["product"]["name"] for item in self.detail()["items"]])
+
+    # Order đổi giữa lúc đọc lại và lúc lưu snapshot sau update_order: không lưu snapshot cũ
+    def test_store_after_write_skips_changed_order(self):
+        order = Order.objects.get(pk=self.order.pk)
+        Order.objects.filter(pk=order.pk).update(status="paid", **cleared_snapshot())
+
+        store_order_snapshot(order, {"status": "pending"})
+
+        self.assertIsNone(Order.objects.get(pk=order.pk).snapshot)
+        self.assertEqual(self.detail()["status"], "paid")
+
+        order = Order.objects.get(pk=order.pk)
+        store_order_snapshot(order, {"status": "paid"})
+        self.assertIsNotNone(Order.objects.get(pk=order.pk).snapshot)
+
+    # Request đọc từ replica: render lại snapshot chuyển các câu đọc còn lại sang primary
+    def test_rebuild_reads_from_primary(self):
+        Order.objects.filter(pk=self.order.pk).update(snapshot=None)
+        routing = RequestRouting("replica")
+        token = current_routing.set(routing)
+
+        try:
+            load_order_snapshots(Order.objects.filter(pk=self.order.pk).only("id", "snapshot"))
+        finally:
+            current_routing.reset(token)
+
+        self.assertTrue(routing.wrote)
+        self.assertIsNotNone(Order.objects.get(pk=self.order.pk).snapshot)
+
+    def test_rebuild_command_backfills_missing_snapshots(self):
+        create_orders(self.user, self.payment_method, self.products, 4)
+
+        call_command("rebuild_order_snapshots", batch_size=2, stdout=StringIO())
+
+        self.assertFalse(Order.objects.filter(snapshot=None).exists())
+        with self.assertNumQueries(1):
+            self.client.get(f"/orders/detail/{self.order.id}")
+
+
+class FastSerializerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tester", name="Tester", password="x")
+        self.payment_method = PaymentMethod.objects.create(key="cod", name="Cash on delivery")
+        self.categories, self.products = create_catalog()
+        Product.objects.create(name="No category", price=5, description="")
+
+    def assertSameOutput(self, drf_data, fast_data):
+        self.assertEqual(JSONRenderer().render(drf_data), JSONRenderer().render(fast_data))
+
+    def test_products_match_drf_serializer(self):
+        queryset = Product.objects.order_by("id")
+
+        self.assertSameOutput(
+            ProductSerializer(ProductSerializer.setup_eager_loading(queryset), many=True).data,
+            serialize_products(product_values(queryset))
+        )
+
+    def test_orders_match_drf_serializer(self):
+        orders = create_orders(self.user, self.payment_method, self.products, 2)
+
+        # payment method NULL, product đã xóa (SET_NULL), giá lẻ, note
+        Order.objects.filter(pk=orders[0].pk).update(payment_method=None, note="Giao buổi sáng")
+        OrderItem.objects.create(order=orders[1], product=None, quantity=3, price="10.5")
+        OrderItem.objects.create(order=orders[1], product=self.products[0], quantity=7, price="0.33")
+
+        queryset = Order.objects.order_by("-created_at", "-id")
+
+        with self.assertNumQueries(3):
+            fast_data = serialize_orders(order_values(queryset))
+
+        self.assertSameOutput(
+            OrderSerializer(OrderSerializer.setup_eager_loading(queryset), many=True).data, fast_data
+        )
+
+    def test_product_list_endpoint_output_unchanged(self):
+        response = APIClient().get("/products", {"limit": 2, "page": 2})
+        products = ProductSerializer.setup_eager_loading(Product.objects.all())[2:4]
+
+        self.assertEqual(response.data["data"], ProductSerializer(products, many=True).data)
+
+
+class FastJSONRendererTest(TestCase):
+    payload = {
+        "id": uuid.UUID("01a15012-0414-776f-ad67-6fd8e9da1623"),
+        "total_amount": Decimal("3000.50"),
+        "created_at": datetime(2026, 1, 2, 3, 4, 5, 678, tzinfo=dt_timezone.utc),
+        "name": "Cà phê sữa \u2028 đá",
+        "items": [{"quantity": 2, "price": "1000.50", "note": None, "is_active": True}],
+    }
+
+    def render(self, backend, data, accepted_media_type=None):
+        renderer = FastJSONRenderer()
+        renderer.backend = backend
+        return renderer.render(data, accepted_media_type)
+
+    @skipIf(orjson is None, "orjson is not installed")
+    def test_orjson_output_matches_drf(self):
+        self.assertEqual(self.render("orjson", self.payload), JSONRenderer().render(self.payload))
+
+    @skipIf(orjson is None, "orjson is not installed")
+    def test_falls_back_to_drf_for_indent_and_unsupported_values(self):
+        indented = "application/json; indent=4"
+        self.assertEqual(
+            self.render("orjson", self.payload, indented), JSONRenderer().render(self.payload, indented)
+        )
+
+        big = {"value": 2 ** 70}
+        self.assertEqual(self.render("orjson", big), JSONRenderer().render(big))
+
+    def test_backend_is_configured_in_rest_framework_settings(self):
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "JSON_RENDERER_BACKEND": "json"}):
+            response = APIClient().get("/products")
+            self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+        with self.assertRaises(ImproperlyConfigured):
+            get_json_dumps("simdjson")
+
+
+@override_settings(ORDER_EXPORT_BATCH_SIZE=2)
+class OrderExportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tester", name="Tester", password="x")
+        self.payment_method = PaymentMethod.objects.create(key="cod", name="Cash on delivery")
+        _, self.products = create_catalog()
+        self.orders = create_orders(self.user, self.payment_method, self.products, 5, items_per_order=2)
+        Order.objects.filter(pk=self.orders[0].pk).update(status="paid")
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def export(self, **params):
+        response = self.client.get("/orders/export", params)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_ndjson_streams_every_order_in_batches(self):
+        lines = self.export().splitlines()
+
+        self.assertEqual([json.loads(line)["id"] for line in lines], [str(order.id) for order in self.orders])
+        self.assertEqual(json.loads(lines[1]), self.client.get(f"/orders/detail/{self.orders[1].id}").json()["data"])
+
+        # Query theo batch, không theo số order
+        with CaptureQueriesContext(connection) as queries:
+            self.export()
+        self.assertLessEqual(len(queries), 4)
+
+    def test_csv_has_one_row_per_item_and_respects_filters(self):
+        rows = list(csv.reader(StringIO(self.export(type="csv"))))
+
+        self.assertEqual(rows[0][:2], ["order_id", "created_at"])
+        self.assertEqual(len(rows), 1 + 5 * 2)
+
+        rows = list(csv.reader(StringIO(self.export(type="csv", status="paid"))))
+        self.assertEqual({row[0] for row in rows[1:]}, {str(self.orders[0].id)})
+
+    def test_invalid_type(self):
+        self.assertEqual(self.client.get("/orders/export", {"type": "xml"}).status_code, 400)
+
+
+class ProductImportTest(TestCase):
+    def setUp(self):
+        self.categories = [Category.objects.create(name="Drinks"), Category.objects.create(name="Snacks")]
+        self.category_ids = [str(category.id) for category in self.categories]
+
+    def rows(self, count):
+        return [
+            {"name": f"Imported {i}", "price": 100 + i, "description": "Imported", "category_ids": self.category_ids}
+            for i in range(count)
+        ]
+
+    def test_json_import_reports_row_errors(self):
+        rows = self.rows(3) + [
+            {"name": "No price", "description": "x", "category_ids": []},
+            {"name": "Unknown category", "price": 1, "description": "x", "category_ids": [str(uuid.uuid4())]},
+        ]
+        rows[1]["description"] = ""
+
+        response = APIClient().post("/products/import", rows, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        result = response.data["data"]
+        self.assertEqual((result["total"], result["created"], result["failed"]), (5, 2, 3))
+        self.assertEqual([error["row"] for error in result["errors"]], [2, 4, 5])
+        self.assertIn("price", result["errors"][1]["errors"])
+        self.assertEqual(Product.objects.get(name="Imported 0").categories.count(), 2)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def count_queries(num_rows):
+            with CaptureQueriesContext(connection) as queries:
+                APIClient().post("/products/import", self.rows(num_rows), format="json")
+            return len(queries)
+
+        self.assertEqual(count_queries(2), count_queries(40))
+
+    def test_ndjson_and_csv_streams(self):
+        body = "\n".join(json.dumps(row) for row in self.rows(2)) + "\n{broken\n"
+        response = APIClient().post("/products/import", body, content_type="application/x-ndjson")
+        self.assertEqual((response.data["data"]["created"], response.data["data"]["failed"]), (2, 1))
+
+        body = "name,price,description,category_ids,is_active\n" \
+            f"Csv product,500,From csv,{'|'.join(self.category_ids)},false\n"
+        response = APIClient().post("/products/import", body, content_type="text/csv")
+        self.assertEqual(response.data["data"]["created"], 1)
+
+        product = Product.objects.get(name="Csv product")
+        self.assertFalse(product.is_active)
+        self.assertEqual(product.categories.count(), 2)
+
+    def test_import_invalidates_count_and_search(self):
+        self.assertEqual(APIClient().get("/products").data["paging"]["total_item"], 0)
+
+        APIClient().post("/products/import", self.rows(3), format="json")
+
+        self.assertEqual(APIClient().get("/products").data["paging"]["total_item"], 3)
+        self.assertEqual(len(APIClient().get("/products", {"q": "imported"}).data["data"]), 3)
+
+    def test_dry_run_and_command(self):
+        response = APIClient().post("/products/import?dry_run=true", self.rows(2), format="json")
+        self.assertEqual(response.data["data"]["created"], 0)
+        self.assertFalse(Product.objects.exists())
+
+        with tempfile.NamedTemporaryFile("w", suffix=".ndjson", delete=False) as source:
+            source.write("\n".join(json.dumps(row) for row in self.rows(3)))
+        self.addCleanup(os.remove, source.name)
+
+        call_command("import_products", source.name, chunk_size=2, stdout=StringIO())
+        self.assertEqual(Product.objects.count(), 3)
+
+
+class OrderBulkStatusTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tester", name="Tester", password="x")
+        self.payment_method = PaymentMethod.objects.create(key="cod", name="Cash on delivery")
+        _, self.products = create_catalog()
+        self.orders = create_orders(self.user, self.payment_method, self.products, 4, items_per_order=1)
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def bulk(self, ids, new_status):
+        return self.client.post("/orders/bulk_status", {"ids": ids, "status": new_status}, format="json")
+
+    def test_per_order_results(self):
+        Order.objects.filter(pk=self.orders[1].pk).update(status="paid")
+        Order.objects.filter(pk=self.orders[2].pk).update(status="completed")
+        ids = [str(order.id) for order in self.orders[:3]] + [str(uuid.uuid4()), "not-a-uuid"]
+
+        response = self.bulk(ids, "paid")
+
+        self.assertEqual(response.status_code, 200)
+        data = response.data["data"]
+        self.assertEqual((data["updated"], data["failed"]), (1, 3))
+        self.assertEqual(
+            [(result["id"], result["success"]) for result in data["results"]],
+            list(zip(ids, [True, True, False, False, False]))
+        )
+        self.assertFalse(data["results"][1]["updated"])
+        self.assertEqual(Order.objects.get(pk=self.orders[0].pk).status, "paid")
+        self.assertEqual(Order.objects.get(pk=self.orders[2].pk).status, "completed")
+
+    def test_set_based_update_clears_snapshots_and_counts(self):
+        ids = [str(order.id) for order in self.orders]
+        self.client.get(f"/orders/detail/{ids[0]}")
+        self.assertEqual(self.client.get("/orders", {"status": "paid"}).json()["paging"]["total_item"], 0)
+
+        # Savepoint + 1 SELECT + 1 UPDATE cho mỗi status nguồn, không phụ thuộc số order
+        # + 1 INSERT chênh lệch cho mọi bucket rollup (pending, paid)
+        with self.assertNumQueries(5):
+            bulk_transition(ids, "paid")
+
+        self.assertEqual(self.client.get(f"/orders/detail/{ids[0]}").json()["data"]["status"], "paid")
+        self.assertEqual(self.client.get("/orders", {"status": "paid"}).json()["paging"]["total_item"], 4)
+
+    def test_invalid_body(self):
+        self.assertEqual(self.bulk([], "paid").status_code, 400)
+        self.assertEqual(self.bulk([str(self.orders[0].id)], "lost").status_code, 400)
+
+
+class OrderTotalTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tester", name="Tester", password="x")
+        _, self.products = create_catalog()
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create(self, items):
+        response = self.client.post("/orders/create", {"user_id": str(self.user.id), "items": items}, format="json")
+        self.assertEqual(response.status_code, 201)
+        return response.data["data"]
+
+    def test_totals_are_exact_decimals(self):
+        order = self.create([
+            {"product": str(self.products[0].id), "quantity": 3, "price": "0.1"},
+            {"product": str(self.products[1].id), "quantity": 1, "price": 0.2},
+        ])
+
+        self.assertEqual(order["total_amount"], "0.50")
+        self.assertEqual([item["sub_total"] for item in order["items"]], ["0.30", "0.20"])
+
+    def test_update_applies_delta_with_one_update(self):
+        order = self.create([
+            {"product": str(self.products[0].id), "quantity": 1, "price": "10.10"},
+            {"product": str(self.products[1].id), "quantity": 2, "price": "20.20"},
+        ])
+
+        response = self.client.patch(f"/orders/update/{order['id']}", {"items": [
+            {"product": str(self.products[0].id), "quantity": 2, "price": "10.10"},
+            {"product": str(self.products[2].id), "quantity": 1, "price": "0.05"},
+        ]}, format="json")
+
+        self.assertEqual(response.data["data"]["total_amount"], "20.25")
+        self.assertEqual(Order.objects.get(pk=order["id"]).total_amount, Decimal("20.25"))
+
+    def test_audit_command_reports_and_fixes_drift(self):
+        order = self.create([{"product": str(self.products[0].id), "quantity": 2, "price": "1.25"}])
+        call_command("audit_order_totals", stdout=StringIO())
+
+        Order.objects.filter(pk=order["id"]).update(total_amount=Decimal("99.99"))
+
+        with self.assertRaises(CommandError):
+            call_command("audit_order_totals", stdout=StringIO())
+
+        call_command("audit_order_totals", fix=True, stdout=StringIO())
+        self.assertEqual(Order.objects.get(pk=order["id"]).total_amount, Decimal("2.50"))
+        self.assertEqual(self.client.get(f"/orders/detail/{order['id']}").json()["data"]["total_amount"], "2.50")
+
+
+class OrderReportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tester", name="Tester", password="x")
+        self.payment_method = PaymentMethod.objects.create(key="cod", name="Cash on delivery")
+        _, self.products = create_catalog()
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create(self, price, payment_method=None):
+        response = self.client.post("/orders/create", {
+            "user_id": str(self.user.id),
+            "payment_method": str(payment_method.id) if payment_method else None,
+            "items": [{"product": str(self.products[0].id), "quantity": 2, "price": price}],
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        return response.data["data"]
+
+    def report(self, **params):
+        response = self.client.get("/reports/orders", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def by_status(self):
+        return {row["status"]: (row["order_count"], row["revenue"]) for row in self.report(group_by="status")["data"]}
+
+    def test_rollup_follows_order_writes(self):
+        first = self.create("10.00", self.payment_method)
+        second = self.create("2.50")
+        self.assertEqual(self.by_status(), {"pending": (2, "25.00")})
+
+        self.client.patch(f"/orders/update/{first['id']}", {
+            "status": "paid",
+            "items": [{"product": str(self.products[0].id), "quantity": 3, "price": "10.00"}],
+        }, format="json")
+        self.assertEqual(self.by_status(), {"pending": (1, "5.00"), "paid": (1, "30.00")})
+
+        bulk_transition([first["id"], second["id"]], "canceled")
+        self.assertEqual(self.by_status(), {"canceled": (2, "35.00")})
+
+        report = self.report()
+        self.assertEqual(report["summary"], {"order_count": 2, "revenue": "35.00"})
+        self.assertEqual(
+            {row["payment_method"]: row["revenue"] for row in report["data"]},
+            {str(self.payment_method.id): "30.00", None: "5.00"}
+        )
+
+        # Rebuild từ bảng Order cho ra cùng kết quả
+        call_command("rebuild_order_stats", stdout=StringIO())
+        self.assertEqual(self.report(), report)
+
+    def test_writes_insert_deltas_until_compacted(self):
+        first = self.create("10.00", self.payment_method)
+        self.create("5.00", self.payment_method)
+        bulk_transition([first["id"]], "paid")
+        report = self.report()
+
+        # Không đọc / UPDATE row có sẵn: mỗi thay đổi INSERT row mới
+        self.assertEqual(OrderDailyStat.objects.count(), 4)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.create("1.00", self.payment_method)
+
+        self.assertFalse([query for query in queries if "api_orderdailystat" in query["sql"] and "SELECT" in query["sql"]])
+
+        call_command("compact_order_stats", stdout=StringIO())
+
+        # pending: 2 order (trong đó 1 đã chuyển sang paid) + 1 order mới => 1 row; paid: 1 row
+        self.assertEqual(
+            sorted(OrderDailyStat.objects.values_list("status", "order_count")), [("paid", 1), ("pending", 2)]
+        )
+        self.assertEqual(self.by_status(), {"pending": (2, "12.00"), "paid": (1, "20.00")})
+        self.assertEqual(report["summary"], {"order_count": 2, "revenue": "30.00"})
+
+        # Bucket về 0 bị xóa
+        bulk_transition([first["id"]], "shipped")
+        call_command("compact_order_stats", stdout=StringIO())
+        self.assertEqual(
+            sorted(OrderDailyStat.objects.values_list("status", "order_count")), [("pending", 2), ("shipped", 1)]
+        )
+
+    def test_rebuild_covers_orders_written_without_api(self):
+        create_orders(self.user, self.payment_method, self.products, 3)
+        self.assertEqual(self.report()["data"], [])
+
+        call_command("rebuild_order_stats", stdout=StringIO())
+
+        report = self.report(group_by="month,payment_method")
+        self.assertEqual(len(report["data"]), 1)
+        self.assertEqual(report["data"][0]["order_count"], 3)
+        self.assertEqual(report["data"][0]["payment_method"], str(self.payment_method.id))
+        self.assertEqual(OrderDailyStat.objects.count(), 1)
+
+    # Tổng đọc bằng row lock của order trong transaction rebuild: thay đổi chạy song song không bị mất / tính 2 lần
+    def test_rebuild_locks_orders_while_reading_totals(self):
+        self.create("10.00", self.payment_method)
+        expected = self.by_status()
+        select_for_update = QuerySet.select_for_update
+
+        with mock.patch.object(QuerySet, "select_for_update", autospec=True, side_effect=select_for_update) as locked:
+            with CaptureQueriesContext(connection) as queries:
+                call_command("rebuild_order_stats", stdout=StringIO())
+
+        self.assertEqual([call.args[0].model for call in locked.call_args_list], [Order])
+
+        statements = [query["sql"] for query in queries]
+        read = next(i for i, sql in enumerate(statements) if sql.startswith("SELECT") and "api_order" in sql)
+        delete = next(i for i, sql in enumerate(statements) if sql.startswith("DELETE"))
+        self.assertLess(read, delete)
+        self.assertEqual(self.by_status(), expected)
+
+    def test_filters_and_invalid_params(self):
+        self.create("1.00")
+        today = self.report()["data"][0]["day"]
+
+        self.assertEqual(self.report(**{"from": today, "to": today})["summary"]["order_count"], 1)
+        self.assertEqual(self.report(**{"from": "2999-01-01"})["data"], [])
+        self.assertEqual(self.report(status="paid")["data"], [])
+
+        for params in ({"group_by": "day,month"}, {"group_by": "user"}, {"from": "yesterday"}, {"status": "lost"}):
+            self.assertEqual(self.client.get("/reports/orders", params).status_code, 400)
+
+
+class ProductSalesTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tester", name="Tester", password="x")
+        _, self.products = create_catalog()
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create(self, *items):
+        response = self.client.post("/orders/create", {"user_id": str(self.user.id), "items": [
+            {"product": str(self.products[index].id), "quantity": quantity, "price": "1.50"}
+            for index, quantity in items
+        ]}, format="json")
+        self.assertEqual(response.status_code, 201)
+        return response.data["data"]
+
+    def counters(self):
+        return {
+            product.name: (product.units_sold, product.revenue)
+            for product in Product.objects.filter(units_sold__gt=0)
+        }
+
+    def test_checkout_only_inserts_deltas_until_flush(self):
+        first = self.create((0, 2), (1, 1))
+        self.create((0, 3))
+
+        self.assertEqual(self.counters(), {})
+        self.assertEqual(ProductSalesDelta.objects.count(), 3)
+
+        call_command("flush_product_sales", stdout=StringIO())
+        self.assertEqual(self.counters(), {
+            "Product 0": (5, Decimal("7.50")), "Product 1": (1, Decimal("1.50"))
+        })
+        self.assertEqual(ProductSalesDelta.objects.count(), 0)
+
+        # Đổi item + hủy order qua bulk status
+        self.client.patch(f"/orders/update/{first['id']}", {"items": [
+            {"product": str(self.products[2].id), "quantity": 4, "price": "1.50"},
+        ]}, format="json")
+        call_command("flush_product_sales", stdout=StringIO())
+        self.assertEqual(self.counters(), {
+            "Product 0": (3, Decimal("4.50")), "Product 2": (4, Decimal("6.00"))
+        })
+
+        bulk_transition([first["id"]], "canceled")
+        call_command("flush_product_sales", batch_size=1, stdout=StringIO())
+        expected = {"Product 0": (3, Decimal("4.50"))}
+        self.assertEqual(self.counters(), expected)
+
+        # Rebuild từ order item cho cùng kết quả
+        Product.objects.update(units_sold=0, revenue=0)
+        call_command("flush_product_sales", rebuild=True, stdout=StringIO())
+        self.assertEqual(self.counters(), expected)
+
+    def test_best_sellers_and_sort(self):
+        self.create((0, 1), (1, 5), (2, 2))
+        call_command("flush_product_sales", stdout=StringIO())
+
+        data = self.client.get("/products/best_sellers", {"limit": 2}).json()["data"]
+        self.assertEqual([(product["name"], product["units_sold"]) for product in data], [
+            ("Product 1", 5), ("Product 2", 2)
+        ])
+        self.assertEqual(data[0]["revenue"], "7.50")
+
+        response = self.client.get("/products", {"sort": "-units_sold"})
+        self.assertEqual([product["name"] for product in response.json()["data"]], ["Product 1", "Product 2", "Product 0"])
+
+        response = self.client.get("/products", {"sort": "units_sold", "cursor": "", "limit": 2})
+        self.assertEqual([product["name"] for product in response.json()["data"]], ["Product 0", "Product 2"])
+        response = self.client.get("/products", {"sort": "units_sold", "cursor": response.json()["paging"]["next_cursor"]})
+        self.assertEqual([product["name"] for product in response.json()["data"]], ["Product 1"])
+
+        self.assertEqual(self.client.get("/products", {"sort": "name"}).status_code, 400)
+        self.assertEqual(self.client.get("/products/best_sellers", {"by": "price"}).status_code, 400)
+
+
+class CategoryFilterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.drinks, self.snacks = Category.objects.create(name="Drinks"), Category.objects.create(name="Snacks")
+        self.client = APIClient()
+
+    def create(self, name, price, *categories):
+        response = self.client.post("/products/create", {
+            "name": name, "price": price, "description": name,
+            "category_ids": [str(category.id) for category in categories],
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        return response.data["data"]["id"]
+
+    def names(self, **params):
+        response = self.client.get("/products", {"limit": 50, **params})
+        return sorted(product["name"] for product in response.json()["data"])
+
+    def links(self):
+        return set(CategoryProduct.objects.values_list("category_id", "product_id", "is_active", "price"))
+
+    def test_filter_follows_product_and_link_changes(self):
+        cola = self.create("Cola", 1000, self.drinks)
+        chips = self.create("Chips", 3000, self.snacks, self.drinks)
+        self.create("Nuts", 5000, self.snacks)
+
+        self.assertEqual(self.names(category=str(self.drinks.id)), ["Chips", "Cola"])
+        self.assertEqual(self.names(category=str(self.drinks.id), min_price=2000), ["Chips"])
+        self.assertEqual(self.names(category="not-a-uuid"), [])
+
+        # Đổi price / is_active / category của product
+        self.client.patch(f"/products/update/{cola}", {"price": 2500, "is_active": False}, format="json")
+        self.client.patch(f"/products/update/{chips}", {"category_ids": [str(self.snacks.id)]}, format="json")
+
+        self.assertEqual(self.names(category=str(self.drinks.id), min_price=2000), ["Cola"])
+        self.assertEqual(self.names(category=str(self.drinks.id), is_active="true"), [])
+        self.assertEqual(self.names(category=str(self.snacks.id), max_price=4000), ["Chips"])
+
+        # Thêm từ phía category, rồi clear
+        self.snacks.products.add(cola)
+        self.assertEqual(self.names(category=str(self.snacks.id)), ["Chips", "Cola", "Nuts"])
+        self.snacks.products.clear()
+        self.assertEqual(self.names(category=str(self.snacks.id)), [])
+
+        links = self.links()
+        call_command("rebuild_category_products", stdout=StringIO())
+        self.assertEqual(self.links(), links)
+
+    # UPDATE hàng loạt qua update_listing(): category_product đổi theo, audit không thấy lệch
+    def test_bulk_update_keeps_links_in_sync(self):
+        self.create("Cola", 1000, self.drinks)
+        self.create("Chips", 3000, self.snacks, self.drinks)
+        self.assertEqual(self.client.get("/products", {"category": str(self.drinks.id)}).data["paging"]["total_item"], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            updated = Product.objects.filter(is_active=True, price__lt=2000).update_listing(
+                is_active=False, price=F("price") * 3
+            )
+
+        self.assertEqual(updated, 1)
+        self.assertEqual(self.names(category=str(self.drinks.id), is_active="false", min_price=3000), ["Cola"])
+        response = self.client.get("/products", {"category": str(self.drinks.id), "is_active": "true"})
+        self.assertEqual(response.data["paging"]["total_item"], 1)
+        call_command("audit_category_products", stdout=StringIO())
+
+    def test_audit_reports_and_fixes_drift(self):
+        cola = self.create("Cola", 1000, self.drinks)
+        self.create("Chips", 3000, self.snacks)
+        links = self.links()
+
+        # update() / SQL tay bỏ qua đồng bộ
+        Product.objects.filter(pk=cola).update(price=1500)
+        CategoryProduct.objects.filter(category=self.snacks).delete()
+        CategoryProduct.objects.create(category=self.snacks, product_id=cola, is_active=True, price=1000)
+
+        with self.assertRaisesMessage(CommandError, "1 missing, 1 extra, 2 stale category links"):
+            call_command("audit_category_products", stdout=StringIO())
+
+        call_command("audit_category_products", "--fix", stdout=StringIO())
+
+        expected = {
+            (category, product, is_active, 1500 if str(product) == cola else price)
+            for category, product, is_active, price in links
+        }
+        self.assertEqual(self.links(), expected)
+        call_command("audit_category_products", stdout=StringIO())
+
+    def test_import_creates_links(self):
+        self.client.post("/products/import", [
+            {"name": "Tea", "price": 100, "description": "Tea", "category_ids": [str(self.drinks.id)] * 2},
+        ], format="json")
+
+        self.assertEqual(self.names(category=str(self.drinks.id)), ["Tea"])
+        self.assertEqual(CategoryProduct.objects.count(), 1)
+
+    def test_count_cache_is_per_category(self):
+        self.create("Cola", 1000, self.drinks)
+        nuts = self.create("Nuts", 5000, self.snacks)
+
+        self.assertEqual(self.client.get("/products", {"category": str(self.drinks.id)}).data["paging"]["total_item"], 1)
+
+        # Product của category khác thay đổi: count của drinks vẫn lấy từ cache (product + category)
+        self.client.patch(f"/products/update/{nuts}", {"price": 6000}, format="json")
+
+        with self.assertNumQueries(2):
+            self.client.get("/products", {"category": str(self.drinks.id)})
+
+        self.create("Water", 500, self.drinks)
+        self.assertEqual(self.client.get("/products", {"category": str(self.drinks.id)}).data["paging"]["total_item"], 2)
+
+
+class ProfilingTest(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.user = User.objects.create(username="tester", name="Tester", password="x")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            _, self.products = create_catalog()
+
+    def test_server_timing_and_metrics_per_route(self):
+        response = APIClient().get(f"/products/detail/{self.products[0].id}")
+
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="2 queries", serialize;dur=[\d.]+$')
+
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn('shop_http_requests_total{endpoint="/products/detail/<path:id>",method="GET",status="200"} 1', body)
+        self.assertIn('shop_db_queries_total{endpoint="/products/detail/<path:id>"} 2', body)
+        self.assertIn('shop_http_request_duration_seconds_count{endpoint="/products/detail/<path:id>"} 1', body)
+
+        _, endpoints, _ = metrics.snapshot()
+        self.assertGreater(endpoints["/products/detail/<path:id>"][4], 0)
+
+    def test_async_view_queries_are_counted(self):
+        response = self.client.get("/async/products")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('desc="3 queries"', response["Server-Timing"])
+
+    def test_repeated_queries_are_reported(self):
+        with profiled() as profile:
+            for product in self.products:
+                list(Category.objects.filter(products=product))
+
+            Product.objects.filter(id__in=[product.id for product in self.products]).count()
+            Product.objects.filter(id__in=[self.products[0].id]).count()
+
+        duplicates = profile.duplicates(threshold=2)
+        self.assertEqual(list(duplicates.values()), [3, 2])
+        self.assertIn("IN (%s, ...)", list(duplicates)[1])
+
+        self.assertEqual(fingerprint("SELECT 1 LIMIT 21"), "SELECT ? LIMIT ?")
+
+    def test_repeated_query_in_request_is_exported(self):
+        payment_method = PaymentMethod.objects.create(key="cod", name="Cash on delivery")
+        orders = create_orders(self.user, payment_method, self.products, 2, items_per_order=1)
+        Order.objects.filter(pk=orders[0].pk).update(status="paid")
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        # 1 UPDATE cho mỗi status nguồn (pending, paid): cùng fingerprint 2 lần
+        with override_settings(PROFILING_DUPLICATE_THRESHOLD=2):
+            response = client.post("/orders/bulk_status", {
+                "ids": [str(order.id) for order in orders], "status": "canceled"
+            }, format="json")
+
+        self.assertIn("repeated", response["Server-Timing"])
+
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn('shop_duplicate_query_requests_total{endpoint="/orders/bulk_status"} 1', body)
+        self.assertRegex(body, r'shop_duplicate_queries_total\{endpoint="/orders/bulk_status",fingerprint="[0-9a-f]{12}"\} 2')
+        self.assertNotIn("UPDATE", body)
+
+    def test_method_label_is_bounded(self):
+        self.client.generic("PROPFIND", "/categories")
+        self.client.head("/categories")
+
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn('shop_http_requests_total{endpoint="/categories",method="other",status="405"} 2', body)
+        self.assertNotIn("PROPFIND", body)
+
+    @override_settings(METRICS_TOKEN="secret", METRICS_ALLOWED_NETWORKS=["10.0.0.0/8"])
+    def test_metrics_require_internal_network_or_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret").status_code, 200)
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.1.2.3").status_code, 200)
+
+        with override_settings(METRICS_TOKEN=""):
+            self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer ").status_code, 403)
+
+    # Server-Timing chỉ gắn cho client được đọc /metrics
+    @override_settings(METRICS_TOKEN="secret", METRICS_ALLOWED_NETWORKS=["10.0.0.0/8"])
+    def test_server_timing_requires_internal_network_or_token(self):
+        url = f"/products/detail/{self.products[0].id}"
+
+        self.assertNotIn("Server-Timing", self.client.get(url))
+        self.assertNotIn("Server-Timing", self.client.get(url, HTTP_AUTHORIZATION="Bearer wrong"))
+        self.assertIn("Server-Timing", self.client.get(url, HTTP_AUTHORIZATION="Bearer secret"))
+        self.assertIn("Server-Timing", self.client.get(url, REMOTE_ADDR="10.1.2.3"))
+
+        # Vẫn được đếm vào metrics
+        body = self.client.get("/metrics", REMOTE_ADDR="10.1.2.3").content.decode()
+        self.assertIn('shop_http_requests_total{endpoint="/products/detail/<path:id>",method="GET",status="200"} 4', body)
+
+
+class StructuredLoggingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tester", name="Tester", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    # Gắn handler ghi vào StringIO, trả về các record JSON sau khi listener ghi hết queue
+    def capture_logs(self, run, logger_name="api"):
+        stream = StringIO()
+        handler = AsyncJSONHandler(stream=stream)
+        handler.addFilter(SamplingFilter())
+        handler.addFilter(RequestContextFilter())
+        logger = logging.getLogger(logger_name)
+        logger.addHandler(handler)
+
+        try:
+            run()
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    def test_access_log_has_request_id_and_endpoint(self):
+        response = None
+
+        def run():
+            nonlocal response
+            response = self.client.get("/reports/orders", HTTP_X_REQUEST_ID="req-123")
+
+        records = self.capture_logs(run)
+
+        self.assertEqual(response["X-Request-ID"], "req-123")
+        access = [record for record in records if record["logger"] == "api.access"]
+        self.assertEqual(len(access), 1)
+        self.assertEqual(access[0]["request_id"], "req-123")
+        self.assertEqual(access[0]["endpoint"], "/reports/orders")
+        self.assertEqual(access[0]["status"], 200)
+        self.assertEqual(access[0]["level"], "INFO")
+        self.assertIn("latency_ms", access[0])
+
+    def test_controller_error_is_logged_with_traceback(self):
+        def run():
+            with mock.patch("api.report_controller.parse_group_by", side_effect=RuntimeError("boom")):
+                response = self.client.get("/reports/orders")
+
+            self.assertEqual(response.status_code, 500)
+            self.assertEqual(response.data, {"success": False, "message": "Something wrong"})
+
+        records = self.capture_logs(run)
+
+        error = next(record for record in records if record["logger"] == "api.report_controller")
+        self.assertEqual(error["level"], "ERROR")
+        self.assertIn("RuntimeError: boom", error["exc"])
+        self.assertEqual(error["endpoint"], "/reports/orders")
+
+        access = next(record for record in records if record["logger"] == "api.access")
+        self.assertEqual(access["level"], "WARNING")
+        self.assertEqual(access["request_id"], error["request_id"])
+
+    def test_non_primitive_extras_are_dropped_or_converted(self):
+        request = RequestFactory().get("/metrics")
+        records = self.capture_logs(lambda: logging.getLogger("api.test").warning("Forbidden", extra={
+            "request": request, "status_code": 403, "ids": (uuid.UUID(int=1),), "user": self.user,
+        }))
+
+        self.assertNotIn("request", records[0])
+        self.assertEqual(records[0]["status_code"], 403)
+        self.assertEqual(records[0]["ids"], [str(uuid.UUID(int=1))])
+        self.assertEqual(records[0]["user"], str(self.user))
+
+    def test_sampling_keeps_warnings(self):
+        def run():
+            self.client.get("/reports/orders")
+
+            with override_settings(LOG_SLOW_REQUEST_MS=0):
+                self.client.get("/reports/orders")
+
+        with override_settings(LOG_SAMPLE_RATES={"api.access": 0.0}):
+            records = self.capture_logs(run, "api.access")
+
+        self.assertEqual([record["level"] for record in records], ["WARNING"])
+
+    def test_full_queue_drops_records(self):
+        handler = AsyncJSONHandler(stream=StringIO(), queue_size=2)
+        # Giả lập listener đã chạy nhưng chưa kịp lấy record nào khỏi queue
+        handler.pid = os.getpid()
+        logger = logging.getLogger("api.tests.dropped")
+        logger.propagate = False
+        logger.addHandler(handler)
+
+        try:
+            for i in range(5):
+                logger.warning("record %s", i)
+        finally:
+            logger.removeHandler(handler)
+            logger.propagate = True
+
+        self.assertEqual(handler.queue.qsize(), 2)
+        self.assertEqual(handler.dropped, 3)
+
+        # Queue có chỗ: record tiếp theo đi kèm 1 record báo số record đã bỏ
+        handler.queue.get_nowait()
+        handler.queue.get_nowait()
+        handler.emit(logging.makeLogRecord({"msg": "after", "levelno": logging.INFO}))
+
+        self.assertEqual(handler.dropped, 0)
+        self.assertEqual(handler.queue.get_nowait().dropped, 3)
+        self.assertEqual(handler.queue.get_nowait().msg, "after")
+
+
+class BenchmarkSuiteTest(TestCase):
+    def setUp(self):
+        self.data = seed_benchmark(20, 10, num_categories=3, num_users=3)
+
+    def test_default_mix_covers_every_route(self):
+        result = run_benchmark(DEFAULT_MIX, self.data)
+
+        self.assertEqual(result["uncovered_routes"], [])
+        self.assertEqual(result["total"]["requests"], sum(entry.get("weight", 1) for entry in DEFAULT_MIX))
+
+        for name, stats in result["endpoints"].items():
+            self.assertTrue(all(int(code) < 400 for code in stats["statuses"]), (name, stats["statuses"]))
+
+        detail = result["endpoints"]["GET /products/detail/<path:id>"]
+        self.assertEqual(detail["queries_per_request"], 2)
+        self.assertLessEqual(detail["p50_ms"], detail["p95_ms"])
+        self.assertLessEqual(detail["p95_ms"], detail["p99_ms"])
+
+    def test_schedule_is_reproducible(self):
+        mix = [
+            {"method": "GET", "path": "/products/detail/{product_id}", "weight": 3},
+            {"method": "POST", "path": "/categories/create", "body": {"name": "C {seq}"}},
+        ]
+
+        first = build_schedule(mix, self.data, rounds=2, seed=7)
+        self.assertEqual(first, build_schedule(mix, self.data, rounds=2, seed=7))
+        self.assertEqual(len(first), 8)
+
+        paths = [path for _, method, path, _, _ in first if method == "GET"]
+        self.assertEqual(paths[:3], [f"/products/detail/{product.id}" for product in self.data["products"][:3]])
+
+        bodies = [body for _, method, _, body, _ in first if method == "POST"]
+        self.assertEqual(bodies, [{"name": "C 1"}, {"name": "C 2"}])
+
+    def test_compare_results_reports_regressions(self):
+        def result(p95, queries, errors=0):
+            return {"endpoints": {"GET /products": {"p95_ms": p95, "queries_per_request": queries, "errors": errors}}}
+
+        self.assertEqual(compare_results(result(10, 2), result(11.5, 2)), [])
+        self.assertEqual(len(compare_results(result(10, 2), result(13, 3, errors=1))), 3)
+        # p95 cũ quá nhỏ: bỏ qua nhiễu đo
+        self.assertEqual(compare_results(result(0.5, 2), result(0.9, 2)), [])
+
+    def test_load_mix_requires_path(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as file:
+            file.write('{"method": "GET", "path": "/products"}\n\n{"request_id": "x"}\n')
+
+        try:
+            with self.assertRaisesMessage(ValueError, "Line 3"):
+                load_mix(file.name)
+        finally:
+            os.unlink(file.name)
+
+
+class ConnectionPoolTest(TestCase):
+    alias = "pool_test"
+
+    def setUp(self):
+        pools.pop(self.alias, None)
+        self.directory = tempfile.TemporaryDirectory()
+        self.wrappers = []
+
+    def tearDown(self):
+        # Wrapper tạo trong thread khác: cho phép đóng từ thread của test
+        for wrapper in self.wrappers:
+            wrapper.inc_thread_sharing()
+            wrapper.close()
+
+        pool = pools.pop(self.alias, None)
+
+        if pool is not None:
+            pool.close_idle()
+
+        self.directory.cleanup()
+
+    # Mỗi thread 1 wrapper (giống connections[alias] của Django), cùng alias => cùng pool
+    def connect(self, timeout=0.05, max_age=60):
+        wrapper = PooledSQLiteWrapper({
+            **connections["default"].settings_dict,
+            "ENGINE": "api.db.sqlite3",
+            "NAME": os.path.join(self.directory.name, "pool.sqlite3"),
+            "CONN_MAX_AGE": max_age,
+            "CONN_HEALTH_CHECKS": True,
+            "POOL": {"SIZE": 1, "TIMEOUT": timeout},
+        }, alias=self.alias)
+        wrapper.ensure_connection()
+        self.wrappers.append(wrapper)
+        return wrapper
+
+    def in_thread(self, run):
+        result = {}
+
+        def target():
+            try:
+                result["wrapper"] = run()
+            except Exception as error:
+                result["error"] = error
+
+        thread = threading.Thread(target=target)
+        thread.start()
+        return thread, result
+
+    # Giả lập request_finished trong thread đang giữ connection
+    def finish_request(self, *wrappers):
+        with mock.patch("api.db.pool.connections.all", return_value=list(wrappers)):
+            return_connections()
+
+    def test_pool_bounds_open_connections(self):
+        first = self.connect()
+        pool = first.pool
+
+        thread, result = self.in_thread(self.connect)
+        thread.join()
+
+        self.assertIsInstance(result["error"], PoolTimeout)
+        self.assertEqual(pool.snapshot()["in_use"], 1)
+        self.assertEqual(pool.snapshot()["timeouts"], 1)
+
+        # Đóng connection: trả chỗ cho connection tiếp theo
+        first.close()
+        second = self.connect()
+        self.assertEqual(second.pool.snapshot()["opened"], 2)
+        self.assertEqual(second.pool.snapshot()["peak"], 1)
+
+    # Thread rảnh không giữ connection: nhiều thread hơn SIZE vẫn chạy tuần tự được, dùng chung 1 connection
+    def test_request_end_returns_connection_for_reuse(self):
+        first = self.connect()
+        raw = first.connection
+        self.finish_request(first)
+
+        self.assertIsNone(first.connection)
+        self.assertEqual(first.pool.snapshot()["idle"], 1)
+
+        for _ in range(3):
+            thread, result = self.in_thread(self.connect)
+            thread.join()
+            self.assertNotIn("error", result)
+            self.assertIs(result["wrapper"].connection, raw)
+            self.finish_request(result["wrapper"])
+
+        # Request sau của thread cũ cũng lấy lại từ pool
+        with first.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+        snapshot = first.pool.snapshot()
+        self.assertEqual((snapshot["opened"], snapshot["reused"], snapshot["timeouts"]), (1, 4, 0))
+
+    def test_request_end_hands_connection_to_waiting_thread(self):
+        first = self.connect()
+        pool = first.pool
+
+        thread, result = self.in_thread(lambda: self.connect(timeout=5))
+
+        while not pool.snapshot()["waiting"]:
+            time.sleep(0.001)
+
+        self.finish_request(first)
+        thread.join()
+
+        self.assertNotIn("error", result)
+        snapshot = pool.snapshot()
+        self.assertEqual((snapshot["open"], snapshot["in_use"], snapshot["waits"], snapshot["timeouts"]), (1, 1, 1, 0))
+        self.assertGreater(snapshot["wait_time"], 0)
+
+    def test_connection_in_transaction_is_not_returned(self):
+        first = self.connect()
+
+        # Wrapper không nằm trong django.db.connections (không dùng được atomic()): đặt cờ như atomic()
+        first.in_atomic_block = True
+        self.finish_request(first)
+        first.in_atomic_block = False
+
+        self.assertIsNotNone(first.connection)
+        self.assertEqual(first.pool.snapshot()["in_use"], 1)
+
+    def test_expired_connection_is_closed(self):
+        first = self.connect(max_age=0)
+        self.finish_request(first)
+
+        snapshot = first.pool.snapshot()
+        self.assertEqual((snapshot["open"], snapshot["idle"]), (0, 0))
+
+    def test_unusable_idle_connection_is_replaced(self):
+        first = self.connect()
+        raw = first.connection
+        self.finish_request(first)
+
+        # Giả lập MySQL đã đóng connection rảnh (wait_timeout), is_usable() của SQLite luôn True
+        with mock.patch.object(PooledSQLiteWrapper, "is_usable", return_value=False):
+            second = self.connect()
+
+        self.assertIsNot(second.connection, raw)
+        snapshot = second.pool.snapshot()
+        self.assertEqual((snapshot["opened"], snapshot["open"], snapshot["in_use"]), (2, 1, 1))
+
+    def test_collected_wrapper_releases_slot(self):
+        wrapper = self.connect()
+        pool = wrapper.pool
+        self.wrappers.clear()
+        del wrapper
+        gc.collect()
+
+        self.assertEqual(pool.snapshot()["in_use"], 0)
+
+    def test_pool_metrics_are_exported(self):
+        self.connect()
+
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn('shop_db_pool_in_use{alias="pool_test"} 1', body)
+        self.assertIn('shop_db_pool_size{alias="pool_test"} 1', body)
+        self.assertIn('shop_db_pool_reused_total{alias="pool_test"} 0', body)
+
+
+# Không chạy trong transaction của TestCase: đọc trong transaction luôn đi primary
+@override_settings(DATABASE_REPLICAS=["replica"], REPLICA_CHECK_INTERVAL=60)
+class ReplicaRouterTest(SimpleTestCase):
+    databases = {"default"}
+
+    def setUp(self):
+        cache.clear()
+        replica_health.reset()
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, routing):
+        token = current_routing.set(routing)
+        self.addCleanup(current_routing.reset, token)
+
+    # Pin trong LocMem không tới được worker khác: không cho bật replica
+    def test_replicas_require_shared_pin_cache(self):
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}):
+            with self.assertRaises(ImproperlyConfigured):
+                replica_middleware(lambda request: None)
+
+        with mock.patch("api.db.router.is_shared", return_value=True):
+            replica_middleware(lambda request: None)
+
+        with override_settings(DATABASE_REPLICAS=[]):
+            replica_middleware(lambda request: None)
+
+    def test_reads_go_to_replica_until_request_writes(self):
+        self.route(RequestRouting("replica"))
+
+        self.assertEqual(self.router.db_for_read(Product), "replica")
+        self.assertEqual(self.router.db_for_write(Product), "default")
+        self.assertEqual(self.router.db_for_read(Product), "default")
+
+    def test_reads_outside_request_or_in_transaction_go_to_primary(self):
+        self.assertEqual(self.router.db_for_read(Product), "default")
+
+        self.route(RequestRouting("replica"))
+
+        with mock.patch.object(connections["default"], "in_atomic_block", True):
+            self.assertEqual(self.router.db_for_read(Product), "default")
+
+        self.assertFalse(self.router.allow_migrate("replica", "api"))
+        self.assertIsNone(self.router.allow_migrate("default", "api"))
+
+    @mock.patch("api.db.router.check_replica", return_value=True)
+    def test_client_reads_primary_after_write(self, check_replica):
+        auth = {"HTTP_AUTHORIZATION": "Bearer a"}
+
+        self.assertEqual(start_routing(self.factory.get("/products", **auth)).replica, "replica")
+        self.assertIsNone(start_routing(self.factory.post("/orders/create", **auth)).replica)
+
+        routing = RequestRouting()
+        routing.wrote = True
+        finish_routing(self.factory.post("/orders/create", **auth), routing)
+
+        self.assertIsNone(start_routing(self.factory.get("/products", **auth)).replica)
+        # Client khác không bị ảnh hưởng
+        self.assertEqual(start_routing(self.factory.get("/products", HTTP_AUTHORIZATION="Bearer b")).replica, "replica")
+        # Kết quả kiểm tra replica được dùng lại trong REPLICA_CHECK_INTERVAL
+        self.assertEqual(check_replica.call_count, 1)
+
+    @override_settings(REPLICA_MAX_LAG=5)
+    def test_lagging_or_unavailable_replica_falls_back_to_primary(self):
+        replica = mock.MagicMock(vendor="mysql")
+        cursor = replica.cursor.return_value.__enter__.return_value
+        cursor.description = [("Replica_IO_Running",), ("Seconds_Behind_Source",)]
+
+        with mock.patch.dict(connections._connections.__dict__, {"replica": replica}):
+            for row, healthy in ((("Yes", 2),), True), ((("Yes", 30),), False), ((("No", None),), False), ((None,), False):
+                cursor.fetchone.side_effect = row
+                replica_health.reset()
+                self.assertEqual(start_routing(self.factory.get("/products")).replica, "replica" if healthy else None)
+
+            cursor.execute.side_effect = OperationalError("gone")
+            replica_health.reset()
+            self.assertIsNone(start_routing(self.factory.get("/products")).replica)
+            replica.close.assert_called()
+
+    def test_replica_lag_of_non_replicated_backend(self):
+        self.assertEqual(replica_lag(connections["default"]), 0)
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+# Cache user đã xác thực trong process (LRU có giới hạn + TTL ngắn)
+# Key là (user_id, jti) của access token, User save / delete sẽ xóa mọi entry của user đó
+
+def get_max_size():
+    return getattr(settings, "AUTH_USER_CACHE_SIZE", 1024)
+
+def get_ttl():
+    return getattr(settings, "AUTH_USER_CACHE_TTL", 30)
+
+
+class UserCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # (user_id, jti) -> (expires_at, user)
+        self.hits = 0
+        self.misses = 0
+        self.claim_hits = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, user):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + get_ttl(), user)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > get_max_size():
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    # User bị sửa / khóa / xóa -> bỏ mọi token đã cache của user
+    def invalidate_user(self, user_id):
+        user_id = str(user_id)
+
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == user_id]:
+                del self.entries[key]
+
+    # User dựng từ claim trong token, không query DB
+    def record_claim_hit(self):
+        with self.lock:
+            self.claim_hits += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.claim_hits = 0
+            self.evictions = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "claim_hits": self.claim_hits,
+                "evictions": self.evictions,
+                "size": len(self.entries),
+            }
+
+
+user_cache = UserCache()
+
+# Prometheus text format, /metrics (xem metrics_controller.py)
+def render_user_cache_metrics():
+    lines = []
+    stats = user_cache.stats()
+
+    for name, key, metric_type, help_text in (
+        ("shop_auth_user_cache_hits_total", "hits", "counter", "Authenticated users served from the cache"),
+        ("shop_auth_user_cache_misses_total", "misses", "counter", "Cache lookups that had to load the user"),
+        ("shop_auth_user_cache_claim_hits_total", "claim_hits", "counter", "Users built from token claims without a query"),
+        ("shop_auth_user_cache_evictions_total", "evictions", "counter", "Entries evicted to stay under AUTH_USER_CACHE_SIZE"),
+        ("shop_auth_user_cache_size", "size", "gauge", "Cached (user, token) entries"),
+    ):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.append(f"{name} {stats[key]}")
+
+    return "\n".join(lines) + "\n"
@@ -1,6 +1,8 @@
+from django.http import HttpResponse
 from rest_framework.views import exception_handler
 from rest_framework.response import Response
 from rest_framework import status
+from .renderers import render_json
 
 def handle_exception(exc, context):
     response = exception_handler(exc, context)
@@ -18,3 +20,17 @@ def handle_exception(exc, context):
             }
 
     return response
+
+# Dùng cho các async view (không qua DRF): render giống hệt Response của DRF
+def json_response(data, status=status.HTTP_200_OK):
+    return raw_json_response(render_json(data), status=status)
+
+# `body` là JSON bytes đã render sẵn
+def raw_json_response(body, status=status.HTTP_200_OK):
+    return HttpResponse(body, content_type="application/json", status=status)
+
+def unauthorized_response():
+    return json_response({
+        "success": False,
+        "message": "Token invalid or missing"
+    }, status=status.HTTP_401_UNAUTHORIZED)
@@ -21,14 +21,6 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Load file .env
 load_dotenv(os.path.join(BASE_DIR, '.env'))
 
-print("🔍 DEBUG ENV:")
-print("CLIENT_URL =", os.getenv('CLIENT_URL'))
-print("DB_NAME =", os.getenv('DB_NAME'))
-print("DB_USER =", os.getenv('DB_USER'))
-print("DB_PASSWORD =", os.getenv('DB_PASSWORD'))
-print("DB_HOST =", os.getenv('DB_HOST'))
-print("DB_PORT =", os.getenv('DB_PORT'))
-
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
@@ -56,6 +48,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Đo thời gian / query của từng request, đặt đầu tiên để tính cả các middleware khác (xem api/profiling.py)
+    'api.profiling.profiling_middleware',
+    # Request id + access log JSON (xem api/structured_logging.py)
+    'api.structured_logging.request_logging_middleware',
+    # Request đọc (GET) dùng read replica (xem api/db/router.py)
+    'api.db.router.replica_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -96,9 +94,102 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'api.authentication.UUIDJWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    # auto | orjson | msgspec | json (xem api/renderers.py)
+    'JSON_RENDERER_BACKEND': os.getenv('JSON_RENDERER_BACKEND', 'auto'),
     "EXCEPTION_HANDLER": "api.utils.handle_exception",
 }
 
+# Cache: LocMem mặc định, đặt REDIS_URL để dùng cache chung giữa các worker
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+if os.getenv('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    }
+
+# Cache alias + thời gian (giây) cho API category / payment method
+# Nhiều worker: alias phải là cache chung (REDIS_URL), thay đổi mới tới được mọi process
+CATALOG_CACHE_ALIAS = os.getenv('CATALOG_CACHE_ALIAS', 'default')
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 3600))
+# Cache trong process (LocMem): process khác không nhận được invalidate, chỉ giữ vài giây
+CATALOG_LOCAL_CACHE_TIMEOUT = int(os.getenv('CATALOG_LOCAL_CACHE_TIMEOUT', 5))
+
+# Số kết quả tối đa của ?q= khi không chạy trên MySQL (inverted index trong process, xem api/search.py)
+SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS', 1000))
+
+# Thời gian (giây) cache tổng số row của các API list
+COUNT_CACHE_TIMEOUT = int(os.getenv('COUNT_CACHE_TIMEOUT', 60))
+
+# Số order mỗi batch (1 query) khi stream /orders/export
+ORDER_EXPORT_BATCH_SIZE = int(os.getenv('ORDER_EXPORT_BATCH_SIZE', 500))
+
+# Số row mỗi chunk (validate + insert) khi import product
+PRODUCT_IMPORT_CHUNK_SIZE = int(os.getenv('PRODUCT_IMPORT_CHUNK_SIZE', 1000))
+
+# Số order mỗi chunk (1 lần đọc + UPDATE theo status) khi đổi status hàng loạt
+ORDER_BULK_UPDATE_CHUNK_SIZE = int(os.getenv('ORDER_BULK_UPDATE_CHUNK_SIZE', 1000))
+
+# Số ngày gộp mỗi transaction khi gộp các row chênh lệch của rollup report (compact_order_stats)
+ORDER_STATS_COMPACT_BATCH_SIZE = int(os.getenv('ORDER_STATS_COMPACT_BATCH_SIZE', 31))
+
+# Số delta doanh số product gộp vào product mỗi batch (flush_product_sales)
+PRODUCT_SALES_FLUSH_BATCH_SIZE = int(os.getenv('PRODUCT_SALES_FLUSH_BATCH_SIZE', 5000))
+
+# Profiling theo endpoint: header Server-Timing + GET /metrics (xem api/profiling.py)
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'true') == 'true'
+PROFILING_SERVER_TIMING = os.getenv('PROFILING_SERVER_TIMING', 'true') == 'true'
+# Số lần 1 câu query lặp lại trong 1 request để tính là N+1
+PROFILING_DUPLICATE_THRESHOLD = int(os.getenv('PROFILING_DUPLICATE_THRESHOLD', 3))
+# GET /metrics + header Server-Timing: chỉ cho IP thuộc METRICS_ALLOWED_NETWORKS hoặc request có "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOWED_NETWORKS = [network for network in os.getenv('METRICS_ALLOWED_NETWORKS', '127.0.0.0/8,::1/128').split(',') if network]
+
+# Logging: JSON ra stdout qua queue + thread riêng (xem api/structured_logging.py)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+# Tỉ lệ giữ lại record INFO theo logger (1.0 = giữ hết), WARNING trở lên luôn được giữ
+LOG_SAMPLE_RATES = {
+    'api.access': float(os.getenv('LOG_ACCESS_SAMPLE_RATE', 1.0)),
+}
+# Request chậm hơn mức này (ms) được log ở mức WARNING
+LOG_SLOW_REQUEST_MS = int(os.getenv('LOG_SLOW_REQUEST_MS', 1000))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_context': {'()': 'api.structured_logging.RequestContextFilter'},
+        'sampling': {'()': 'api.structured_logging.SamplingFilter'},
+    },
+    'handlers': {
+        'json': {
+            '()': 'api.structured_logging.AsyncJSONHandler',
+            'queue_size': LOG_QUEUE_SIZE,
+            'filters': ['sampling', 'request_context'],
+        },
+    },
+    'root': {
+        'handlers': ['json'],
+        'level': LOG_LEVEL,
+    },
+    'loggers': {
+        'django': {
+            'handlers': ['json'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=1),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
@@ -109,20 +200,68 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',     # key trong payload
 }
 
+# Cache user đã xác thực trong mỗi process (số entry, TTL giây)
+AUTH_USER_CACHE_SIZE = int(os.getenv('AUTH_USER_CACHE_SIZE', 1024))
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', 30))
+
+# True: lấy user từ claim trong token, không query DB.
+# User bị khóa vẫn dùng được token cũ tới khi token hết hạn.
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv('AUTH_TRUST_TOKEN_CLAIMS', 'false') == 'true'
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Backend MySQL của Django + giới hạn số connection mỗi process (xem api/db/pool.py)
+# DB_ENGINE=api.db.sqlite3 + DB_NAME=<file> để chạy local không cần MySQL
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': os.getenv('DB_ENGINE', 'api.db.mysql'),
         'NAME': os.getenv('DB_NAME'),
         'USER': os.getenv('DB_USER'),
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        # Tuổi tối đa của connection trong pool (giây), 0 = đóng sau mỗi request
+        # ASGI: bắt buộc 0 (mỗi request chạy ORM ở thread mới, connection giữ lại theo thread sẽ không được dùng lại)
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        # Kiểm tra connection cũ trước khi dùng lại, MySQL đã đóng (wait_timeout) thì mở connection mới
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'true') == 'true',
+        'POOL': {
+            # Số connection mở cùng lúc tối đa mỗi process (0 = không giới hạn)
+            'SIZE': int(os.getenv('DB_POOL_SIZE', 10)),
+            # Số giây chờ connection khi đã mở đủ SIZE
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 5)),
+        },
     }
 }
 
+# Read replica: DB_REPLICA_HOSTS=host1[:port],host2[:port] (cùng DB_NAME / DB_USER / DB_PASSWORD với primary)
+# Request GET đọc từ replica, write + request sau write đọc primary (xem api/db/router.py)
+DATABASE_REPLICAS = []
+
+for index, replica_host in enumerate(host for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host.strip()):
+    replica_alias = 'replica' if index == 0 else f'replica_{index + 1}'
+    host, _, port = replica_host.strip().partition(':')
+    DATABASES[replica_alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        # Test dùng chung database với default
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(replica_alias)
+
+DATABASE_ROUTERS = ['api.db.router.ReplicaRouter']
+
+# Replica trễ hơn mức này (giây) thì đọc primary
+REPLICA_MAX_LAG = int(os.getenv('DB_REPLICA_MAX_LAG', 5))
+# Chu kỳ kiểm tra lại replica (giây)
+REPLICA_CHECK_INTERVAL = int(os.getenv('DB_REPLICA_CHECK_INTERVAL', 5))
+# Sau request có write, client đó đọc primary thêm bao nhiêu giây
+REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', 5))
+# Cache lưu pin của client: phải là cache chung (REDIS_URL) để worker nào cũng thấy pin
+REPLICA_PIN_CACHE_ALIAS = os.getenv('DB_REPLICA_PIN_CACHE_ALIAS', 'default')
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -16,7 +16,8 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
-from api import product_controller, category_controller, auth_controller, payment_method_controller, order_controller
+from api import product_controller, category_controller, auth_controller, payment_method_controller, order_controller, \
+    report_controller, metrics_controller
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -28,8 +29,10 @@ urlpatterns = [
 
     # Products
     path('products', product_controller.get_list),
+    path('products/best_sellers', product_controller.get_best_sellers),
     path('products/detail/<path:id>', product_controller.get_detail),
     path('products/create', product_controller.create_product),
+    path('products/import', product_controller.import_product_list),
     path('products/update/<path:id>', product_controller.update_product),
 
     # Auth
@@ -44,6 +47,22 @@ urlpatterns = [
     # Order
     path('orders', order_controller.get_list),
     path('orders/detail/<path:id>', order_controller.get_detail),
+    path('orders/export', order_controller.export_orders),
     path('orders/create', order_controller.create_order),
     path('orders/update/<path:id>', order_controller.update_order),
+    path('orders/bulk_status', order_controller.bulk_update_status),
+
+    # Report
+    path('reports/orders', report_controller.get_order_report),
+
+    # Metrics (Prometheus)
+    path('metrics', metrics_controller.get_metrics),
+
+    # Async (ASGI): cùng response với các route GET ở trên
+    path('async/categories', category_controller.aget_list),
+    path('async/products', product_controller.aget_list),
+    path('async/products/detail/<path:id>', product_controller.aget_detail),
+    path('async/payment_methods', payment_method_controller.aget_list),
+    path('async/orders', order_controller.aget_list),
+    path('async/orders/detail/<path:id>', order_controller.aget_detail),
 ]
\ No newline at end of file